@@ -0,0 +1,152 @@
+import collections
+import datetime
+
+from metrics import LatencyRecorder
+from profiles import DEFAULT_PROFILE
+from timecodes import MINUTES_PER_DAY, date_of, day_number, epoch_minute
+
+# What happened to a reminder, in the order it usually happens
+SCHEDULED = 'scheduled'
+ANNOUNCED = 'announced'
+ACKNOWLEDGED = 'acknowledged'
+MISSED = 'missed'
+SNOOZED = 'snoozed'
+# Taken off the list before it came due (Clear All)
+CANCELLED = 'cancelled'
+KINDS = (SCHEDULED, ANNOUNCED, ACKNOWLEDGED, MISSED, SNOOZED, CANCELLED)
+
+# Counts for one task over a period; ack_delay_minutes adds up how late
+# each acknowledgement came after the due time
+Adherence = collections.namedtuple('Adherence', ['task', *KINDS, 'ack_delay_minutes'])
+DailyAdherence = collections.namedtuple('DailyAdherence', ['date', *KINDS, 'ack_delay_minutes'])
+
+SQL_INSERT_EVENT = '''
+    INSERT INTO reminder_events (reminder_id, profile_id, task, kind, due, at)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+SQL_HISTORY = 'SELECT kind, due, at FROM reminder_events WHERE reminder_id = ? ORDER BY id'
+
+# One fixed statement per table and kind, so each is prepared once per
+# connection (upserts need SQLite 3.24 or later)
+_ROLLUPS = (('adherence_daily', 'day'), ('adherence_weekly', 'week'))
+SQL_ROLLUP_ADD = {
+    (table, kind): f'''
+        INSERT INTO {table} (profile_id, {key}, task, {kind}, ack_delay_minutes) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (profile_id, {key}, task) DO UPDATE
+        SET {kind} = {kind} + excluded.{kind}, ack_delay_minutes = ack_delay_minutes + excluded.ack_delay_minutes
+    '''
+    for table, key in _ROLLUPS for kind in KINDS
+}
+
+_SUMS = ', '.join(f'SUM({column})' for column in (*KINDS, 'ack_delay_minutes'))
+_COUNTS = ', '.join((*KINDS, 'ack_delay_minutes'))
+# Whole weeks from the weekly rollup, the days around them from the daily one
+SQL_TOTALS = f'''
+    SELECT task, {_SUMS} FROM (
+        SELECT task, {_COUNTS} FROM adherence_weekly WHERE profile_id = ? AND week >= ? AND week <= ?
+        UNION ALL
+        SELECT task, {_COUNTS} FROM adherence_daily WHERE profile_id = ? AND day >= ? AND day < ?
+        UNION ALL
+        SELECT task, {_COUNTS} FROM adherence_daily WHERE profile_id = ? AND day > ? AND day <= ?
+    )
+    GROUP BY task ORDER BY task
+'''
+SQL_DAILY = f'''
+    SELECT day, {_SUMS} FROM adherence_daily
+    WHERE profile_id = ? AND day >= ? AND day <= ?
+    GROUP BY day ORDER BY day
+'''
+SQL_DAILY_TASK = f'''
+    SELECT day, {_COUNTS} FROM adherence_daily
+    WHERE profile_id = ? AND day >= ? AND day <= ? AND task = ?
+    ORDER BY day
+'''
+
+
+def week_number(day):
+    """Weeks since the epoch, starting on Mondays (day 0, 1970-01-01, was a Thursday)"""
+    return (day + 3) // 7
+
+
+def record(conn, kind, reminders, at=None):
+    """Append an event per (reminder_id, profile_id, task, due) and update the rollups.
+
+    A writer command helper: runs inside the caller's transaction, so the
+    events, the rollups and the change that caused them commit together.
+    Events count towards the day the reminder was due, not the day they
+    happened.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown adherence event {kind!r}")
+    if not reminders:
+        return
+    at = epoch_minute(at or datetime.datetime.now())
+    conn.executemany(SQL_INSERT_EVENT, [(reminder_id, profile_id, task, kind, due, at)
+                                        for reminder_id, profile_id, task, due in reminders])
+
+    daily = collections.Counter()
+    delays = collections.Counter()
+    for reminder_id, profile_id, task, due in reminders:
+        key = (profile_id, due // MINUTES_PER_DAY, task)
+        daily[key] += 1
+        if kind == ACKNOWLEDGED:
+            delays[key] += max(0, at - due)
+    weekly = collections.Counter()
+    weekly_delays = collections.Counter()
+    for (profile_id, day, task), count in daily.items():
+        week = (profile_id, week_number(day), task)
+        weekly[week] += count
+        weekly_delays[week] += delays[profile_id, day, task]
+
+    for (table, key), counts, sums in zip(_ROLLUPS, (daily, weekly), (delays, weekly_delays)):
+        conn.executemany(SQL_ROLLUP_ADD[table, kind], [(*period, count, sums[period]) for period, count in counts.items()])
+
+
+class AdherenceLog:
+    """Caregiver reports, answered from the rollup tables.
+
+    Every change to a reminder appends to reminder_events (never updated or
+    deleted) and, in the same transaction, bumps the per-task counters in
+    adherence_daily and adherence_weekly (see record()). Reports over months
+    therefore sum a few hundred rollup rows instead of scanning the events.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.timings = collections.OrderedDict()
+
+    def _query(self, name, sql, params):
+        recorder = self.timings.get(name)
+        if recorder is None:
+            recorder = self.timings.setdefault(name, LatencyRecorder(name))
+        with recorder.time():
+            return self.db.connection().execute(sql, params).fetchall()
+
+    def totals(self, first, last, profile_id=DEFAULT_PROFILE):
+        """A resident's adherence per task for the dates first..last (inclusive)"""
+        first_day, last_day = day_number(first), day_number(last)
+        # Weeks lying entirely inside the range
+        first_week = week_number(first_day + 6)
+        last_week = week_number(last_day - 6)
+        if first_week <= last_week:
+            before = first_week * 7 - 3  # Monday of the first whole week
+            after = last_week * 7 + 3  # Sunday of the last whole week
+        else:
+            first_week, last_week = 1, 0
+            before = after = last_day + 1
+        rows = self._query('totals', SQL_TOTALS,
+                           (profile_id, first_week, last_week, profile_id, first_day, before,
+                            profile_id, after, last_day))
+        return [Adherence(*row) for row in rows]
+
+    def daily(self, first, last, task=None, profile_id=DEFAULT_PROFILE):
+        """A resident's adherence per day for the dates first..last, for one task or all of them"""
+        if task is None:
+            rows = self._query('daily', SQL_DAILY, (profile_id, day_number(first), day_number(last)))
+        else:
+            rows = self._query('daily_task', SQL_DAILY_TASK, (profile_id, day_number(first), day_number(last), task))
+        return [DailyAdherence(date_of(day), *counts) for day, *counts in rows]
+
+    def history(self, reminder_id):
+        """(kind, due, at) of every event logged for one reminder, oldest first"""
+        return self._query('history', SQL_HISTORY, (reminder_id,))
@@ -0,0 +1,62 @@
+import threading
+
+
+class AgendaCache:
+    """Each day's active reminders, kept in memory until a change touches that day.
+
+    load(day) reads one day (a day number, see timecodes.day_number) from
+    the database. get(day) is a dict lookup once the day has been loaded.
+    Writers report the days they changed through invalidate(days), so
+    marking one of today's reminders done leaves tomorrow's agenda cached.
+    rollover(today) runs at midnight: it drops past days and loads today
+    and tomorrow ahead of the first read.
+    """
+
+    def __init__(self, load):
+        self.load = load
+        self.days = {}
+        # Invalidation counts (all days, per day), so a read racing a change is not kept
+        self.epoch = 0
+        self.versions = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, day):
+        with self.lock:
+            agenda = self.days.get(day)
+            if agenda is not None:
+                self.hits += 1
+                return agenda
+            self.misses += 1
+            version = (self.epoch, self.versions.get(day, 0))
+        agenda = self.load(day)
+        with self.lock:
+            if (self.epoch, self.versions.get(day, 0)) == version:
+                self.days[day] = agenda
+        return agenda
+
+    def invalidate(self, days):
+        with self.lock:
+            for day in days:
+                self.days.pop(day, None)
+                self.versions[day] = self.versions.get(day, 0) + 1
+
+    def invalidate_all(self):
+        with self.lock:
+            self.epoch += 1
+            self.days.clear()
+
+    def rollover(self, today):
+        """Forget days before today and prefetch today and tomorrow"""
+        with self.lock:
+            for day in [day for day in self.days if day < today]:
+                del self.days[day]
+            for day in [day for day in self.versions if day < today]:
+                del self.versions[day]
+        self.get(today)
+        self.get(today + 1)
+
+    def stats(self):
+        with self.lock:
+            return {'days': len(self.days), 'hits': self.hits, 'misses': self.misses}
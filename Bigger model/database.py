@@ -0,0 +1,147 @@
+import contextlib
+import itertools
+import sqlite3
+import threading
+import time
+
+_memory_ids = itertools.count()
+
+
+class Database:
+    """Per-thread SQLite connections to one database file.
+
+    Each thread (UI, listener, dispatcher, scheduler workers) gets its own
+    connection, so no connection object is ever used by two threads at once.
+    File databases run in WAL mode, where readers never block the writer or
+    each other. Writes still go one at a time through write(), which holds
+    a process-wide lock for the whole transaction instead of letting
+    threads collide on SQLite's file lock.
+
+    ':memory:' is mapped to a named shared-cache in-memory database so all
+    threads see the same data. Its connections only ever see committed rows;
+    SQLite reports a table being written by another connection as locked at
+    once (the busy timeout does not apply in shared cache), so they retry
+    (SharedCacheConnection).
+
+    attach maps schema names to further database files, attached to every
+    connection (':memory:' again meaning a shared in-memory database).
+    """
+
+    def __init__(self, path, journal_mode='wal', synchronous='normal', cache_size_kib=8192,
+                 busy_timeout_ms=5000, auto_vacuum='incremental', attach=None):
+        self.path = path
+        self.uri = False
+        if path == ':memory:':
+            self.path = self._memory_uri('memory')
+            self.uri = True
+        self.attachments = {}
+        for name, target in (attach or {}).items():
+            self.attachments[name] = self._memory_uri(name) if target == ':memory:' else target
+        self.synchronous = synchronous
+        self.cache_size_kib = cache_size_kib
+        self.busy_timeout_ms = busy_timeout_ms
+        self.write_lock = threading.RLock()
+        self.local = threading.local()
+        self.connections = []  # (owning thread, connection)
+        self.connections_lock = threading.Lock()
+
+        # The journal mode is stored in the file, so set it once up front.
+        # This connection also keeps a shared in-memory database alive.
+        self.keeper = self._open()
+        # Only takes effect on a new file; compaction.py converts existing ones
+        self.keeper.execute(f'PRAGMA auto_vacuum = {auto_vacuum}')
+        if not self.uri:
+            self.journal_mode = self.keeper.execute(f'PRAGMA journal_mode = {journal_mode}').fetchone()[0]
+            for name in self.attachments:
+                self.keeper.execute(f'PRAGMA {name}.journal_mode = {journal_mode}')
+        else:
+            self.journal_mode = 'memory'
+
+    @staticmethod
+    def _memory_uri(name):
+        return f"file:voicecare_{name}_{next(_memory_ids)}?mode=memory&cache=shared"
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, uri=self.uri, check_same_thread=False,
+                               timeout=self.busy_timeout_ms / 1000,
+                               factory=SharedCacheConnection if self.uri else sqlite3.Connection)
+        if self.uri:
+            conn.busy_timeout = self.busy_timeout_ms / 1000
+        for name, target in self.attachments.items():
+            conn.execute(f'ATTACH DATABASE ? AS {name}', (target,))
+        conn.execute(f'PRAGMA synchronous = {self.synchronous}')
+        conn.execute(f'PRAGMA cache_size = {-self.cache_size_kib}')
+        return conn
+
+    def _connect(self):
+        conn = self._open()
+        with self.connections_lock:
+            # Close connections left behind by threads that have finished
+            for thread, old in self.connections:
+                if not thread.is_alive():
+                    old.close()
+            self.connections = [(thread, old) for thread, old in self.connections if thread.is_alive()]
+            self.connections.append((threading.current_thread(), conn))
+        return conn
+
+    def connection(self):
+        """This thread's connection (created on first use)"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self._connect()
+        return conn
+
+    @contextlib.contextmanager
+    def write(self):
+        """Run one write transaction on this thread's connection; commit or roll back"""
+        conn = self.connection()
+        with self.write_lock:
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def close(self):
+        with self.connections_lock:
+            connections, self.connections = self.connections, []
+        for conn in [conn for _, conn in connections] + [self.keeper]:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self.local = threading.local()
+
+
+class SharedCacheConnection(sqlite3.Connection):
+    """A connection to a shared-cache in-memory database that waits out table locks.
+
+    Reading a table another connection is writing (or the reverse) fails
+    with "database table is locked" instead of waiting, so execute(),
+    executemany() and commit() retry for up to busy_timeout seconds.
+    """
+
+    busy_timeout = 5.0
+
+    def execute(self, sql, params=()):
+        return self._retry(super().execute, sql, params)
+
+    def executemany(self, sql, rows):
+        # A generator could only be read once
+        return self._retry(super().executemany, sql, list(rows))
+
+    def commit(self):
+        return self._retry(super().commit)
+
+    def _retry(self, func, *args):
+        deadline = time.monotonic() + self.busy_timeout
+        delay = 0.0005
+        while True:
+            try:
+                return func(*args)
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) or time.monotonic() >= deadline:
+                    raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.01)
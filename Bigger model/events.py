@@ -0,0 +1,39 @@
+import threading
+
+# Reminders changed; data: days=set of changed day numbers and profiles=set of
+# profile ids, each None if unknown (another process wrote to the database)
+REMINDERS_CHANGED = 'reminders_changed'
+# Residents added, changed or retired (or perhaps, if another process wrote to
+# the database); no data
+PROFILES_CHANGED = 'profiles_changed'
+
+
+class EventBus:
+    """Publish/subscribe between the backend and the window.
+
+    Callbacks run on the publishing thread (usually the database writer),
+    so they must be quick and hand anything touching widgets over to the
+    UI thread themselves.
+    """
+
+    def __init__(self):
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, topic, callback):
+        with self.lock:
+            self.subscribers.setdefault(topic, []).append(callback)
+
+    def unsubscribe(self, topic, callback):
+        with self.lock:
+            if callback in self.subscribers.get(topic, []):
+                self.subscribers[topic].remove(callback)
+
+    def publish(self, topic, **data):
+        with self.lock:
+            callbacks = list(self.subscribers.get(topic, []))
+        for callback in callbacks:
+            try:
+                callback(**data)
+            except Exception as e:
+                print(f"Error handling {topic} event: {e}")
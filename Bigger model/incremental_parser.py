@@ -0,0 +1,144 @@
+import collections
+
+from language_packs import is_number_token
+from metrics import LatencyRecorder
+
+ParseState = collections.namedtuple(
+    'ParseState', ['text', 'language', 'intent', 'slots', 'complete', 'stable'])
+
+
+def has_devanagari(text):
+    return any('\u0900' <= ch <= '\u097f' for ch in text)
+
+
+class IncrementalCommandParser:
+    """Parse a stream of partial ASR hypotheses without starting over each time.
+
+    Vosk partial results mostly grow by a word at a time, so the parser keeps
+    the normalized form of the words it has already seen and only normalizes
+    the changed suffix. Language detection (the expensive step) runs once the
+    first few words are in, then again only when the script changes or, while
+    the command is still incomplete, each time the hypothesis doubles in
+    length (a short Devanagari prefix is easily taken for the wrong
+    language). Words are normalized in segments: a single plain word, or a
+    run of number words that may combine ("twenty five", "साढ़े सात बजे").
+    A segment that ended right at the change point is redone, because the
+    new words may extend it.
+
+    update() returns a ParseState. complete is set once the intent has all
+    its required slots. stable is set once a complete parse has been followed
+    by stable_updates identical hypotheses, i.e. the speaker has paused.
+    """
+
+    def __init__(self, assistant, stable_updates=2, min_detect_words=2):
+        self.assistant = assistant
+        self.stable_updates = stable_updates
+        self.min_detect_words = min_detect_words
+        self.latency = LatencyRecorder('partial parse')
+        self.reset()
+
+    def reset(self):
+        """Forget the current utterance"""
+        self.tokens = []
+        self.segments = []  # (start, end, normalized text, is number run)
+        self.language = None
+        self.devanagari = None
+        self.detected_words = 0
+        self.state = ParseState('', None, None, None, False, False)
+        self.repeats = 0
+
+    def update(self, hypothesis):
+        """Feed the latest partial (or final) hypothesis; return the ParseState"""
+        with self.latency.time():
+            return self._update(hypothesis)
+
+    def _update(self, hypothesis):
+        tokens = hypothesis.lower().split()
+        if tokens == self.tokens:
+            # Nothing new was heard; a complete parse gets closer to stable
+            if self.state.complete:
+                self.repeats += 1
+            self.state = self.state._replace(stable=self.state.complete and self.repeats >= self.stable_updates)
+            return self.state
+
+        if not tokens:
+            self.reset()
+            return self.state
+
+        # Detect the language once we have a few words, and again if the script
+        # flips or an incomplete command has doubled in length since
+        devanagari = has_devanagari(hypothesis)
+        if self.language is None and len(tokens) < self.min_detect_words:
+            self.tokens = tokens
+            return self.state
+        if (self.language is None or devanagari != self.devanagari
+                or (not self.state.complete and len(tokens) >= 2 * self.detected_words)):
+            language = self.assistant.detect_language(' '.join(tokens))
+            if language != self.language:
+                self.tokens = []
+                self.segments = []
+            self.language = language
+            self.devanagari = devanagari
+            self.detected_words = len(tokens)
+
+        self._renormalize(tokens)
+        self.tokens = tokens
+        text = ' '.join(segment[2] for segment in self.segments if segment[2])
+        self.repeats = 0
+        self.state = self._parse(text)
+        return self.state
+
+    def _renormalize(self, tokens):
+        """Re-normalize only the words after the common prefix"""
+        common = 0
+        limit = min(len(tokens), len(self.tokens))
+        while common < limit and tokens[common] == self.tokens[common]:
+            common += 1
+
+        # Keep whole segments inside the prefix; a number run touching the
+        # change point may continue, so it is redone
+        while self.segments and (self.segments[-1][1] > common
+                                 or (self.segments[-1][1] == common and self.segments[-1][3])):
+            self.segments.pop()
+        start = self.segments[-1][1] if self.segments else 0
+
+        pack = self.assistant.patterns[self.language]
+        i = start
+        while i < len(tokens):
+            if is_number_token(pack, tokens[i]):
+                end = i + 1
+                while end < len(tokens) and is_number_token(pack, tokens[end]):
+                    end += 1
+                numeric = True
+            else:
+                end = i + 1
+                numeric = False
+            normalized = self.assistant.words_to_numbers(' '.join(tokens[i:end]), self.language)
+            self.segments.append((i, end, normalized, numeric))
+            i = end
+
+    def _parse(self, text):
+        assistant = self.assistant
+        language = self.language
+        matcher = assistant.get_fuzzy_matcher(language)
+        # As in process_voice_command: fuzzy first only if there are fillers or stutters
+        noisy = matcher is not None and matcher.noisy(text)
+
+        intent, match = (None, None) if noisy else assistant.find_intent(text, language)
+        parsed_text = text
+        if intent is None and matcher:
+            fuzzy = matcher.match(text)
+            if fuzzy and fuzzy.intent == 'query_schedule':
+                intent = 'query_schedule'
+            elif fuzzy and fuzzy.command:
+                intent, match = assistant.find_intent(fuzzy.command, language)
+                parsed_text = fuzzy.command
+        if intent is None and noisy:
+            intent, match = assistant.find_intent(text, language)
+            parsed_text = text
+
+        slots = None
+        if intent == 'set_reminder':
+            slots = assistant.parse_reminder_slots(match, parsed_text, language)
+        complete = intent == 'query_schedule' or slots is not None
+        return ParseState(text, language, intent, slots, complete, False)
@@ -0,0 +1,62 @@
+import collections
+import threading
+import time
+
+
+class LatencyRecorder:
+    """Keep the most recent timings (in milliseconds) and report percentiles"""
+
+    def __init__(self, name, size=1000):
+        self.name = name
+        self.samples = collections.deque(maxlen=size)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def record(self, millis):
+        with self.lock:
+            self.samples.append(millis)
+            self.count += 1
+
+    def time(self):
+        """Context manager that records the duration of its block"""
+        return _Timer(self)
+
+    def percentile(self, pct):
+        with self.lock:
+            ordered = sorted(self.samples)
+        return _pick(ordered, pct) if ordered else None
+
+    def stats(self):
+        """Summary dict: count, p50, p95, p99 and max in milliseconds"""
+        with self.lock:
+            ordered = sorted(self.samples)
+            count = self.count
+        if not ordered:
+            return {'count': count, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+        return {'count': count, 'p50': _pick(ordered, 50), 'p95': _pick(ordered, 95),
+                'p99': _pick(ordered, 99), 'max': ordered[-1]}
+
+    def __str__(self):
+        s = self.stats()
+        if s['p50'] is None:
+            return f"{self.name}: no samples"
+        return (f"{self.name}: n={s['count']} p50={s['p50']:.2f}ms "
+                f"p95={s['p95']:.2f}ms p99={s['p99']:.2f}ms max={s['max']:.2f}ms")
+
+
+def _pick(ordered, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+class _Timer:
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.record((time.perf_counter() - self.start) * 1000.0)
+        return False
@@ -0,0 +1,92 @@
+import collections
+import threading
+
+from events import PROFILES_CHANGED
+
+# Owns every reminder created before profiles existed, and the only one on a single-user install
+DEFAULT_PROFILE = 1
+
+Profile = collections.namedtuple('Profile', ['id', 'resident_id', 'name', 'language', 'voice', 'rate', 'volume'])
+
+_COLUMNS = 'id, resident_id, name, language, voice, rate, volume'
+SQL_ACTIVE_PROFILES = f'SELECT {_COLUMNS} FROM profiles WHERE active = 1 ORDER BY name, id'
+SQL_INSERT_PROFILE = '''
+    INSERT INTO profiles (resident_id, name, language, voice, rate, volume)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+SQL_UPDATE_PROFILE = '''
+    UPDATE profiles SET name = ?, language = ?, voice = ?, rate = ?, volume = ?
+    WHERE id = ?
+'''
+SQL_RETIRE_PROFILE = 'UPDATE profiles SET active = 0 WHERE id = ?'
+
+
+class ProfileRegistry:
+    """The residents served by this database, with their language and voice settings.
+
+    A facility runs one process for all residents: every reminder row
+    carries a profile_id, and the one dispatcher announces each reminder
+    with its resident's settings. The few hundred profiles are read once
+    and kept in memory until a commit changes one (or another process
+    writes to the database). Changes go through the DatabaseWriter and
+    return its Futures. Each time they are forgotten, PROFILES_CHANGED is
+    published on events (if given).
+    """
+
+    def __init__(self, db, writer, events=None):
+        self.db = db
+        self.writer = writer
+        self.events = events
+        self.lock = threading.Lock()
+        self.profiles = None
+        self.generation = 0
+        # Set by commands since the last commit (writer thread only)
+        self.changed = False
+        writer.add_listener(self.invalidate)
+
+    def invalidate(self, external=False):
+        """Forget the profiles if the last commit changed one (called by the writer)"""
+        if not (external or self.changed):
+            return
+        self.changed = False
+        with self.lock:
+            self.generation += 1
+            self.profiles = None
+        if self.events is not None:
+            self.events.publish(PROFILES_CHANGED)
+
+    def _load(self):
+        with self.lock:
+            profiles, generation = self.profiles, self.generation
+        if profiles is None:
+            rows = self.db.connection().execute(SQL_ACTIVE_PROFILES).fetchall()
+            profiles = collections.OrderedDict((row[0], Profile(*row)) for row in rows)
+            with self.lock:
+                # Not kept if a commit landed while reading
+                if self.generation == generation:
+                    self.profiles = profiles
+        return profiles
+
+    def get(self, profile_id):
+        """An active profile, or None"""
+        return self._load().get(profile_id)
+
+    def all(self):
+        """Active profiles by name"""
+        return list(self._load().values())
+
+    def add(self, name, language='en', resident_id=None, voice=None, rate=None, volume=None):
+        """Create a profile; the Future's result is its id"""
+        return self.writer.submit(self._change, SQL_INSERT_PROFILE, (resident_id, name, language, voice, rate, volume))
+
+    def update(self, profile_id, name, language, voice=None, rate=None, volume=None):
+        return self.writer.submit(self._change, SQL_UPDATE_PROFILE, (name, language, voice, rate, volume, profile_id))
+
+    def retire(self, profile_id):
+        """Hide a profile (its reminders and history stay)"""
+        return self.writer.submit(self._change, SQL_RETIRE_PROFILE, (profile_id,))
+
+    def _change(self, conn, sql, params):
+        """Writer command: run one statement and note that profiles changed"""
+        self.changed = True
+        return conn.execute(sql, params).lastrowid
@@ -0,0 +1,284 @@
+import time
+
+from timecodes import SQL_EPOCH_MINUTE
+
+# Each migration runs once, in order, inside a transaction; PRAGMA user_version
+# records the last one applied. Append new migrations, never edit old ones.
+
+
+def create_reminders(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reminders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task TEXT NOT NULL,
+            time TEXT NOT NULL,
+            date TEXT NOT NULL,
+            language TEXT DEFAULT 'en',
+            active INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            recurring INTEGER DEFAULT 0,
+            remaining_days INTEGER DEFAULT 0,
+            original_id INTEGER DEFAULT NULL
+        )
+    ''')
+
+
+def add_recurrences(conn):
+    # Recurring reminders are stored once as a rule and expanded into
+    # reminder rows only for the next few days
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS recurrences (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task TEXT NOT NULL,
+            time TEXT NOT NULL,
+            language TEXT DEFAULT 'en',
+            freq TEXT NOT NULL DEFAULT 'daily',
+            interval_days INTEGER DEFAULT 1,
+            start_date TEXT NOT NULL,
+            until_date TEXT DEFAULT NULL,
+            count INTEGER DEFAULT NULL,
+            expanded_until TEXT DEFAULT NULL,
+            active INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(reminders)')]
+    if 'recurrence_id' not in columns:
+        conn.execute('ALTER TABLE reminders ADD COLUMN recurrence_id INTEGER DEFAULT NULL')
+
+
+def add_due_index(conn):
+    # Serves the dispatcher, startup recovery, the per-day views
+    # (active = 1 AND date = ? ORDER BY time) and cleanup (active = 0 AND date < ?)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_reminders_due ON reminders (active, date, time)')
+    conn.execute('ANALYZE')
+
+
+def add_due_minute(conn):
+    # Integer epoch minute (timecodes.py) so reads compare and format integers
+    # instead of parsing text; date and time are still written for readability
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(reminders)')]
+    if 'due' not in columns:
+        conn.execute('ALTER TABLE reminders ADD COLUMN due INTEGER')
+    conn.execute(f'UPDATE reminders SET due = {SQL_EPOCH_MINUTE} WHERE due IS NULL')
+    # Keep due derived from the text columns for writers that only set those
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS reminders_due_insert AFTER INSERT ON reminders
+        WHEN NEW.due IS NULL
+        BEGIN
+            UPDATE reminders SET due = {SQL_EPOCH_MINUTE} WHERE id = NEW.id;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS reminders_due_update AFTER UPDATE OF date, time ON reminders
+        BEGIN
+            UPDATE reminders SET due = {SQL_EPOCH_MINUTE} WHERE id = NEW.id;
+        END
+    ''')
+    conn.execute('DROP INDEX IF EXISTS idx_reminders_due')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_reminders_active_due ON reminders (active, due)')
+    conn.execute('ANALYZE')
+
+
+def add_adherence_log(conn):
+    # Append-only log of what happened to each reminder, plus per-task
+    # counters by day and by week kept up to date with it (adherence.py)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reminder_events (
+            id INTEGER PRIMARY KEY,
+            reminder_id INTEGER NOT NULL,
+            task TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            due INTEGER NOT NULL,
+            at INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_reminder_events_reminder ON reminder_events (reminder_id)')
+    for table, key in (('adherence_daily', 'day'), ('adherence_weekly', 'week')):
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                {key} INTEGER NOT NULL,
+                task TEXT NOT NULL,
+                scheduled INTEGER NOT NULL DEFAULT 0,
+                announced INTEGER NOT NULL DEFAULT 0,
+                acknowledged INTEGER NOT NULL DEFAULT 0,
+                missed INTEGER NOT NULL DEFAULT 0,
+                snoozed INTEGER NOT NULL DEFAULT 0,
+                ack_delay_minutes INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY ({key}, task)
+            ) WITHOUT ROWID
+        ''')
+
+
+def add_profiles(conn):
+    # One database serves many residents: every reminder, rule and event
+    # belongs to a profile; rows from before profiles belong to profile 1
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS profiles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            resident_id TEXT UNIQUE,
+            name TEXT NOT NULL,
+            language TEXT DEFAULT 'en',
+            voice TEXT DEFAULT NULL,
+            rate INTEGER DEFAULT NULL,
+            volume REAL DEFAULT NULL,
+            active INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO profiles (id, name) VALUES (1, 'Default')")
+    for table in ('reminders', 'recurrences', 'reminder_events'):
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+        if 'profile_id' not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN profile_id INTEGER NOT NULL DEFAULT 1')
+    # A resident's day and list views; the dispatcher keeps using (active, due)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_reminders_profile_due ON reminders (profile_id, active, due)')
+
+    # The rollups gain profile_id in their key, so they are rebuilt
+    for table, key in (('adherence_daily', 'day'), ('adherence_weekly', 'week')):
+        conn.execute(f'''
+            CREATE TABLE {table}_by_profile (
+                profile_id INTEGER NOT NULL,
+                {key} INTEGER NOT NULL,
+                task TEXT NOT NULL,
+                scheduled INTEGER NOT NULL DEFAULT 0,
+                announced INTEGER NOT NULL DEFAULT 0,
+                acknowledged INTEGER NOT NULL DEFAULT 0,
+                missed INTEGER NOT NULL DEFAULT 0,
+                snoozed INTEGER NOT NULL DEFAULT 0,
+                ack_delay_minutes INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (profile_id, {key}, task)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute(f'INSERT INTO {table}_by_profile SELECT 1, * FROM {table}')
+        conn.execute(f'DROP TABLE {table}')
+        conn.execute(f'ALTER TABLE {table}_by_profile RENAME TO {table}')
+    conn.execute('ANALYZE')
+
+
+def add_journal(conn):
+    # Optional append-only journal of reminder changes and its snapshots
+    # (journal.py); the triggers that fill it are created only when enabled
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reminder_journal (
+            seq INTEGER PRIMARY KEY,
+            op TEXT NOT NULL,
+            reminder_id INTEGER NOT NULL,
+            profile_id INTEGER,
+            task TEXT,
+            due INTEGER,
+            language TEXT,
+            recurring INTEGER,
+            remaining_days INTEGER,
+            recurrence_id INTEGER,
+            active INTEGER,
+            at INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reminder_snapshots (
+            seq INTEGER PRIMARY KEY,
+            created_at INTEGER NOT NULL,
+            reminders INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
+    ''')
+
+
+def add_cancelled_outcome(conn):
+    # Reminders cleared from a day get their own outcome in the rollups, so
+    # every scheduled dose ends up acknowledged, missed or cancelled
+    for table in ('adherence_daily', 'adherence_weekly'):
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+        if 'cancelled' not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN cancelled INTEGER NOT NULL DEFAULT 0')
+
+
+def create_archive(conn):
+    """Archive table in the attached 'archive' database (a file next to the main one).
+
+    Done reminders are moved here by compaction.py instead of being deleted,
+    so the history survives while the live table and file stay small. The
+    archive is only ever appended to, so it has no migrations of its own;
+    columns added later are added here if missing.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archive.reminders_archive (
+            id INTEGER PRIMARY KEY,
+            task TEXT NOT NULL,
+            time TEXT NOT NULL,
+            date TEXT NOT NULL,
+            language TEXT,
+            active INTEGER,
+            created_at TIMESTAMP,
+            recurring INTEGER,
+            remaining_days INTEGER,
+            original_id INTEGER,
+            recurrence_id INTEGER,
+            due INTEGER,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Added with profiles
+    columns = [row[1] for row in conn.execute('PRAGMA archive.table_info(reminders_archive)')]
+    if 'profile_id' not in columns:
+        conn.execute('ALTER TABLE archive.reminders_archive ADD COLUMN profile_id INTEGER NOT NULL DEFAULT 1')
+    conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_reminders_archive_due ON reminders_archive (due)')
+    conn.commit()
+
+
+MIGRATIONS = [
+    (1, 'reminders table', create_reminders),
+    (2, 'recurrence rules', add_recurrences),
+    (3, 'index on (active, date, time)', add_due_index),
+    (4, 'integer due minute', add_due_minute),
+    (5, 'adherence log and rollups', add_adherence_log),
+    (6, 'resident profiles', add_profiles),
+    (7, 'reminder journal and snapshots', add_journal),
+    (8, 'cancelled adherence outcome', add_cancelled_outcome),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    """Apply pending migrations; return [(version, description, ms)] for those applied.
+
+    Databases created before versioning report user_version 0; their
+    migrations are written to be no-ops where the schema already matches.
+    Each migration and its timing (in schema_migrations) commit together.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            duration_ms REAL NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+    applied = []
+    current = schema_version(conn)
+    for version, description, apply in MIGRATIONS:
+        if version <= current:
+            continue
+        start = time.perf_counter()
+        conn.execute('BEGIN')
+        try:
+            apply(conn)
+            conn.execute(f'PRAGMA user_version = {version}')
+            duration = (time.perf_counter() - start) * 1000
+            conn.execute('INSERT INTO schema_migrations (version, description, duration_ms) VALUES (?, ?, ?)',
+                         (version, description, duration))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Applied schema migration {version} ({description}) in {duration:.1f} ms")
+        applied.append((version, description, duration))
+    return applied
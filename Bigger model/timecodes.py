@@ -0,0 +1,58 @@
+import datetime
+import functools
+
+# Reminder times are stored as integer "epoch minutes": whole minutes since
+# 1970-01-01 00:00 on the local wall clock (no time zone), so a day is
+# exactly 1440 minutes and day boundaries are plain integer ranges
+MINUTES_PER_DAY = 1440
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+# The same value computed in SQL from the legacy 'YYYY-MM-DD' / 'HH:MM' text
+# columns (2440587.5 is the Julian day of the epoch)
+SQL_EPOCH_MINUTE = '''(CAST(round(julianday(date) - 2440587.5) AS INTEGER) * 1440
+                       + CAST(substr(time, 1, 2) AS INTEGER) * 60
+                       + CAST(substr(time, 4, 2) AS INTEGER))'''
+
+
+def day_number(date):
+    """Days since the epoch"""
+    return date.toordinal() - EPOCH_ORDINAL
+
+
+def epoch_minute(moment):
+    """Epoch minute of a datetime (seconds dropped), or of a date's midnight"""
+    if isinstance(moment, datetime.datetime):
+        return day_number(moment.date()) * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+    return day_number(moment) * MINUTES_PER_DAY
+
+
+def day_range(date):
+    """[start, end) epoch minutes covering a date"""
+    start = epoch_minute(date)
+    return start, start + MINUTES_PER_DAY
+
+
+def to_datetime(minute):
+    day, minute_of_day = divmod(minute, MINUTES_PER_DAY)
+    return datetime.datetime.combine(date_of(day), datetime.time(*divmod(minute_of_day, 60)))
+
+
+@functools.lru_cache(maxsize=1024)
+def date_of(day):
+    return datetime.date.fromordinal(day + EPOCH_ORDINAL)
+
+
+@functools.lru_cache(maxsize=MINUTES_PER_DAY)
+def _time_label(minute_of_day):
+    return datetime.time(*divmod(minute_of_day, 60)).strftime('%I:%M %p')
+
+
+def format_time(minute):
+    """'07:30 PM' for an epoch minute (or a minute of the day)"""
+    return _time_label(minute % MINUTES_PER_DAY)
+
+
+@functools.lru_cache(maxsize=1024)
+def format_date(day, pattern='%Y-%m-%d'):
+    """Date of a day number formatted with pattern"""
+    return date_of(day).strftime(pattern)
@@ -1,14 +1,18 @@
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QLabel, QTabWidget, QScrollArea, QFrame,
-                             QDialog, QLineEdit, QTextEdit, QGridLayout, QMessageBox)
+                             QDialog, QLineEdit, QTextEdit, QGridLayout, QMessageBox, QComboBox,
+                             QFileDialog)
 from PyQt5.QtGui import QIcon, QFont, QColor, QPalette
-from PyQt5.QtCore import Qt, QTimer, QDateTime, QDate
+from PyQt5.QtCore import Qt, QTimer, QDateTime, QDate, pyqtSignal
 import sys
 import threading
 import datetime
 import sqlite3
 
 from voicecare_final import VoiceCareAssistant
+from events import PROFILES_CHANGED, REMINDERS_CHANGED
+from timecodes import MINUTES_PER_DAY, day_number, format_date, format_time
+from writer import log_failure
 
 
 class ReminderCard(QFrame):
@@ -58,15 +62,11 @@ class ReminderCard(QFrame):
     def mark_done(self):
         # Mark as inactive in database
         try:
-            cursor = self.assistant.conn.cursor()
-            cursor.execute('UPDATE reminders SET active = 0 WHERE id = ?', (self.reminder_id,))
-            self.assistant.conn.commit()
+            # Queued for the writer thread, so the UI never waits for the disk
+            log_failure(self.assistant.repository.mark_done(self.reminder_id), "marking reminder as done")
             
-            # Remove scheduled job
-            try:
-                self.assistant.scheduler.remove_job(f"reminder_{self.reminder_id}")
-            except:
-                pass
+            # Make sure it is not announced any more
+            self.assistant.dispatcher.cancel(self.reminder_id)
                 
         except Exception as e:
             print(f"Error marking reminder as done: {e}")
@@ -137,16 +137,20 @@ class AddReminderDialog(QDialog):
             self.assistant.process_voice_command(command)
             QMessageBox.information(self, "Success", "Reminder added successfully!")
             
-            # Refresh the parent window's display
-            if self.parent_window:
-                self.parent_window.refresh_reminders()
-                
+            # The window refreshes itself when the new reminder is committed
             self.accept()
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to add reminder: {str(e)}")
 
 
 class VoiceCareUI(QMainWindow):
+    # Carries REMINDERS_CHANGED events from the writer thread to the UI thread
+    reminders_changed = pyqtSignal(object)
+    # Carries an import's ImportReport (None if it failed) from its thread to the UI thread
+    import_finished = pyqtSignal(object)
+    # Carries PROFILES_CHANGED events from the writer thread to the UI thread
+    profiles_changed = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         # Initialize the assistant without GUI
@@ -169,12 +173,30 @@ class VoiceCareUI(QMainWindow):
         nav.addWidget(app_label)
         nav.addStretch()
 
+        # Resident whose reminders are shown and who voice commands are for
+        # (only offered when the database has more than one profile)
+        self.profile_box = QComboBox()
+        self.profile_box.setFont(QFont("Arial", 12))
+        self.fill_profile_box()
+        self.profile_box.currentIndexChanged.connect(self.on_profile_selected)
+        nav.addWidget(self.profile_box)
+
         # Status label
         self.status_label = QLabel("Ready to help!")
         self.status_label.setFont(QFont("Arial", 12))
         self.status_label.setStyleSheet("color: #27ae60; padding: 5px;")
         nav.addWidget(self.status_label)
 
+        # Prescription lists in and out (CSV, JSON lines, iCalendar)
+        self.import_btn = QPushButton("Import")
+        self.import_btn.setStyleSheet("background-color: #95a5a6; color: white; padding: 8px; font-weight: bold; border-radius: 5px;")
+        self.import_btn.clicked.connect(self.handle_import_click)
+        nav.addWidget(self.import_btn)
+        self.export_btn = QPushButton("Export")
+        self.export_btn.setStyleSheet("background-color: #95a5a6; color: white; padding: 8px; font-weight: bold; border-radius: 5px;")
+        self.export_btn.clicked.connect(self.handle_export_click)
+        nav.addWidget(self.export_btn)
+
         self.mic_btn = QPushButton("🎤 SPEAK")
         self.mic_btn.setFixedSize(120, 48)
         self.mic_btn.setStyleSheet("""
@@ -256,10 +278,20 @@ class VoiceCareUI(QMainWindow):
         """)
         self.add_btn.clicked.connect(self.show_add_dialog)
 
-        # Timer to refresh reminders periodically
-        self.refresh_timer = QTimer()
-        self.refresh_timer.timeout.connect(self.refresh_reminders)
-        self.refresh_timer.start(30000)  # Refresh every 30 seconds
+        # Redraw only when reminders change, right after the change is committed
+        self.changed_days = set()
+        self.changed_all = False
+        self.refresh_pending = False
+        self.reminders_changed.connect(self.on_reminders_changed)
+        self.assistant.events.subscribe(
+            REMINDERS_CHANGED, lambda days, profiles: self.reminders_changed.emit((days, profiles)))
+        self.import_finished.connect(self.on_import_finished)
+        # Residents added later (here or by another process) appear without a restart
+        self.profiles_changed.connect(self.on_profiles_changed)
+        self.assistant.events.subscribe(PROFILES_CHANGED, self.profiles_changed.emit)
+        
+        # Move the Today and Tomorrow tabs on as soon as the date changes
+        self.schedule_midnight_refresh()
 
         # Initial load of reminders
         self.refresh_reminders()
@@ -284,26 +316,88 @@ class VoiceCareUI(QMainWindow):
         
         return tab
 
-    def get_reminders_for_date(self, date_str):
+    def get_reminders_for_date(self, date):
         """Get reminders for a specific date"""
         try:
-            cursor = self.assistant.conn.cursor()
-            cursor.execute('''
-                SELECT id, task, time, recurring, remaining_days 
-                FROM reminders 
-                WHERE date = ? AND active = 1 
-                ORDER BY time
-            ''', (date_str,))
-            return cursor.fetchall()
+            return self.assistant.repository.for_day(date, self.assistant.current_profile)
         except Exception as e:
             print(f"Error fetching reminders: {e}")
             return []
 
+    def schedule_midnight_refresh(self):
+        now = datetime.datetime.now()
+        midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+        QTimer.singleShot(int((midnight - now).total_seconds() * 1000) + 1000, self.on_midnight)
+
+    def on_midnight(self):
+        """Show the new day's agenda (prefetched by the repository) and wait for the next midnight"""
+        try:
+            self.assistant.repository.rollover(datetime.date.today())
+        except Exception as e:
+            print(f"Error rolling over agenda: {e}")
+        self.refresh_reminders()
+        self.schedule_midnight_refresh()
+
+    def fill_profile_box(self):
+        """List the active residents, keeping the current one selected"""
+        self.profile_box.blockSignals(True)
+        self.profile_box.clear()
+        for profile in self.assistant.profiles.all():
+            self.profile_box.addItem(profile.name, profile.id)
+        self.profile_box.setCurrentIndex(max(0, self.profile_box.findData(self.assistant.current_profile)))
+        self.profile_box.blockSignals(False)
+        self.profile_box.setVisible(self.profile_box.count() > 1)
+
+    def on_profiles_changed(self):
+        profiles = [(profile.name, profile.id) for profile in self.assistant.profiles.all()]
+        listed = [(self.profile_box.itemText(i), self.profile_box.itemData(i)) for i in range(self.profile_box.count())]
+        if profiles == listed:
+            return
+        self.fill_profile_box()
+        # The current resident was retired: show whoever is selected now
+        if self.profile_box.findData(self.assistant.current_profile) < 0:
+            self.on_profile_selected(self.profile_box.currentIndex())
+
+    def on_profile_selected(self, index):
+        """Show another resident's reminders"""
+        profile_id = self.profile_box.itemData(index)
+        if profile_id is not None and profile_id != self.assistant.current_profile:
+            self.assistant.current_profile = profile_id
+            self.refresh_reminders()
+
+    def on_reminders_changed(self, change):
+        """Note the changed days; one refresh handles a whole burst of changes"""
+        days, profiles = change
+        if profiles is not None and self.assistant.current_profile not in profiles:
+            return
+        if days is None:
+            self.changed_all = True
+        else:
+            self.changed_days.update(days)
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            QTimer.singleShot(0, self.refresh_changed)
+
+    def refresh_changed(self):
+        """Rebuild the tabs showing a changed day, and the All tab"""
+        days, changed_all = self.changed_days, self.changed_all
+        self.changed_days, self.changed_all, self.refresh_pending = set(), False, False
+        try:
+            today = datetime.date.today()
+            tomorrow = today + datetime.timedelta(days=1)
+            if changed_all or day_number(today) in days:
+                self.update_tab_reminders(self.today_tab, today, "No reminders for today")
+            if changed_all or day_number(tomorrow) in days:
+                self.update_tab_reminders(self.tomorrow_tab, tomorrow, "No reminders for tomorrow")
+            self.update_all_reminders_tab()
+        except Exception as e:
+            print(f"Error refreshing reminders: {e}")
+
     def refresh_reminders(self):
         """Refresh all reminder displays"""
         try:
-            today = datetime.date.today().strftime('%Y-%m-%d')
-            tomorrow = (datetime.date.today() + datetime.timedelta(days=1)).strftime('%Y-%m-%d')
+            today = datetime.date.today()
+            tomorrow = today + datetime.timedelta(days=1)
             
             # Update each tab
             self.update_tab_reminders(self.today_tab, today, "No reminders for today")
@@ -313,10 +407,10 @@ class VoiceCareUI(QMainWindow):
         except Exception as e:
             print(f"Error refreshing reminders: {e}")
 
-    def update_tab_reminders(self, tab, date_str, empty_message):
+    def update_tab_reminders(self, tab, date, empty_message):
         """Update reminders for a specific tab"""
         try:
-            reminders = self.get_reminders_for_date(date_str)
+            reminders = self.get_reminders_for_date(date)
             
             # Get the scroll area and inner widget
             scroll_area = tab.findChild(QScrollArea)
@@ -337,17 +431,16 @@ class VoiceCareUI(QMainWindow):
                 layout.addWidget(empty_label)
             else:
                 # Add reminder cards
-                for reminder_id, task, time_str, is_recurring, days_left in reminders:
-                    time_obj = datetime.datetime.strptime(time_str, '%H:%M').time()
-                    formatted_time = time_obj.strftime('%I:%M %p')
+                for reminder in reminders:
+                    formatted_time = format_time(reminder.due)
                     
                     card = ReminderCard(
-                        task=task,
+                        task=reminder.task,
                         time_str=formatted_time,
-                        reminder_id=reminder_id,
+                        reminder_id=reminder.id,
                         assistant=self.assistant,
-                        is_recurring=bool(is_recurring),
-                        days_left=days_left or 0
+                        is_recurring=bool(reminder.recurring),
+                        days_left=reminder.remaining_days or 0
                     )
                     layout.addWidget(card)
             
@@ -359,14 +452,7 @@ class VoiceCareUI(QMainWindow):
     def update_all_reminders_tab(self):
         """Update the 'All Reminders' tab"""
         try:
-            cursor = self.assistant.conn.cursor()
-            cursor.execute('''
-                SELECT id, task, time, date, recurring, remaining_days 
-                FROM reminders 
-                WHERE active = 1 
-                ORDER BY date, time
-            ''')
-            all_reminders = cursor.fetchall()
+            all_reminders = self.assistant.repository.all_active(self.assistant.current_profile)
             
             # Get the scroll area and inner widget
             scroll_area = self.all_tab.findChild(QScrollArea)
@@ -385,19 +471,20 @@ class VoiceCareUI(QMainWindow):
                 empty_label.setStyleSheet("color: #888; font-size: 16px; padding: 20px;")
                 layout.addWidget(empty_label)
             else:
-                current_date = None
-                for reminder_id, task, time_str, date_str, is_recurring, days_left in all_reminders:
+                current_day = None
+                today = day_number(datetime.date.today())
+                for reminder in all_reminders:
                     # Add date separator if needed
-                    if date_str != current_date:
-                        current_date = date_str
-                        date_obj = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
+                    day = reminder.due // MINUTES_PER_DAY
+                    if day != current_day:
+                        current_day = day
                         
-                        if date_obj == datetime.date.today():
+                        if day == today:
                             date_label_text = "Today"
-                        elif date_obj == datetime.date.today() + datetime.timedelta(days=1):
+                        elif day == today + 1:
                             date_label_text = "Tomorrow"
                         else:
-                            date_label_text = date_obj.strftime('%B %d, %Y')
+                            date_label_text = format_date(day, '%B %d, %Y')
                         
                         date_label = QLabel(date_label_text)
                         date_label.setFont(QFont("Arial", 16, QFont.Bold))
@@ -405,16 +492,15 @@ class VoiceCareUI(QMainWindow):
                         layout.addWidget(date_label)
                     
                     # Add reminder card
-                    time_obj = datetime.datetime.strptime(time_str, '%H:%M').time()
-                    formatted_time = time_obj.strftime('%I:%M %p')
+                    formatted_time = format_time(reminder.due)
                     
                     card = ReminderCard(
-                        task=task,
+                        task=reminder.task,
                         time_str=formatted_time,
-                        reminder_id=reminder_id,
+                        reminder_id=reminder.id,
                         assistant=self.assistant,
-                        is_recurring=bool(is_recurring),
-                        days_left=days_left or 0
+                        is_recurring=bool(reminder.recurring),
+                        days_left=reminder.remaining_days or 0
                     )
                     layout.addWidget(card)
             
@@ -434,6 +520,38 @@ class VoiceCareUI(QMainWindow):
         dialog = AddReminderDialog(self.assistant, self)
         dialog.exec_()
 
+    def handle_import_click(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Reminders", "",
+                                              "Reminder lists (*.csv *.jsonl *.ics)")
+        if not path:
+            return
+        self.status_label.setText("Importing...")
+        self.import_btn.setEnabled(False)
+
+        def import_thread():
+            # The tabs redraw as each chunk is committed
+            self.import_finished.emit(self.assistant.import_reminders(path))
+
+        threading.Thread(target=import_thread, daemon=True).start()
+
+    def on_import_finished(self, report):
+        if report is None:
+            self.status_label.setText("Import failed")
+        else:
+            self.status_label.setText(f"Imported {report.reminders + report.rules}, skipped {report.skipped}")
+        self.import_btn.setEnabled(True)
+
+    def handle_export_click(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Reminders", "reminders.ics",
+                                              "iCalendar (*.ics);;CSV (*.csv);;JSON lines (*.jsonl)")
+        if not path:
+            return
+        count = self.assistant.export_reminders(path)
+        if count is None:
+            QMessageBox.critical(self, "Error", f"Could not export reminders to {path}")
+        else:
+            self.status_label.setText(f"Exported {count} reminders")
+
     def handle_mic_click(self):
         self.voice_label.setText("Listening... Please speak now")
         self.status_label.setText("Listening...")
@@ -457,9 +575,6 @@ class VoiceCareUI(QMainWindow):
                     self.voice_label.setText(f"You said: '{result_text}' - Processing...")
                     self.status_label.setText("Command processed!")
                     self.status_label.setStyleSheet("color: #27ae60; padding: 5px;")
-                    
-                    # Refresh reminders after a short delay
-                    QTimer.singleShot(1000, self.refresh_reminders)
                 else:
                     self.voice_label.setText("Could not understand. Please try again.")
                     self.status_label.setText("Not understood")
@@ -25,7 +25,9 @@ class VoiceCareAssistant:
         self.recognizer = sr.Recognizer()
         self.microphone = sr.Microphone()
         self.tts_engine = pyttsx3.init()
-        self.scheduler = BackgroundScheduler()
+        # A reminder job that missed its time (suspend, clock change) still fires
+        # within five minutes of it; older ones are left to the missed summary
+        self.scheduler = BackgroundScheduler(job_defaults={'coalesce': True, 'misfire_grace_time': 300})
         self.scheduler.start()
         
         # Initialize pygame for sound effects
@@ -48,6 +50,15 @@ class VoiceCareAssistant:
         
         # Load existing reminders
         self.load_existing_reminders()
+        
+        # Move old done reminders to the archive every hour
+        self.scheduler.add_job(
+            func=self.cleanup_old_reminders,
+            trigger="interval",
+            minutes=60,
+            id="cleanup_job",
+            replace_existing=True
+        )
     
     def _tts_worker(self):
         """Worker thread for TTS queue processing"""
@@ -66,6 +77,13 @@ class VoiceCareAssistant:
         """Initialize SQLite database for reminders"""
         self.conn = sqlite3.connect('voicecare_reminders.db', check_same_thread=False)
         cursor = self.conn.cursor()
+        
+        # Let cleanup give free pages back to the file; an existing file
+        # needs one full VACUUM to switch
+        if cursor.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            cursor.execute('PRAGMA auto_vacuum = incremental')
+            cursor.execute('VACUUM')
+        
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS reminders (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -80,6 +98,21 @@ class VoiceCareAssistant:
                 original_id INTEGER DEFAULT NULL
             )
         ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS reminders_archive (
+                id INTEGER PRIMARY KEY,
+                task TEXT NOT NULL,
+                time TEXT NOT NULL,
+                date TEXT NOT NULL,
+                language TEXT DEFAULT 'en',
+                active INTEGER DEFAULT 0,
+                created_at TIMESTAMP,
+                recurring INTEGER DEFAULT 0,
+                remaining_days INTEGER DEFAULT 0,
+                original_id INTEGER DEFAULT NULL,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
         self.conn.commit()
     
     def setup_language_patterns(self):
@@ -103,6 +136,9 @@ class VoiceCareAssistant:
                     'no_reminders': "You have no reminders for today.",
                     'reminders_list': "You have {count} reminders today: {reminders}",
                     'reminder_triggered': "Reminder: {task}",
+                    'reminder_item': "{task} at {time}",
+                    'missed_summary': "While I was off, you missed {count} reminders: {reminders}.",
+                    'missed_more': "and {count} more",
                     'not_understood': "Sorry, I didn't get that. Can you repeat?",
                     'listening': "Press the blue button and speak your task.",
                     'ready': "VoiceCare is ready. How can I help you today?"
@@ -124,6 +160,9 @@ class VoiceCareAssistant:
                     'no_reminders': "आज के लिए कोई रिमाइंडर नहीं हैं।",
                     'reminders_list': "आज आपके {count} रिमाइंडर हैं: {reminders}",
                     'reminder_triggered': "रिमाइंडर: {task}",
+                    'reminder_item': "{time} बजे {task}",
+                    'missed_summary': "मेरे बंद रहने के दौरान आपके {count} रिमाइंडर छूट गए: {reminders}।",
+                    'missed_more': "और {count} अन्य",
                     'not_understood': "माफ़ कीजिए, मैं समझ नहीं पाया। कृपया दोहराएँ।",
                     'listening': "नीले बटन को दबाएँ और बोलें।",
                     'ready': "VoiceCare तैयार है। मैं आपकी कैसे मदद कर सकता हूँ?"
@@ -554,48 +593,107 @@ class VoiceCareAssistant:
             print(f"Error clearing reminders: {e}")
             self.status_label.config(text="Error clearing reminders", fg='#e74c3c')
     
-    def load_existing_reminders(self):
-        """Load and reschedule existing reminders from database"""
+    def load_existing_reminders(self, catch_up_minutes=120, catch_up_items=5):
+        """Load and reschedule existing reminders from database; reminders that came due in
+        the last catch_up_minutes while the app was off are announced in one summary"""
         try:
             cursor = self.conn.cursor()
+            now = datetime.datetime.now()
+            # 'YYYY-MM-DD HH:MM' strings sort like the times they stand for
+            now_key = now.strftime('%Y-%m-%d %H:%M')
+            since_key = (now - datetime.timedelta(minutes=catch_up_minutes)).strftime('%Y-%m-%d %H:%M')
             cursor.execute('''
-                SELECT id, task, time, date, language, recurring, remaining_days 
-                FROM reminders 
+                SELECT id, task, time, date, language, recurring
+                FROM reminders
                 WHERE active = 1 AND date >= ?
-            ''', (datetime.date.today().strftime('%Y-%m-%d'),))
+                ORDER BY date, time
+            ''', (since_key[:10],))
             
-            reminders = cursor.fetchall()
-            
-            for reminder_id, task, time_str, date_str, language, is_recurring, remaining_days in reminders:
-                try:
-                    # Parse the saved date and time
-                    reminder_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-                    reminder_time = datetime.datetime.strptime(time_str, '%H:%M').time()
-                    reminder_datetime = datetime.datetime.combine(reminder_date, reminder_time)
-                    
-                    # Only schedule if it's in the future
-                    if reminder_datetime > datetime.datetime.now():
+            scheduled = 0
+            missed = []
+            for reminder_id, task, time_str, date_str, language, is_recurring in cursor.fetchall():
+                key = f"{date_str} {time_str}"
+                if key > now_key:
+                    try:
                         self.scheduler.add_job(
                             func=self.trigger_reminder,
                             trigger="date",
-                            run_date=reminder_datetime,
+                            run_date=datetime.datetime.fromisoformat(key),
                             args=[task, language, reminder_id, bool(is_recurring)],
                             id=f"reminder_{reminder_id}"
                         )
-                        print(f"Loaded reminder: {task} at {reminder_datetime}")
-                    else:
-                        # Mark as inactive if time has passed
-                        cursor.execute('UPDATE reminders SET active = 0 WHERE id = ?', (reminder_id,))
-                        
-                except Exception as e:
-                    print(f"Error loading reminder {reminder_id}: {e}")
+                        scheduled += 1
+                    except Exception as e:
+                        print(f"Error loading reminder {reminder_id}: {e}")
+                elif key > since_key:
+                    missed.append((task, time_str, language))
             
+            # Everything whose time has passed goes inactive in one statement
+            cursor.execute(
+                "UPDATE reminders SET active = 0 WHERE active = 1 AND date <= ? AND date || ' ' || time <= ?",
+                (now_key[:10], now_key))
             self.conn.commit()
-            print(f"Loaded {len([r for r in reminders if datetime.datetime.combine(datetime.datetime.strptime(r[3], '%Y-%m-%d').date(), datetime.datetime.strptime(r[2], '%H:%M').time()) > datetime.datetime.now()])} active reminders")
+            
+            if missed:
+                language = missed[0][2] if missed[0][2] in self.patterns else 'en'
+                responses = self.patterns[language]['responses']
+                items = [responses['reminder_item'].format(
+                             task=task, time=datetime.time.fromisoformat(time_str).strftime('%I:%M %p'))
+                         for task, time_str, _ in missed[:catch_up_items]]
+                if len(missed) > catch_up_items:
+                    items.append(responses['missed_more'].format(count=len(missed) - catch_up_items))
+                self.speak(responses['missed_summary'].format(count=len(missed), reminders=", ".join(items)), language)
+            print(f"Loaded {scheduled} active reminders")
             
         except Exception as e:
             print(f"Error loading existing reminders: {e}")
     
+    def cleanup_old_reminders(self, retain_days=7, batch=200, budget_ms=200, vacuum_pages=256):
+        """Move done reminders older than retain_days to reminders_archive in small batches"""
+        try:
+            start = time.perf_counter()
+            deadline = start + budget_ms / 1000
+            cutoff = (datetime.date.today() - datetime.timedelta(days=retain_days)).strftime('%Y-%m-%d')
+            cursor = self.conn.cursor()
+            
+            # One short transaction per batch so triggers can write in between
+            moved = 0
+            finished = False
+            while time.perf_counter() < deadline:
+                ids = [row[0] for row in cursor.execute(
+                    'SELECT id FROM reminders WHERE active = 0 AND date < ? LIMIT ?', (cutoff, batch))]
+                if ids:
+                    marks = ','.join('?' * len(ids))
+                    cursor.execute(f'''
+                        INSERT OR REPLACE INTO reminders_archive
+                            (id, task, time, date, language, active, created_at, recurring, remaining_days, original_id)
+                        SELECT id, task, time, date, language, active, created_at, recurring, remaining_days, original_id
+                        FROM reminders WHERE id IN ({marks})
+                    ''', ids)
+                    cursor.execute(f'DELETE FROM reminders WHERE id IN ({marks})', ids)
+                    self.conn.commit()
+                    moved += len(ids)
+                if len(ids) < batch:
+                    finished = True
+                    break
+            
+            # incremental_vacuum frees one page per step, and the sqlite3
+            # module only steps a statement without results once
+            pages = 0
+            free = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+            while pages < min(free, vacuum_pages) and time.perf_counter() < deadline:
+                cursor.execute('PRAGMA incremental_vacuum(1)')
+                pages += 1
+            self.conn.commit()
+            cursor.execute('PRAGMA optimize').fetchall()
+            
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"Archived {moved} old reminders, reclaimed {pages} pages in {elapsed:.0f} ms"
+                  + ("" if finished else " (more next run)"))
+            
+        except Exception as e:
+            print(f"Error cleaning up old reminders: {e}")
+    
     def run(self):
         """Start the main application"""
         try:
@@ -0,0 +1,102 @@
+import datetime
+import time
+
+# SQLite builds before 3.32 allow at most 999 parameters per statement
+MAX_BATCH = 900
+
+
+class Compactor:
+    """Move old done reminders to the archive and give free pages back, a little at a time.
+
+    run() is called periodically from a scheduler thread. Each batch of
+    rows is copied to the archive by one writer command and, once that is
+    committed, deleted by another, so reminders being fired or marked done
+    are committed in between instead of waiting behind one big DELETE, and
+    a crash never leaves a row deleted but not archived. A run stops once
+    budget_ms has passed and leaves the rest for the next one. Afterwards
+    it releases up to vacuum_pages free pages per step with PRAGMA
+    incremental_vacuum (within the same budget) and runs PRAGMA optimize.
+
+    A file created before auto_vacuum was enabled has to be converted once
+    with a full VACUUM, which blocks every write while it runs; that is
+    enable_incremental_vacuum(), called at startup before the writer starts.
+    """
+
+    def __init__(self, db, repository, retain_days=7, batch=200, budget_ms=200, vacuum_pages=256):
+        self.db = db
+        self.repository = repository
+        self.writer = repository.writer
+        self.retain_days = retain_days
+        self.batch = min(batch, MAX_BATCH)
+        self.budget = budget_ms / 1000
+        self.vacuum_pages = vacuum_pages
+        self.last_report = None
+
+    def run(self, today=None):
+        """One time-boxed pass; returns a report dict"""
+        start = time.perf_counter()
+        deadline = start + self.budget
+
+        cutoff = (today or datetime.date.today()) - datetime.timedelta(days=self.retain_days)
+        moved = 0
+        finished = False
+        while time.perf_counter() < deadline:
+            ids = self.repository.archive_inactive_before(cutoff, self.batch).result()
+            if ids:
+                self.repository.delete_archived(ids).result()
+            moved += len(ids)
+            if len(ids) < self.batch:
+                finished = True
+                break
+
+        pages_before = self._pragma('page_count')
+        while time.perf_counter() < deadline:
+            freed = self.writer.submit(_incremental_vacuum, self.vacuum_pages).result()
+            if freed < self.vacuum_pages:
+                break
+        pages_reclaimed = pages_before - self._pragma('page_count')
+
+        self.writer.submit(_optimize).result()
+
+        self.last_report = {
+            'moved': moved,
+            'finished': finished,
+            'pages_reclaimed': pages_reclaimed,
+            'free_pages': self._pragma('freelist_count'),
+            'ms': (time.perf_counter() - start) * 1000,
+        }
+        return self.last_report
+
+    def _pragma(self, name):
+        return self.db.connection().execute(f'PRAGMA {name}').fetchone()[0]
+
+
+def enable_incremental_vacuum(conn):
+    """Convert a file created before auto_vacuum was enabled (a full VACUUM); returns whether it did.
+
+    VACUUM cannot run inside a transaction, so not through the writer: call
+    it before the writer starts, holding the database's write lock.
+    """
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return False
+    start = time.perf_counter()
+    conn.commit()
+    conn.execute('PRAGMA auto_vacuum = incremental')
+    conn.execute('VACUUM')
+    print(f"Enabled incremental auto_vacuum in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return True
+
+
+# Writer commands
+
+def _incremental_vacuum(conn, pages):
+    before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    # The sqlite3 module steps a statement without result columns only once,
+    # and incremental_vacuum frees one page per step
+    for _ in range(min(pages, before)):
+        conn.execute('PRAGMA incremental_vacuum(1)')
+    return before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+
+def _optimize(conn):
+    conn.execute('PRAGMA optimize').fetchall()
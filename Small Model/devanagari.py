@@ -0,0 +1,80 @@
+import unicodedata
+
+# Devanagari digits -> ASCII; joiners dropped; danda and stray punctuation become spaces
+TEXT_TABLE = str.maketrans({
+    **{chr(0x0966 + d): str(d) for d in range(10)},
+    '\u200c': None,  # zero-width non-joiner
+    '\u200d': None,  # zero-width joiner
+    '।': ' ',   # danda
+    '॥': ' ',   # double danda
+    ',': ' ',
+    '?': ' ',
+    '!': ' ',
+})
+
+# Spelling variants folded together when looking words up in the lexicon:
+# chandrabindu vs anusvara (पाँच/पांच) and nukta vs plain letter (साढ़े/साढे)
+FOLD_TABLE = str.maketrans({
+    'ँ': 'ं',
+    '़': None,
+})
+
+
+def fold(word):
+    """Lexicon key for a word: NFC with spelling variants folded"""
+    return unicodedata.normalize('NFC', word).translate(FOLD_TABLE)
+
+
+class DevanagariNormalizer:
+    """One-pass normalizer for Hindi/Marathi ASR or keyboard text.
+
+    NFC-normalizes the text, maps Devanagari digits to ASCII through a
+    translate table, and replaces number words from a precomputed lexicon:
+    "पाँच" -> "5", "साढ़े सात" -> "7:30", "पौने नौ" -> "8:45", "ढाई" -> "2:30".
+    Words listed as ambiguous (Hindi "दो" is also "give") are only converted
+    when followed by one of the unit words ("बजे", "दिन", ...).
+    """
+
+    def __init__(self, number_words, fractions=None, clock_words=None,
+                 ambiguous=None, unit_words=None):
+        self.numbers = {fold(w): v for w, v in number_words.items()}
+        self.fractions = {fold(w): (f['offset'], f['minute']) for w, f in (fractions or {}).items()}
+        self.clock_words = {fold(w): v for w, v in (clock_words or {}).items()}
+        self.ambiguous = {fold(w) for w in (ambiguous or [])}
+        self.unit_words = {fold(w) for w in (unit_words or [])}
+        # Every word that can take part in a number, a time or its unit
+        self.lexicon = set(self.numbers) | set(self.fractions) | set(self.clock_words) | self.unit_words
+
+    def number(self, token):
+        """Integer value of a digit string or number word, else None"""
+        if token.isdigit():
+            return int(token)
+        return self.numbers.get(fold(token))
+
+    def normalize(self, text):
+        text = unicodedata.normalize('NFC', text).translate(TEXT_TABLE)
+        tokens = text.split()
+        # Text is already NFC, so lexicon keys only need the fold table
+        keys = [token.translate(FOLD_TABLE) for token in tokens]
+        out = []
+        i = 0
+        while i < len(tokens):
+            key = keys[i]
+            following = keys[i + 1] if i + 1 < len(keys) else None
+
+            if key in self.fractions and following is not None:
+                # "साढ़े सात" -> 7:30, "पौने नौ" -> 8:45
+                value = int(following) if following.isdigit() else self.numbers.get(following)
+                if value is not None:
+                    offset, minute = self.fractions[key]
+                    out.append(f"{value + offset}:{minute:02d}")
+                    i += 2
+                    continue
+            if key in self.clock_words:
+                out.append(self.clock_words[key])
+            elif key in self.numbers and (key not in self.ambiguous or following in self.unit_words):
+                out.append(str(self.numbers[key]))
+            else:
+                out.append(tokens[i])
+            i += 1
+        return ' '.join(out)
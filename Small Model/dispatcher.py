@@ -0,0 +1,264 @@
+import collections
+import concurrent.futures
+import datetime
+import heapq
+import sys
+import threading
+import time
+
+from metrics import LatencyRecorder
+from timecodes import epoch_minute
+
+# Never sleep longer than this, so a changed wall clock is noticed eventually
+MAX_SLEEP = 60.0
+
+# Clock jumps kept for stats()
+JUMP_HISTORY = 32
+
+# Sorts after every reminder id due in the same minute
+LAST_ID = sys.maxsize
+
+
+class ReminderDispatcher:
+    """Fire reminders from one thread sleeping until the earliest due time.
+
+    Instead of one scheduler job per reminder, only the next few due
+    reminders are held in a min-heap. load(after, limit) must return up to
+    limit (due, reminder_id, key) tuples with key > after, in key order,
+    where key is a sortable (epoch minute, id) tuple -- an indexed query. The
+    heap holds every active reminder up to self.horizon; when it runs dry the
+    next batch is loaded, so startup and memory cost depend on the batch
+    size, not on how many reminders exist. fire(reminder_id) is called (on
+    the dispatcher thread) once each reminder is due. With fire_group, the
+    reminders due at once are passed together instead, so that they can be
+    announced together: group_by(reminder_ids) splits them into lists (one
+    per resident, say) and each list is one fire_group(reminder_ids) call
+    (without group_by, all of them are). group_seconds widens that to
+    reminders due up to that much later, which then fire early. They stay
+    active, so the dispatcher keeps the highest key it has fired and never
+    reloads from below it.
+
+    Sleeps are timed by the monotonic clock but due times are wall-clock
+    times, so the thread wakes at least every watch_seconds and compares
+    how far each clock moved. When they disagree by jump_seconds or more
+    (suspend and resume, an NTP step, a manual change) the heap is
+    re-planned from the database in one pass: reminders due within the
+    last misfire_grace_seconds still fire, older ones the jump skipped over
+    are handed to on_jump(before, now, skipped_until) as one range, to be
+    coalesced, and after a backwards jump nothing already fired fires
+    again. Each jump is kept with how late it was noticed and how long the
+    re-plan took (stats()).
+
+    With workers > 0, the dispatcher thread only hands each due reminder (or
+    group) to a pool of that many threads, which call fire(); a slow fire (a
+    busy database, TTS) then delays neither the other reminders due the same
+    minute nor the next wake. With 0, fire() runs on the dispatcher thread.
+    """
+
+    def __init__(self, load, fire, batch=64, watch_seconds=5.0, jump_seconds=2.0, misfire_grace_seconds=300,
+                 on_jump=None, clock=datetime.datetime.now, workers=0, fire_group=None, group_by=None,
+                 group_seconds=0):
+        self.load = load
+        self.fire = fire
+        self.fire_group = fire_group
+        self.group_by = group_by
+        self.group = datetime.timedelta(seconds=group_seconds)
+        self.batch = batch
+        self.watch = min(watch_seconds, MAX_SLEEP)
+        self.jump = jump_seconds
+        self.misfire_grace = datetime.timedelta(seconds=misfire_grace_seconds)
+        self.on_jump = on_jump
+        self.clock = clock
+        self.executor = (concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reminder-fire')
+                         if workers else None)
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopped = False
+        self.resume_after = None  # wall time a backwards jump left off at
+        self.last_fired = None  # highest key popped so far
+        self.last_check = None  # (wall, monotonic) at the last wake
+        self.skipped = None  # (before, now, skipped_until) waiting for on_jump
+        self.jumps = collections.deque(maxlen=JUMP_HISTORY)
+        self.replan_latency = LatencyRecorder('clock jump re-plan')
+        self._reset()
+
+    def _reset(self, after=None):
+        if after is None:
+            after = self.clock()
+            # Reminders up to where the clock was before it went back have fired already
+            if self.resume_after is not None:
+                if after < self.resume_after:
+                    after = self.resume_after
+                else:
+                    self.resume_after = None
+        self.heap = []
+        self.pending = {}  # reminder_id -> due; heap entries not matching are stale
+        self.horizon = (epoch_minute(after), LAST_ID)
+        # Reminders fired early (group_seconds) are still active until their due time
+        if self.last_fired is not None and self.last_fired > self.horizon:
+            self.horizon = self.last_fired
+        self.dirty = False
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='reminder-dispatcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    def add(self, reminder_id, due, key):
+        """Register a newly created reminder"""
+        with self.condition:
+            # Beyond the horizon it will be picked up by a later batch
+            if self.horizon is None or key <= self.horizon:
+                self._push(reminder_id, due)
+                self.condition.notify()
+
+    def cancel(self, reminder_id):
+        """Drop a reminder that should no longer fire (it stays in the heap until popped)"""
+        with self.condition:
+            self.pending.pop(reminder_id, None)
+
+    def reload(self):
+        """Forget the heap and reload from the database, e.g. after bulk inserts"""
+        with self.condition:
+            self.dirty = True
+            self.condition.notify()
+
+    def next_due(self):
+        """Earliest pending due time, or None"""
+        with self.condition:
+            self._refill()
+            return self.heap[0][0] if self.heap else None
+
+    def _push(self, reminder_id, due):
+        self.pending[reminder_id] = due
+        heapq.heappush(self.heap, (due, reminder_id))
+
+    def _refill(self):
+        if self.dirty:
+            self._reset()
+        # Skip cancelled entries so the heap top is live
+        while self.heap and self.pending.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        if self.heap or self.horizon is None:
+            return
+        rows = self.load(self.horizon, self.batch)
+        for due, reminder_id, key in rows:
+            self._push(reminder_id, due)
+        # A short batch means everything there is has been loaded
+        self.horizon = rows[-1][2] if len(rows) == self.batch else None
+
+    def _check_clock(self):
+        """Re-plan if the wall clock moved differently from the monotonic clock since the last wake"""
+        wall, monotonic = self.clock(), time.monotonic()
+        if self.last_check is not None:
+            before, last_monotonic = self.last_check
+            elapsed = monotonic - last_monotonic
+            drift = (wall - before).total_seconds() - elapsed
+            if abs(drift) >= self.jump:
+                self._replan(before, wall, drift, elapsed)
+        self.last_check = (wall, monotonic)
+
+    def _replan(self, before, now, drift, elapsed):
+        start = time.perf_counter()
+        # Fire what came due within the grace period; everything the jump skipped
+        # over before that goes to on_jump as one range
+        after = max(before, now - self.misfire_grace)
+        if now < before:
+            self.resume_after = before
+        if after > before:
+            self.skipped = (before, now, after)
+        self._reset(after)
+        self._refill()
+        replan_ms = (time.perf_counter() - start) * 1000
+        self.replan_latency.record(replan_ms)
+        # Noticed at most one wake interval after it happened
+        self.jumps.append({'at': now, 'seconds': drift, 'noticed_within_ms': elapsed * 1000,
+                           'replan_ms': replan_ms})
+        print(f"Clock jumped {drift:+.0f} s; re-planned reminders in {replan_ms:.1f} ms")
+
+    def stats(self):
+        """Clock jumps seen and re-plan timings"""
+        with self.condition:
+            return {'jumps': list(self.jumps), 'replan_ms': self.replan_latency.stats()}
+
+    def _take_due(self):
+        """Wait until something is due; return the due reminder ids (None once stopped)"""
+        while not self.stopped:
+            self._check_clock()
+            if self.skipped is not None:
+                return []
+            self._refill()
+            if not self.heap:
+                self.condition.wait(self.watch)
+                continue
+            now = self.clock()
+            due, reminder_id = self.heap[0]
+            if due > now:
+                self.condition.wait(min((due - now).total_seconds(), self.watch))
+                continue
+            ready = []
+            if self.fire_group is not None:
+                now += self.group
+            while True:
+                while self.heap and self.heap[0][0] <= now:
+                    due, reminder_id = heapq.heappop(self.heap)
+                    if self.pending.get(reminder_id) == due:
+                        del self.pending[reminder_id]
+                        ready.append(reminder_id)
+                        key = (epoch_minute(due), reminder_id)
+                        if self.last_fired is None or key > self.last_fired:
+                            self.last_fired = key
+                # More may be due than one batch holds; they belong to the same round
+                if self.heap or self.horizon is None:
+                    return ready
+                self._refill()
+        return None
+
+    def _run(self):
+        while True:
+            with self.condition:
+                ready = self._take_due()
+                skipped, self.skipped = self.skipped, None
+            if ready is None:
+                return
+            if skipped is not None and self.on_jump is not None:
+                try:
+                    self.on_jump(*skipped)
+                except Exception as e:
+                    print(f"Error handling clock jump: {e}")
+            if self.fire_group is not None:
+                calls = [(self.fire_group, group) for group in self._split(ready)]
+            else:
+                calls = [(self.fire, reminder_id) for reminder_id in ready]
+            for fire, arg in calls:
+                if self.executor is None:
+                    self._fire(fire, arg)
+                else:
+                    try:
+                        self.executor.submit(self._fire, fire, arg)
+                    except RuntimeError:
+                        return  # stopped meanwhile
+
+    def _split(self, ready):
+        """ready as the lists fire_group is called with"""
+        if not ready:
+            return []
+        if self.group_by is None:
+            return [ready]
+        try:
+            return [group for group in self.group_by(ready) if group]
+        except Exception as e:
+            print(f"Error grouping reminders {ready}: {e}")
+            return [ready]
+
+    def _fire(self, fire, arg):
+        try:
+            fire(arg)
+        except Exception as e:
+            print(f"Error firing reminder {arg}: {e}")
@@ -0,0 +1,190 @@
+import collections
+import re
+
+from metrics import LatencyRecorder
+
+TIME_TOKEN = re.compile(r'^(\d{1,2})(?::(\d{2}))?$')
+
+
+def trigrams(text):
+    """Character trigrams of a phrase, padded so word boundaries count"""
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyMatch:
+    """Result of a fuzzy intent match"""
+
+    def __init__(self, intent, score, anchor, slots=None, command=None):
+        self.intent = intent
+        self.score = score
+        self.anchor = anchor
+        self.slots = slots or {}
+        self.command = command
+
+    def __repr__(self):
+        return f"FuzzyMatch({self.intent!r}, score={self.score:.2f}, anchor={self.anchor!r}, command={self.command!r})"
+
+
+class FuzzyIntentMatcher:
+    """Score intents against ASR text through a trigram index of intent anchors.
+
+    Each anchor phrase ("remind me to", "my reminders", ...) is indexed by its
+    character trigrams once. At match time only the anchors sharing trigrams
+    with a window of the utterance are scored, so the cost grows with the
+    utterance length rather than with the number of templates. Slots are then
+    read from the words around the best anchor.
+    """
+
+    def __init__(self, config, intent_threshold=0.7, window_slack=1):
+        self.config = config
+        self.intent_threshold = intent_threshold
+        self.window_slack = window_slack
+        self.fillers = set(config.get('fillers', []))
+        self.time_words = set(config.get('time_words', []))
+        self.day_words = set(config.get('day_words', []))
+        self.am_words = {w.replace(' ', '') for w in config.get('am', [])}
+        self.pm_words = {w.replace(' ', '') for w in config.get('pm', [])}
+        self.latency = LatencyRecorder('fuzzy match')
+
+        # Precomputed index: trigram -> anchors containing it
+        self.anchors = []
+        self.index = collections.defaultdict(list)
+        for intent in ('set_reminder', 'query_schedule'):
+            for phrase in config.get(intent, []):
+                grams = trigrams(phrase)
+                anchor_id = len(self.anchors)
+                self.anchors.append((intent, phrase, len(phrase.split()), len(grams)))
+                for gram in grams:
+                    self.index[gram].append(anchor_id)
+
+        lengths = [words for _, _, words, _ in self.anchors] or [1]
+        self.min_window = max(1, min(lengths) - window_slack)
+        self.max_window = max(lengths) + window_slack
+
+    def clean(self, text):
+        """Drop filler words and immediately repeated words (not numbers: "10 10 am" is 10:10)"""
+        words = []
+        for word in text.lower().split():
+            if word in self.fillers:
+                continue
+            if words and words[-1] == word and not word.isdigit():
+                continue
+            words.append(word)
+        return ' '.join(words)
+
+    def noisy(self, text):
+        """Whether text has filler words or stutters, which the strict patterns would keep in the task"""
+        return self.clean(text) != ' '.join(text.lower().split())
+
+    def match(self, text):
+        """Return the best FuzzyMatch for text, or None"""
+        with self.latency.time():
+            return self._match(text)
+
+    def _match(self, text):
+        tokens = self.clean(text).split()
+        candidates = self._score_anchors(tokens)
+
+        for score, anchor_id, start, end in candidates:
+            intent, phrase, _, _ = self.anchors[anchor_id]
+            if intent == 'query_schedule':
+                return FuzzyMatch(intent, score, phrase)
+            slots = self._reminder_slots(tokens[end:])
+            if slots:
+                return FuzzyMatch(intent, score, phrase, slots, self._command(slots))
+        return None
+
+    def _score_anchors(self, tokens):
+        """All (score, anchor, start, end) above threshold, best first"""
+        best = {}
+        for start in range(len(tokens)):
+            for length in range(self.min_window, self.max_window + 1):
+                end = start + length
+                if end > len(tokens):
+                    break
+                grams = trigrams(' '.join(tokens[start:end]))
+                shared = collections.Counter()
+                for gram in grams:
+                    for anchor_id in self.index.get(gram, ()):
+                        shared[anchor_id] += 1
+                for anchor_id, common in shared.items():
+                    _, _, words, size = self.anchors[anchor_id]
+                    if abs(words - length) > self.window_slack:
+                        continue
+                    score = 2.0 * common / (len(grams) + size)
+                    if score < self.intent_threshold:
+                        continue
+                    if anchor_id not in best or score > best[anchor_id][0]:
+                        best[anchor_id] = (score, anchor_id, start, end)
+        # Highest score first; on ties prefer the earliest and longest anchor
+        return sorted(best.values(), key=lambda c: (-c[0], c[2], -(c[3] - c[2])))
+
+    def _reminder_slots(self, tokens):
+        """Read task, time and repeat count from the words after the anchor"""
+        tokens = list(tokens)
+
+        days = 0
+        for i in range(len(tokens) - 2):
+            if tokens[i] == 'for' and tokens[i + 1].isdigit() and tokens[i + 2] in self.day_words:
+                days = int(tokens[i + 1])
+                del tokens[i:i + 3]
+                break
+
+        time_at = self._find_time(tokens)
+        if time_at is None:
+            return None
+
+        hour_match = TIME_TOKEN.match(tokens[time_at])
+        hour = int(hour_match.group(1))
+        minute = int(hour_match.group(2)) if hour_match.group(2) else None
+        follow = time_at + 1
+        if minute is None and follow < len(tokens) and len(tokens[follow]) == 2 \
+                and tokens[follow].isdigit() and int(tokens[follow]) < 60:
+            minute = int(tokens[follow])
+            follow += 1
+
+        ampm = self._am_pm(tokens[follow:follow + 2])
+
+        task_end = time_at
+        if task_end > 0 and tokens[task_end - 1] in self.time_words:
+            task_end -= 1
+        task = ' '.join(tokens[:task_end]).strip()
+        if not task or hour > 23 or (minute or 0) > 59:
+            return None
+
+        return {'task': task, 'hour': hour, 'minute': minute or 0, 'ampm': ampm, 'days': days}
+
+    def _find_time(self, tokens):
+        """Index of the token holding the hour, preferring one after a time word"""
+        numbers = [i for i, token in enumerate(tokens) if i > 0 and TIME_TOKEN.match(token)]
+        if not numbers:
+            return None
+        for i in numbers:
+            if tokens[i - 1] in self.time_words:
+                return i
+        for i in numbers:
+            if self._am_pm(tokens[i + 1:i + 3]):
+                return i
+        return numbers[-1]
+
+    def _am_pm(self, tokens):
+        """'am'/'pm' if the next word(s) spell a meridiem marker ('p m', 'p.m.')"""
+        for count in (1, 2):
+            word = ''.join(tokens[:count])
+            if word in self.pm_words:
+                return 'pm'
+            if word in self.am_words:
+                return 'am'
+        return None
+
+    def _command(self, slots):
+        """Rewrite the slots as a command the strict patterns understand"""
+        command = self.config.get('command')
+        if not command:
+            return None
+        time_text = f"{slots['hour']}:{slots['minute']:02d}"
+        if slots['ampm']:
+            time_text += f" {slots['ampm']}"
+        repeat = self.config.get('repeat', '').format(days=slots['days']) if slots['days'] else ''
+        return command.format(task=slots['task'], time=time_text, repeat=repeat)
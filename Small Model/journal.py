@@ -0,0 +1,156 @@
+import json
+import time
+import zlib
+
+# Operations recorded for a reminder row
+INSERT = 'insert'
+UPDATE = 'update'
+DELETE = 'delete'
+
+# Reminder columns carried by each journal entry and snapshot row, in this order
+COLUMNS = ('id', 'profile_id', 'task', 'due', 'language', 'recurring', 'remaining_days', 'recurrence_id', 'active')
+
+_NEW = ', '.join(f'NEW.{column}' for column in COLUMNS[1:])
+_NOW = "CAST(strftime('%s', 'now') AS INTEGER)"
+
+# The journal is written by triggers, in the same transaction as the change,
+# so every writer (this process, transfer.py, another copy of the app) is covered
+TRIGGERS = {
+    'reminders_journal_insert': f'''
+        CREATE TRIGGER IF NOT EXISTS reminders_journal_insert AFTER INSERT ON reminders
+        BEGIN
+            INSERT INTO reminder_journal (op, reminder_id, {', '.join(COLUMNS[1:])}, at)
+            VALUES ('{INSERT}', NEW.id, {_NEW}, {_NOW});
+        END
+    ''',
+    'reminders_journal_update': f'''
+        CREATE TRIGGER IF NOT EXISTS reminders_journal_update AFTER UPDATE ON reminders
+        BEGIN
+            INSERT INTO reminder_journal (op, reminder_id, {', '.join(COLUMNS[1:])}, at)
+            VALUES ('{UPDATE}', NEW.id, {_NEW}, {_NOW});
+        END
+    ''',
+    'reminders_journal_delete': f'''
+        CREATE TRIGGER IF NOT EXISTS reminders_journal_delete AFTER DELETE ON reminders
+        BEGIN
+            INSERT INTO reminder_journal (op, reminder_id, at) VALUES ('{DELETE}', OLD.id, {_NOW});
+        END
+    ''',
+}
+
+SQL_TRIGGERS = "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'reminders_journal_%'"
+SQL_LAST_SEQ = 'SELECT COALESCE(MAX(seq), 0) FROM reminder_journal'
+SQL_ACTIVE_STATE = f'SELECT {", ".join(COLUMNS)} FROM reminders WHERE active = 1 ORDER BY id'
+SQL_INSERT_SNAPSHOT = 'INSERT OR REPLACE INTO reminder_snapshots (seq, created_at, reminders, data) VALUES (?, ?, ?, ?)'
+SQL_LATEST_SNAPSHOT = 'SELECT seq, data FROM reminder_snapshots ORDER BY seq DESC LIMIT 1'
+SQL_LAST_SNAPSHOT_SEQ = 'SELECT COALESCE(MAX(seq), 0) FROM reminder_snapshots'
+SQL_DROP_SNAPSHOTS = '''
+    DELETE FROM reminder_snapshots
+    WHERE seq NOT IN (SELECT seq FROM reminder_snapshots ORDER BY seq DESC LIMIT ?)
+'''
+SQL_TAIL = f'''
+    SELECT seq, op, reminder_id, {', '.join(COLUMNS[1:])} FROM reminder_journal
+    WHERE seq > ? ORDER BY seq LIMIT ?
+'''
+SQL_HISTORY = f'''
+    SELECT seq, op, at, {', '.join(COLUMNS[1:])} FROM reminder_journal
+    WHERE reminder_id = ? ORDER BY seq
+'''
+
+# Journal rows read per query while replaying
+REPLAY_BATCH = 10000
+
+
+class ReminderJournal:
+    """Optional append-only journal of every change to the reminders table, with snapshots.
+
+    While enabled, triggers append each inserted, updated or deleted
+    reminder row to reminder_journal under an increasing seq, so there is
+    a full history (history()) and a cursor another copy can sync from
+    (since()). snapshot() stores the active reminders, compressed, as of
+    the latest seq; state() rebuilds them from the latest snapshot plus
+    the journal after it, without reading the reminders table. The
+    reminders table stays what every query reads.
+    """
+
+    def __init__(self, db, writer, snapshot_every=50000, keep_snapshots=2):
+        self.db = db
+        self.writer = writer
+        self.snapshot_every = snapshot_every
+        self.keep_snapshots = keep_snapshots
+
+    def enable(self, conn, enabled=True):
+        """Create (or with enabled=False drop) the journal triggers on conn; commits.
+
+        Changes made while the journal was off are not in it, so turning it
+        on also takes a snapshot to start from.
+        """
+        if enabled == self.enabled(conn):
+            return
+        for name, sql in TRIGGERS.items():
+            conn.execute(sql if enabled else f'DROP TRIGGER IF EXISTS {name}')
+        if enabled:
+            _snapshot(conn, self.keep_snapshots)
+        conn.commit()
+
+    def enabled(self, conn=None):
+        names = {row[0] for row in (conn or self.db.connection()).execute(SQL_TRIGGERS)}
+        return names == set(TRIGGERS)
+
+    def last_seq(self):
+        return self.db.connection().execute(SQL_LAST_SEQ).fetchone()[0]
+
+    def snapshot(self):
+        """Queue a snapshot of the active reminders; the Future's result is (seq, reminders)"""
+        return self.writer.submit(_snapshot, self.keep_snapshots)
+
+    def maybe_snapshot(self):
+        """Snapshot if snapshot_every entries were journalled since the last one (run periodically);
+        returns (seq, reminders) or None"""
+        conn = self.db.connection()
+        if self.last_seq() - conn.execute(SQL_LAST_SNAPSHOT_SEQ).fetchone()[0] < self.snapshot_every:
+            return None
+        return self.snapshot().result()
+
+    def state(self, from_snapshot=True):
+        """Active reminders as {id: row} (row in COLUMNS order), from the latest snapshot and the
+        tail, or with from_snapshot=False by replaying the whole journal (complete only if
+        it has been on since the database was created)"""
+        conn = self.db.connection()
+        # One read transaction, so the snapshot and the tail agree
+        conn.execute('BEGIN')
+        try:
+            seq, rows = 0, {}
+            snapshot = conn.execute(SQL_LATEST_SNAPSHOT).fetchone() if from_snapshot else None
+            if snapshot is not None:
+                seq = snapshot[0]
+                rows = {row[0]: tuple(row) for row in json.loads(zlib.decompress(snapshot[1]))}
+            while True:
+                entries = conn.execute(SQL_TAIL, (seq, REPLAY_BATCH)).fetchall()
+                for entry in entries:
+                    if entry[1] == DELETE or not entry[-1]:
+                        rows.pop(entry[2], None)
+                    else:
+                        rows[entry[2]] = entry[2:]
+                if len(entries) < REPLAY_BATCH:
+                    return rows
+                seq = entries[-1][0]
+        finally:
+            conn.rollback()
+
+    def since(self, seq, limit=1000):
+        """Journal entries after seq, oldest first, for a copy following this one"""
+        return self.db.connection().execute(SQL_TAIL, (seq, limit)).fetchall()
+
+    def history(self, reminder_id):
+        """Every journalled version of one reminder: (seq, op, at, profile_id, task, ...)"""
+        return self.db.connection().execute(SQL_HISTORY, (reminder_id,)).fetchall()
+
+
+def _snapshot(conn, keep):
+    seq = conn.execute(SQL_LAST_SEQ).fetchone()[0]
+    rows = conn.execute(SQL_ACTIVE_STATE).fetchall()
+    data = zlib.compress(json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    conn.execute(SQL_INSERT_SNAPSHOT, (seq, int(time.time()), len(rows), data))
+    conn.execute(SQL_DROP_SNAPSHOTS, (keep,))
+    return seq, len(rows)
@@ -0,0 +1,140 @@
+import json
+import os
+import re
+import threading
+
+from devanagari import DevanagariNormalizer, fold
+
+# Word boundaries that also work for Devanagari, where vowel signs are not \w
+WORD_START = r'(?<!\S)'
+WORD_END = r'(?!\S)'
+
+
+class LanguagePacks:
+    """Language packs (patterns, number words, responses, TTS hints) read from JSON.
+
+    languages/index.json lists the available packs and the langdetect codes
+    that map to each. A pack file is only read and its regexes compiled the
+    first time that language is used, so packs nobody speaks cost nothing.
+    Packs are indexed like the old patterns dict: packs['hi']['responses'];
+    unknown codes (e.g. from old database rows) get the default pack.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.packs = {}
+        self.lock = threading.Lock()
+
+        with open(os.path.join(directory, 'index.json'), encoding='utf-8') as f:
+            index = json.load(f)
+        self.default = index.get('default', 'en')
+        self.files = {code: entry['file'] for code, entry in index['languages'].items()}
+        self.detect_codes = {}
+        for code, entry in index['languages'].items():
+            for detected in entry.get('detect', [code]):
+                self.detect_codes[detected] = code
+
+    def available(self):
+        return list(self.files)
+
+    def language_for(self, detected):
+        """Map a langdetect code to a pack code, falling back to the default"""
+        return self.detect_codes.get(detected, self.default)
+
+    def loaded(self):
+        """Codes of the packs that have been loaded so far"""
+        return list(self.packs)
+
+    def __contains__(self, code):
+        return code in self.files
+
+    def __getitem__(self, code):
+        if code not in self.files:
+            code = self.default
+        pack = self.packs.get(code)
+        if pack is None:
+            with self.lock:
+                pack = self.packs.get(code)
+                if pack is None:
+                    pack = self.load(code)
+                    self.packs[code] = pack
+        return pack
+
+    def load(self, code):
+        """Read and compile one pack"""
+        with open(os.path.join(self.directory, self.files[code]), encoding='utf-8') as f:
+            pack = json.load(f)
+
+        pack['code'] = code
+        pack['set_reminder'] = [re.compile(p, re.IGNORECASE) for p in pack.get('set_reminder', [])]
+        pack['query_schedule'] = [re.compile(p, re.IGNORECASE) for p in pack.get('query_schedule', [])]
+        if pack.get('repeat_pattern'):
+            pack['repeat_pattern'] = re.compile(pack['repeat_pattern'])
+        if pack.get('script') == 'devanagari':
+            # Digits, NFC variants and number words are handled in one pass
+            pack['normalizer'] = DevanagariNormalizer(
+                pack.get('number_words', {}),
+                fractions=pack.get('fractions'),
+                clock_words=pack.get('clock_words'),
+                ambiguous=pack.get('ambiguous_number_words'),
+                unit_words=pack.get('unit_words'))
+            pack['number_tokens'] = pack['normalizer'].lexicon
+        else:
+            pack['number_pattern'], pack['number_values'] = compile_number_words(
+                pack.get('number_words', {}), pack.get('tens', {}))
+            pack['number_tokens'] = set(pack['number_values'])
+        print(f"Loaded language pack: {pack.get('name', code)}")
+        return pack
+
+
+def compile_number_words(units, tens):
+    """Build one regex that replaces every number word in a single pass.
+
+    Compound tens ("twenty five", "thirty-one") are matched before single
+    words so they become one number.
+    """
+    values = dict(units)
+    values.update(tens)
+    if not values:
+        return None, values
+
+    def alternation(words):
+        # Longest first so "sixteen" wins over "six"
+        return '|'.join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+    parts = []
+    if tens:
+        small = [w for w, v in units.items() if 1 <= v <= 9]
+        parts.append(f"(?P<tens>{alternation(tens)})(?:[\\s-](?P<unit>{alternation(small)}))?")
+    parts.append(f"(?P<word>{alternation(values)})")
+    pattern = re.compile(WORD_START + '(?:' + '|'.join(parts) + ')' + WORD_END)
+    return pattern, values
+
+
+def replace_number_words(pack, text):
+    """Replace the pack's number words in text with digits"""
+    if 'normalizer' in pack:
+        return pack['normalizer'].normalize(text)
+    pattern = pack['number_pattern']
+    if pattern is None:
+        return text
+    values = pack['number_values']
+
+    def substitute(match):
+        if match.group('word'):
+            return str(values[match.group('word')])
+        number = values[match.group('tens')]
+        if match.group('unit'):
+            number += values[match.group('unit')]
+        return str(number)
+
+    return pattern.sub(substitute, text)
+
+
+def is_number_token(pack, token):
+    """True if token is a digit or may take part in a multi-word number ("twenty five", "साढ़े सात")"""
+    if token[:1].isdigit():
+        return True
+    if 'normalizer' in pack:
+        token = fold(token)
+    return token in pack['number_tokens']
@@ -0,0 +1,263 @@
+import os
+import pickle
+import sqlite3
+import struct
+import time
+import zlib
+
+from metrics import LatencyRecorder
+
+# Redo log frame header: payload length, CRC-32 of seq and payload, seq
+HEADER = struct.Struct('<IIQ')
+
+SQL_CREATE_STATE = '''
+    CREATE TABLE IF NOT EXISTS memory_store (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        redo_seq INTEGER NOT NULL
+    )
+'''
+SQL_INIT_STATE = 'INSERT OR IGNORE INTO memory_store (id, redo_seq) VALUES (1, 0)'
+SQL_REDO_SEQ = 'SELECT redo_seq FROM memory_store WHERE id = 1'
+SQL_SAVE_REDO_SEQ = 'UPDATE memory_store SET redo_seq = ? WHERE id = 1'
+
+# Statements that only read (or tune the connection) are not logged
+_READS = ('SELECT', 'PRAGMA', 'EXPLAIN')
+
+
+class MemoryStore:
+    """Keep the database in memory and persist it to its file now and then.
+
+    For devices whose storage wears out or stalls on every commit (an SD
+    card): the writer commits to a shared in-memory database (Database
+    opened on ':memory:'), and nothing touches the file per change except
+    a small redo log next to it (path + '-redo'). Every group commit's
+    statements are appended to it as one checksummed frame before anyone
+    waiting on the commit is told; with fsync=True each frame is also
+    fsynced, otherwise a power cut (not a crash) can lose the last few.
+
+    persist() copies the whole database into a temporary file with the
+    SQLite backup API, fsyncs it, renames it over the file and empties the
+    redo log; the redo position it covers is stored inside the copy, so a
+    crash at any point leaves the file plus the frames after that position.
+    open() loads the file and replays those frames, stopping at a torn one.
+    A frame that cannot be replayed (or a gap) also stops it, and then the
+    log is set aside, renamed with a timestamp, rather than truncated.
+    persist() runs on a timer, once the redo log passes redo_limit_kib, at
+    shutdown, and in place of a frame that cannot be appended.
+
+    While the app runs, the file is not the live database: changes written
+    to it by another process are overwritten by the next persist(). An
+    attached archive stays on disk; its statements are logged and replayed
+    too, which the compactor's INSERT OR REPLACE makes harmless.
+    """
+
+    def __init__(self, db, path, fsync=False, redo_limit_kib=1024):
+        self.db = db
+        self.path = path
+        self.redo_path = path + '-redo'
+        self.fsync = fsync
+        self.redo_limit = redo_limit_kib * 1024
+        self.redo = None
+        self.redo_bytes = 0
+        self.seq = 0
+        self.persisted_seq = None
+        self.frames = 0
+        self.fsyncs = 0
+        self.persists = 0
+        self.append_latency = LatencyRecorder('redo log append')
+        self.persist_latency = LatencyRecorder('persist to file')
+
+    def open(self):
+        """Load the file into memory and replay the redo log after it; returns frames replayed"""
+        conn = self.db.connection()
+        if os.path.exists(self.path):
+            source = sqlite3.connect(self.path)
+            try:
+                source.backup(conn)
+            finally:
+                source.close()
+        conn.execute(SQL_CREATE_STATE)
+        conn.execute(SQL_INIT_STATE)
+        conn.commit()
+        self.seq = self.persisted_seq = conn.execute(SQL_REDO_SEQ).fetchone()[0]
+
+        replayed, keep = 0, 0
+        if os.path.exists(self.redo_path):
+            with open(self.redo_path, 'rb') as f:
+                data = f.read()
+            stopped = None
+            for seq, statements, end in _frames(data):
+                # Frames up to the stored position are in the file already
+                if seq > self.seq + 1:
+                    stopped = f"frame {seq} follows frame {self.seq}"
+                    break
+                if seq == self.seq + 1:
+                    try:
+                        _replay(conn, statements)
+                    except Exception as e:
+                        stopped = f"frame {seq} could not be replayed ({e})"
+                        break
+                    self.seq = seq
+                    replayed += 1
+                keep = end
+            if stopped is not None:
+                # The frames after it may still matter to someone: keep them all
+                aside = f"{self.redo_path}.{time.strftime('%Y%m%d-%H%M%S')}"
+                os.replace(self.redo_path, aside)
+                print(f"Redo log {stopped}; stopped replaying and moved the log to {aside}")
+                keep = 0
+            elif keep < len(data):
+                print(f"Ignoring the last {len(data) - keep} bytes of the redo log (incomplete)")
+        self.redo = open(self.redo_path, 'ab')
+        self.redo.truncate(keep)
+        self.redo_bytes = keep
+        return replayed
+
+    def recorder(self, conn):
+        """conn, remembering the statements that change something (for the writer's commands)"""
+        return _Recorder(conn)
+
+    def append(self, statements):
+        """Log one committed batch's statements (on the writer thread, under its lock).
+
+        If the frame cannot be written, the whole database is persisted
+        instead; if that fails too, the error is raised and the batch is
+        not durable.
+        """
+        start = time.perf_counter()
+        self.seq += 1
+        payload = pickle.dumps(statements, protocol=4)
+        try:
+            self.redo.write(HEADER.pack(len(payload), _crc(self.seq, payload), self.seq) + payload)
+            self.redo.flush()
+            if self.fsync:
+                os.fsync(self.redo.fileno())
+                self.fsyncs += 1
+        except OSError as e:
+            # Drop a half-written frame, so the next one follows the last good one
+            self.seq -= 1
+            try:
+                self.redo.truncate(self.redo_bytes)
+            except OSError:
+                pass
+            print(f"Error writing the redo log ({e}); writing the database to its file instead")
+            self.persist(force=True)
+            return
+        self.redo_bytes += HEADER.size + len(payload)
+        self.frames += 1
+        self.append_latency.record((time.perf_counter() - start) * 1000)
+        if self.redo_bytes > self.redo_limit:
+            self.persist()
+
+    def persist(self, force=False):
+        """Write the database to its file if it changed since the last time (or force); returns
+        whether it did"""
+        with self.db.write_lock:
+            if not force and self.seq == self.persisted_seq and os.path.exists(self.path):
+                return False
+            start = time.perf_counter()
+            conn = self.db.connection()
+            conn.execute(SQL_SAVE_REDO_SEQ, (self.seq,))
+            conn.commit()
+
+            temporary = self.path + '.tmp'
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            target = sqlite3.connect(temporary)
+            try:
+                # The copy is made durable once, below, rather than page by page
+                target.execute('PRAGMA journal_mode = OFF')
+                target.execute('PRAGMA synchronous = OFF')
+                conn.backup(target)
+            finally:
+                target.close()
+            with open(temporary, 'rb+') as f:
+                os.fsync(f.fileno())
+            os.replace(temporary, self.path)
+            self.fsyncs += 1 + _fsync_directory(os.path.dirname(os.path.abspath(self.path)))
+
+            # Frames up to seq are in the file now
+            if self.redo is not None:
+                self.redo.truncate(0)
+                self.redo_bytes = 0
+            self.persisted_seq = self.seq
+            self.persists += 1
+            self.persist_latency.record((time.perf_counter() - start) * 1000)
+            return True
+
+    def close(self):
+        """Persist and close the redo log"""
+        self.persist()
+        if self.redo is not None:
+            self.redo.close()
+            self.redo = None
+
+    def stats(self):
+        return {'frames': self.frames, 'fsyncs': self.fsyncs, 'persists': self.persists,
+                'redo_bytes': self.redo_bytes, 'append_ms': self.append_latency.stats(),
+                'persist_ms': self.persist_latency.stats()}
+
+
+class _Recorder:
+    """A connection that also keeps (sql, params, many) for every statement that writes"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.statements = []
+
+    def execute(self, sql, params=()):
+        cursor = self.conn.execute(sql, params)
+        if not sql.lstrip().upper().startswith(_READS):
+            self.statements.append((sql, params, False))
+        return cursor
+
+    def executemany(self, sql, rows):
+        rows = list(rows)
+        cursor = self.conn.executemany(sql, rows)
+        self.statements.append((sql, rows, True))
+        return cursor
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+def _crc(seq, payload):
+    return zlib.crc32(payload, zlib.crc32(struct.pack('<Q', seq)))
+
+
+def _frames(data):
+    """(seq, statements, end offset) for each intact frame, up to the first torn one"""
+    offset = 0
+    while offset + HEADER.size <= len(data):
+        length, crc, seq = HEADER.unpack_from(data, offset)
+        payload = data[offset + HEADER.size:offset + HEADER.size + length]
+        if len(payload) < length or _crc(seq, payload) != crc:
+            return
+        offset += HEADER.size + length
+        yield seq, pickle.loads(payload), offset
+
+
+def _replay(conn, statements):
+    conn.execute('BEGIN')
+    try:
+        for sql, params, many in statements:
+            if many:
+                conn.executemany(sql, params)
+            else:
+                conn.execute(sql, params)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _fsync_directory(path):
+    """fsync a directory so a rename in it is durable; returns 1, or 0 where that is not possible"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return 0
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    return 1
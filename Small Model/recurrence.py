@@ -0,0 +1,72 @@
+import datetime
+
+FREQUENCIES = ('daily', 'weekdays', 'interval')
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def parse_date(value):
+    """date from a 'YYYY-MM-DD' string (None stays None)"""
+    if value is None or isinstance(value, datetime.date):
+        return value
+    return datetime.datetime.strptime(value, DATE_FORMAT).date()
+
+
+class RecurrenceRule:
+    """When a recurring reminder happens.
+
+    freq is 'daily', 'weekdays' (Monday to Friday) or 'interval' (every
+    interval days). The rule starts on start and ends after count
+    occurrences and/or on until; with neither it repeats forever.
+    Occurrences are numbered from 0 and computed on demand, so a year-long
+    rule costs no more to store than a one-day one.
+    """
+
+    def __init__(self, start, freq='daily', interval=1, count=None, until=None):
+        if freq not in FREQUENCIES:
+            raise ValueError(f"Unknown recurrence frequency: {freq}")
+        if interval < 1:
+            raise ValueError("Recurrence interval must be at least 1 day")
+        self.start = parse_date(start)
+        self.freq = freq
+        self.interval = interval if freq == 'interval' else 1
+        self.count = count
+        self.until = parse_date(until)
+
+    def occurrences(self, first=None, last=None):
+        """Yield (number, date) for occurrences between first and last (inclusive)"""
+        number, day = self._seek(first or self.start)
+        while ((last is None or day <= last)
+               and (self.until is None or day <= self.until)
+               and (self.count is None or number < self.count)):
+            yield number, day
+            number += 1
+            day = self._step(day)
+
+    def remaining(self, number):
+        """Occurrences left including occurrence number, or None if open-ended"""
+        if self.count is None:
+            return None
+        return max(self.count - number, 0)
+
+    def _seek(self, first):
+        """Number and date of the first occurrence on or after first"""
+        first = max(first, self.start)
+        if self.freq != 'weekdays':
+            number = -(-(first - self.start).days // self.interval)
+            return number, self.start + datetime.timedelta(days=number * self.interval)
+
+        while first.weekday() >= 5:
+            first += datetime.timedelta(days=1)
+        # Weekdays in [start, first): five per full week plus the leftover days
+        weeks, extra = divmod((first - self.start).days, 7)
+        number = weeks * 5 + sum(1 for d in range(extra)
+                                 if (self.start + datetime.timedelta(days=d)).weekday() < 5)
+        return number, first
+
+    def _step(self, day):
+        day += datetime.timedelta(days=self.interval)
+        if self.freq == 'weekdays':
+            while day.weekday() >= 5:
+                day += datetime.timedelta(days=1)
+        return day
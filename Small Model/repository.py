@@ -0,0 +1,447 @@
+import collections
+import datetime
+import threading
+
+import adherence
+from agenda import AgendaCache
+from events import REMINDERS_CHANGED
+from metrics import LatencyRecorder
+from profiles import DEFAULT_PROFILE
+from recurrence import DATE_FORMAT, RecurrenceRule, parse_date
+from timecodes import MINUTES_PER_DAY, day_number, day_range, epoch_minute
+
+Reminder = collections.namedtuple(
+    'Reminder', ['id', 'task', 'due', 'language', 'recurring', 'remaining_days', 'recurrence_id', 'active',
+                 'profile_id'])
+
+# Every statement is a fixed string, so sqlite3's per-connection statement
+# cache prepares each one once per thread and reuses it
+_COLUMNS = 'id, task, due, language, recurring, remaining_days, recurrence_id, active, profile_id'
+
+# Cached reads kept between commits (many single-reminder lookups between two commits)
+CACHE_SIZE = 256
+
+# Returned by a writer command in place of the (profile_id, day) pairs it changed
+ALL_DAYS = None
+
+SQL_GET = f'SELECT {_COLUMNS} FROM reminders WHERE id = ?'
+SQL_FOR_DAY = f'''
+    SELECT {_COLUMNS} FROM reminders
+    WHERE profile_id = ? AND active = 1 AND due >= ? AND due < ?
+    ORDER BY due
+'''
+SQL_ALL_ACTIVE = f'SELECT {_COLUMNS} FROM reminders WHERE profile_id = ? AND active = 1 ORDER BY due'
+SQL_DUE_AFTER = '''
+    SELECT id, due FROM reminders
+    WHERE active = 1 AND (due, id) > (?, ?)
+    ORDER BY due, id LIMIT ?
+'''
+SQL_ACTIVE_RECURRENCES = 'SELECT id FROM recurrences WHERE active = 1'
+
+SQL_INSERT = '''
+    INSERT INTO reminders (profile_id, task, time, date, language, due)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+SQL_INSERT_OCCURRENCE = '''
+    INSERT INTO reminders (id, profile_id, task, time, date, due, language, recurring, remaining_days, recurrence_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?, ?)
+'''
+SQL_INSERT_RECURRENCE = '''
+    INSERT INTO recurrences (profile_id, task, time, language, freq, interval_days, start_date, until_date, count)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+SQL_GET_RECURRENCE = '''
+    SELECT profile_id, task, time, language, freq, interval_days, start_date, until_date, count, expanded_until
+    FROM recurrences WHERE id = ? AND active = 1
+'''
+SQL_ACTIVE_TASK = 'SELECT profile_id, task, due FROM reminders WHERE id = ? AND active = 1'
+SQL_MARK_DONE = 'UPDATE reminders SET active = 0 WHERE id = ?'
+SQL_ACTIVE_FOR_DAY = 'SELECT id, profile_id, task, due FROM reminders WHERE profile_id = ? AND active = 1 AND due >= ? AND due < ?'
+SQL_CLEAR_DAY = 'UPDATE reminders SET active = 0 WHERE profile_id = ? AND active = 1 AND due >= ? AND due < ?'
+SQL_EXPIRED = 'SELECT id, profile_id, task, due FROM reminders WHERE active = 1 AND due <= ?'
+SQL_EXPIRE = 'UPDATE reminders SET active = 0 WHERE active = 1 AND due <= ?'
+SQL_OVERDUE = f'''
+    SELECT {_COLUMNS} FROM reminders r
+    WHERE active = 1 AND due > ? AND due <= ?
+      AND NOT EXISTS (SELECT 1 FROM reminder_events e WHERE e.reminder_id = r.id AND e.kind = '{adherence.ANNOUNCED}')
+    ORDER BY due
+'''
+SQL_ARCHIVE_IDS = 'SELECT id FROM reminders WHERE active = 0 AND due < ? ORDER BY due LIMIT ?'
+# Bulk imports give rows explicit ids following the table's AUTOINCREMENT
+# counter, so one executemany can be followed by their adherence events
+SQL_LAST_ID = "SELECT seq FROM sqlite_sequence WHERE name = ?"
+SQL_IMPORT = '''
+    INSERT INTO reminders (id, profile_id, task, time, date, language, due)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+SQL_IMPORT_RECURRENCE = '''
+    INSERT INTO recurrences (id, profile_id, task, time, language, freq, interval_days, start_date, until_date, count)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_ARCHIVE_COLUMNS = ('id, task, time, date, language, active, created_at, recurring, remaining_days, '
+                    'original_id, recurrence_id, due, profile_id')
+
+
+class ReminderRepository:
+    """Every reminder query and change, for the backend and the window alike.
+
+    Reads run on the calling thread's connection and return Reminder tuples.
+    Reminders belong to a resident's profile (profiles.py), and the day and
+    list reads are per profile. A day's reminders come from that profile's
+    AgendaCache; each change reports the (profile, day) pairs it touched,
+    and only those are dropped. Everything active and
+    single reminders are cached until the next commit. The writer notifies
+    the repository after each commit, before the changed data is handed
+    back to anyone waiting for it. Changes go through the DatabaseWriter
+    and return its Futures.
+
+    After each commit that changed a day, and whenever another process has
+    written to the database, a REMINDERS_CHANGED event is published on
+    events (if given) with the changed days and profiles (None: any).
+
+    Changes that matter for adherence (a reminder scheduled, announced,
+    acknowledged or missed) are also logged through adherence.record() in
+    the same transaction.
+
+    Each named query keeps a LatencyRecorder; stats() reports them with the
+    cache hit rate.
+    """
+
+    def __init__(self, db, writer, events=None):
+        self.db = db
+        self.writer = writer
+        self.events = events
+        self.lock = threading.Lock()
+        self.cache = {}
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.timings = collections.OrderedDict()
+        self.agendas = {}  # profile_id -> AgendaCache
+        # (profile_id, day) pairs changed by commands since the last commit (writer thread only)
+        self.touched = set()
+        self.touched_all = False
+        writer.add_listener(self.invalidate)
+
+    def invalidate(self, external=False):
+        """Forget cached reads (called by the writer after each commit or outside change)"""
+        with self.lock:
+            self.generation += 1
+            self.cache.clear()
+        touched, self.touched = self.touched, set()
+        if external or self.touched_all:
+            self.touched_all = False
+            for agenda in list(self.agendas.values()):
+                agenda.invalidate_all()
+            days = profiles = None
+        elif touched:
+            by_profile = collections.defaultdict(list)
+            for profile_id, day in touched:
+                by_profile[profile_id].append(day)
+            for profile_id, changed in by_profile.items():
+                agenda = self.agendas.get(profile_id)
+                if agenda is not None:
+                    agenda.invalidate(changed)
+            days = {day for _, day in touched}
+            profiles = set(by_profile)
+        else:
+            return
+        if self.events is not None:
+            self.events.publish(REMINDERS_CHANGED, days=days, profiles=profiles)
+
+    def rollover(self, today):
+        """At midnight: drop past agendas and prefetch today's and tomorrow's (for profiles already shown)"""
+        for agenda in list(self.agendas.values()):
+            agenda.rollover(day_number(today))
+
+    def _agenda(self, profile_id):
+        agenda = self.agendas.get(profile_id)
+        if agenda is None:
+            with self.lock:
+                agenda = self.agendas.get(profile_id)
+                if agenda is None:
+                    agenda = self.agendas[profile_id] = AgendaCache(
+                        lambda day: self._load_day(profile_id, day))
+        return agenda
+
+    def _change(self, conn, command, *args):
+        """Run a writer command and note the days it changed"""
+        result, days = command(conn, *args)
+        if days is ALL_DAYS:
+            self.touched_all = True
+        else:
+            self.touched.update(days)
+        return result
+
+    def _submit(self, command, *args):
+        return self.writer.submit(self._change, command, *args)
+
+    def _query(self, name, sql, params=()):
+        recorder = self.timings.get(name)
+        if recorder is None:
+            recorder = self.timings.setdefault(name, LatencyRecorder(name))
+        with recorder.time():
+            return self.db.connection().execute(sql, params).fetchall()
+
+    def _cached(self, name, sql, params=()):
+        key = (name, params)
+        with self.lock:
+            generation = self.generation
+            if key in self.cache:
+                self.hits += 1
+                return self.cache[key]
+            self.misses += 1
+        rows = tuple(Reminder(*row) for row in self._query(name, sql, params))
+        with self.lock:
+            # Not stored if a commit landed while reading
+            if self.generation == generation:
+                if len(self.cache) >= CACHE_SIZE:
+                    self.cache.clear()
+                self.cache[key] = rows
+        return rows
+
+    # Reads
+
+    def get(self, reminder_id):
+        """One reminder (done or not), or None"""
+        rows = self._cached('get', SQL_GET, (reminder_id,))
+        return rows[0] if rows else None
+
+    def for_day(self, date, profile_id=DEFAULT_PROFILE):
+        """A resident's active reminders on a date, by time"""
+        return self._agenda(profile_id).get(day_number(date))
+
+    def _load_day(self, profile_id, day):
+        start = day * MINUTES_PER_DAY
+        rows = self._query('for_day', SQL_FOR_DAY, (profile_id, start, start + MINUTES_PER_DAY))
+        return tuple(Reminder(*row) for row in rows)
+
+    def all_active(self, profile_id=DEFAULT_PROFILE):
+        """Every active reminder of a resident, by time"""
+        return self._cached('all_active', SQL_ALL_ACTIVE, (profile_id,))
+
+    def due_after(self, after, limit):
+        """Up to limit (due, id) pairs of active reminders after the (due, id) key"""
+        return [(due, reminder_id) for reminder_id, due in self._query('due_after', SQL_DUE_AFTER, (*after, limit))]
+
+    def active_recurrence_ids(self):
+        return [recurrence_id for (recurrence_id,) in self._query('active_recurrences', SQL_ACTIVE_RECURRENCES)]
+
+    # Changes (Futures from the writer)
+
+    def add(self, task, time_str, date, language, due, profile_id=DEFAULT_PROFILE):
+        """Insert a single reminder; the Future's result is its id"""
+        return self._submit(_insert_reminder, (profile_id, task, time_str, date.strftime(DATE_FORMAT), language, due))
+
+    def add_recurrence(self, task, time_str, language, rule, profile_id=DEFAULT_PROFILE):
+        """Store a recurrence rule; the Future's result is its id"""
+        return self._submit(_insert_recurrence, (
+            profile_id, task, time_str, language, rule.freq, rule.interval, rule.start.strftime(DATE_FORMAT),
+            rule.until.strftime(DATE_FORMAT) if rule.until else None, rule.count))
+
+    def import_batch(self, reminders, rules, window_days):
+        """Insert many reminders and rules in one command; the Future's result is (reminder count, rule ids).
+
+        reminders are (profile_id, task, time, date, language, due) and rules
+        (profile_id, task, time, language, rule) tuples; the rules are
+        expanded window_days ahead in the same transaction.
+        """
+        return self._submit(_import_batch, window_days, reminders, [
+            (profile_id, task, time_str, language, rule.freq, rule.interval, rule.start.strftime(DATE_FORMAT),
+             rule.until.strftime(DATE_FORMAT) if rule.until else None, rule.count)
+            for profile_id, task, time_str, language, rule in rules])
+
+    def expand_recurrence(self, recurrence_id, today, window_days):
+        """Add a rule's occurrences up to window_days from today; the Future's result is True if days were added"""
+        return self._submit(_expand_recurrence, recurrence_id, today, window_days)
+
+    def announce(self, reminder_id):
+        """Log that a reminder was spoken; it stays active until acknowledged or missed"""
+        return self._submit(_announce, reminder_id)
+
+    def mark_done(self, reminder_id):
+        """Acknowledge a reminder; the Future's result is 1, or 0 if it was no longer active"""
+        return self._submit(_mark_done, reminder_id)
+
+    def clear_day(self, date, profile_id=DEFAULT_PROFILE):
+        """Mark a resident's active reminders on a day done; the Future's result is their ids"""
+        return self._submit(_clear_day, date, profile_id)
+
+    def expire(self, now):
+        """Mark everything due up to now missed; the Future's result is how many"""
+        return self._submit(_expire, now)
+
+    def catch_up(self, since, now):
+        """Log active reminders due after since and up to now, and not yet announced, as announced;
+        the Future's result is them, by time"""
+        return self._submit(_catch_up, since, now)
+
+    def archive_inactive_before(self, day, limit):
+        """Copy up to limit done reminders due before a date to the archive; the Future's result is
+        their ids. Remove them with delete_archived() once that Future is done: a commit spanning
+        both files is not atomic in WAL mode, so the two must not share one"""
+        return self._submit(_archive_inactive_before, day, limit)
+
+    def delete_archived(self, reminder_ids):
+        """Delete done reminders that are in the archive; the Future's result is how many"""
+        return self._submit(_delete_archived, reminder_ids)
+
+    def stats(self):
+        """Per-query timings and cache hit counts"""
+        with self.lock:
+            hits, misses = self.hits, self.misses
+        agenda = collections.Counter()
+        for cache in list(self.agendas.values()):
+            agenda.update(cache.stats())
+        return {
+            'queries': {name: recorder.stats() for name, recorder in self.timings.items()},
+            'cache_hits': hits,
+            'cache_misses': misses,
+            'agenda': {'profiles': len(self.agendas), 'days': agenda['days'],
+                       'hits': agenda['hits'], 'misses': agenda['misses']},
+        }
+
+
+# Writer commands: run on the writer thread inside its transaction and
+# return (result, (profile_id, day) pairs changed)
+
+def _insert_reminder(conn, params):
+    profile_id, task, due = params[0], params[1], params[-1]
+    reminder_id = conn.execute(SQL_INSERT, params).lastrowid
+    adherence.record(conn, adherence.SCHEDULED, [(reminder_id, profile_id, task, due)])
+    return reminder_id, [(profile_id, due // MINUTES_PER_DAY)]
+
+
+def _insert_recurrence(conn, params):
+    return conn.execute(SQL_INSERT_RECURRENCE, params).lastrowid, []
+
+
+def _next_id(conn, table):
+    row = conn.execute(SQL_LAST_ID, (table,)).fetchone()
+    return (row[0] if row else 0) + 1
+
+
+def _import_batch(conn, window_days, reminders, rules):
+    first = _next_id(conn, 'reminders')
+    rows = [(reminder_id, *params) for reminder_id, params in enumerate(reminders, first)]
+    conn.executemany(SQL_IMPORT, rows)
+    adherence.record(conn, adherence.SCHEDULED, [(row[0], row[1], row[2], row[-1]) for row in rows])
+    days = {(row[1], row[-1] // MINUTES_PER_DAY) for row in rows}
+
+    first = _next_id(conn, 'recurrences')
+    rule_ids = list(range(first, first + len(rules)))
+    conn.executemany(SQL_IMPORT_RECURRENCE, [(rule_id, *params) for rule_id, params in zip(rule_ids, rules)])
+    today = datetime.date.today()
+    for rule_id in rule_ids:
+        days.update(_expand_recurrence(conn, rule_id, today, window_days)[1])
+    return (len(rows), rule_ids), days
+
+
+def _announce(conn, reminder_id):
+    row = conn.execute(SQL_ACTIVE_TASK, (reminder_id,)).fetchone()
+    if row is None:
+        return 0, []
+    adherence.record(conn, adherence.ANNOUNCED, [(reminder_id, *row)])
+    return 1, []
+
+
+def _mark_done(conn, reminder_id):
+    row = conn.execute(SQL_ACTIVE_TASK, (reminder_id,)).fetchone()
+    if row is None:
+        return 0, []
+    conn.execute(SQL_MARK_DONE, (reminder_id,))
+    adherence.record(conn, adherence.ACKNOWLEDGED, [(reminder_id, *row)])
+    profile_id, _, due = row
+    return 1, [(profile_id, due // MINUTES_PER_DAY)]
+
+
+def _clear_day(conn, date, profile_id):
+    params = (profile_id, *day_range(date))
+    cleared = conn.execute(SQL_ACTIVE_FOR_DAY, params).fetchall()
+    if cleared:
+        conn.execute(SQL_CLEAR_DAY, params)
+        adherence.record(conn, adherence.CANCELLED, cleared)
+    return [reminder_id for reminder_id, _, _, _ in cleared], [(profile_id, day_number(date))]
+
+
+def _expire(conn, now):
+    cutoff = epoch_minute(now)
+    expired = conn.execute(SQL_EXPIRED, (cutoff,)).fetchall()
+    if not expired:
+        return 0, []
+    conn.execute(SQL_EXPIRE, (cutoff,))
+    adherence.record(conn, adherence.MISSED, expired)
+    return len(expired), {(profile_id, due // MINUTES_PER_DAY) for _, profile_id, _, due in expired}
+
+
+def _catch_up(conn, since, now):
+    reminders = [Reminder(*row) for row in conn.execute(SQL_OVERDUE, (epoch_minute(since), epoch_minute(now)))]
+    adherence.record(conn, adherence.ANNOUNCED, [(reminder.id, reminder.profile_id, reminder.task, reminder.due)
+                                                 for reminder in reminders])
+    # Still active, so nothing changes on screen
+    return reminders, []
+
+
+def _archive_inactive_before(conn, date, limit):
+    ids = [reminder_id for (reminder_id,) in conn.execute(SQL_ARCHIVE_IDS, (epoch_minute(date), limit))]
+    if ids:
+        marks = ', '.join('?' * len(ids))
+        # Copied again if a crash came before the delete, hence OR REPLACE
+        conn.execute(f'''
+            INSERT OR REPLACE INTO archive.reminders_archive ({_ARCHIVE_COLUMNS})
+            SELECT {_ARCHIVE_COLUMNS} FROM reminders WHERE id IN ({marks})
+        ''', ids)
+    return ids, []
+
+
+def _delete_archived(conn, reminder_ids):
+    if not reminder_ids:
+        return 0, []
+    marks = ', '.join('?' * len(reminder_ids))
+    deleted = conn.execute(f'''
+        DELETE FROM reminders
+        WHERE active = 0 AND id IN (SELECT id FROM archive.reminders_archive WHERE id IN ({marks}))
+    ''', reminder_ids).rowcount
+    # Done reminders are in no agenda
+    return deleted, []
+
+
+def _expand_recurrence(conn, recurrence_id, today, window_days):
+    # Read and extend the window in one command so two threads never expand twice
+    row = conn.execute(SQL_GET_RECURRENCE, (recurrence_id,)).fetchone()
+    if row is None:
+        return False, []
+    profile_id, task, time_str, language, freq, interval_days, start_date, until_date, count, expanded_until = row
+    rule = RecurrenceRule(start_date, freq, interval_days, count, until_date)
+
+    today = today or datetime.date.today()
+    last = today + datetime.timedelta(days=window_days - 1)
+    first = today
+    if expanded_until:
+        first = max(first, parse_date(expanded_until) + datetime.timedelta(days=1))
+
+    days = []
+    if first <= last:
+        # An occurrence whose time has already passed today is not added
+        hours, minutes = time_str.split(':')
+        minute_of_day = int(hours) * 60 + int(minutes)
+        now = epoch_minute(datetime.datetime.now())
+        rows = []
+        reminder_id = _next_id(conn, 'reminders')
+        for number, day in rule.occurrences(first, last):
+            due = epoch_minute(day) + minute_of_day
+            if due > now:
+                rows.append((reminder_id, profile_id, task, time_str, day.strftime(DATE_FORMAT), due, language,
+                             rule.remaining(number) or 0, recurrence_id))
+                reminder_id += 1
+        # Explicit ids, as for imports, so one executemany is followed by the events
+        conn.executemany(SQL_INSERT_OCCURRENCE, rows)
+        adherence.record(conn, adherence.SCHEDULED, [(row[0], profile_id, task, row[5]) for row in rows])
+        days = [(profile_id, row[5] // MINUTES_PER_DAY) for row in rows]
+        conn.execute('UPDATE recurrences SET expanded_until = ? WHERE id = ?',
+                     (last.strftime(DATE_FORMAT), recurrence_id))
+
+    # Retire the rule once its last occurrence has been expanded
+    if next(rule.occurrences(last + datetime.timedelta(days=1)), None) is None:
+        conn.execute('UPDATE recurrences SET active = 0 WHERE id = ?', (recurrence_id,))
+    return first <= last, days
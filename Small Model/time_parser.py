@@ -0,0 +1,35 @@
+import re
+
+CLOCK = re.compile(r'^(\d{1,2})(?::(\d{2}))?$')
+
+
+def parse_clock(token):
+    """'7' -> (7, 0), '7:30' -> (7, 30), anything else -> None"""
+    match = CLOCK.match(token or '')
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2) or 0)
+
+
+def to_24_hour(hour, period=None, assume_pm_before=0):
+    """Convert a spoken hour to 0-23.
+
+    period is 'am', 'pm', 'night' or None. Without a period, hours from 1 up
+    to (but not including) assume_pm_before are taken as afternoon, which is
+    what people usually mean by "remind me at 4".
+    """
+    if period == 'pm':
+        if hour < 12:  # 12 PM is already correct
+            hour += 12
+    elif period == 'am':
+        if hour == 12:  # 12 AM should be 0
+            hour = 0
+    elif period == 'night':
+        # "रात 10 बजे" is 22:00 but "रात 2 बजे" is 02:00
+        if 5 <= hour < 12:
+            hour += 12
+        elif hour == 12:
+            hour = 0
+    elif 1 <= hour < assume_pm_before:
+        hour += 12
+    return hour
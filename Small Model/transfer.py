@@ -0,0 +1,424 @@
+"""Bulk import and export of reminders: CSV, JSON lines and iCalendar.
+
+    python transfer.py import prescriptions.csv [--resident R0001]
+    python transfer.py export reminders.ics [--resident R0001]
+
+Both stream: records are read, checked and inserted a chunk at a time, and
+exports are written row by row from the cursor, so memory does not grow
+with the file. Can run while the assistant is running: both take SQLite's
+write lock before each change (the writer's BEGIN IMMEDIATE), so neither
+fails on the other's commits (benchmarks/bench_import.py checks this), and
+the assistant notices the new reminders within its poll_external_ms.
+"""
+import argparse
+import collections
+import csv
+import datetime
+import functools
+import json
+import os
+import re
+import sys
+import time
+
+from profiles import DEFAULT_PROFILE
+from recurrence import DATE_FORMAT, RecurrenceRule, parse_date
+from timecodes import epoch_minute
+
+# Columns of a CSV file and keys of a JSON line; task, date and time are
+# required. repeat is empty for a one-off reminder, or 'daily', 'weekdays' or
+# 'interval' (every interval days) for a rule ending after count occurrences
+# and/or on until. resident is a profile's resident_id.
+FIELDS = ('task', 'date', 'time', 'language', 'resident', 'repeat', 'interval', 'count', 'until')
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.ics': 'ics'}
+
+# Records per writer command: large enough for executemany to pay off, small
+# enough that a reminder firing meanwhile waits for one chunk, not the file
+CHUNK_ROWS = 5000
+
+# Problems quoted in an ImportReport (all of them are counted)
+MAX_ERRORS = 20
+
+TIME_FORMATS = ('%H:%M', '%I:%M %p', '%I:%M%p', '%I %p', '%I%p', '%H:%M:%S')
+
+ImportReport = collections.namedtuple('ImportReport', ['reminders', 'rules', 'skipped', 'errors', 'seconds'])
+
+# One-off reminders (occurrences of rules are exported as their rule), then rules
+_EXPORT_REMINDERS = '''
+    SELECT 'reminder-' || r.id, r.task, r.date, r.time, r.language, p.resident_id, NULL, NULL, NULL, NULL
+    FROM reminders r LEFT JOIN profiles p ON p.id = r.profile_id
+    WHERE {} r.active = 1 AND r.recurrence_id IS NULL
+    ORDER BY r.due
+'''
+_EXPORT_RULES = '''
+    SELECT 'rule-' || q.id, q.task, q.start_date, q.time, q.language, p.resident_id,
+           q.freq, q.interval_days, q.count, q.until_date
+    FROM recurrences q LEFT JOIN profiles p ON p.id = q.profile_id
+    WHERE {} q.active = 1
+    ORDER BY q.id
+'''
+SQL_EXPORT_REMINDERS = _EXPORT_REMINDERS.format('')
+SQL_EXPORT_RULES = _EXPORT_RULES.format('')
+SQL_EXPORT_PROFILE_REMINDERS = _EXPORT_REMINDERS.format('r.profile_id = ? AND')
+SQL_EXPORT_PROFILE_RULES = _EXPORT_RULES.format('q.profile_id = ? AND')
+
+# iCalendar (RFC 5545): recurrence rules this app can store
+_RRULES = {
+    'daily': 'FREQ=DAILY',
+    'weekdays': 'FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR',
+    'interval': 'FREQ=DAILY;INTERVAL={interval}',
+}
+_ICS_ESCAPES = re.compile(r'\\(.)')
+
+
+def format_for(path):
+    """'csv', 'jsonl' or 'ics' from a file name"""
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Unknown file type {path!r}: use .csv, .jsonl or .ics")
+    return fmt
+
+
+# Reading: each reader yields (line number, record dict with FIELDS keys)
+
+def _read_csv(f):
+    reader = csv.DictReader(f)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def _read_jsonl(f):
+    for number, line in enumerate(f, 1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+
+
+def _unfold(f):
+    """Logical iCalendar lines (continuations joined) with the line they start on"""
+    start, current = 0, None
+    for number, line in enumerate(f, 1):
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield start, current
+        start, current = number, line
+    if current:
+        yield start, current
+
+
+def _ics_text(value):
+    return _ICS_ESCAPES.sub(lambda m: '\n' if m.group(1) in 'nN' else m.group(1), value)
+
+
+def _ics_start(value):
+    """(date, time) strings from a DTSTART value; UTC times become local ones"""
+    if 'T' not in value:
+        raise ValueError("all-day event has no time")
+    if value.endswith('Z'):
+        moment = datetime.datetime.strptime(value, '%Y%m%dT%H%M%SZ').replace(tzinfo=datetime.timezone.utc)
+        moment = moment.astimezone().replace(tzinfo=None)
+    else:
+        moment = datetime.datetime.strptime(value[:15], '%Y%m%dT%H%M%S')
+    return moment.strftime(DATE_FORMAT), moment.strftime('%H:%M')
+
+
+def _ics_rule(value, record):
+    parts = dict(part.split('=', 1) for part in value.split(';') if '=' in part)
+    freq, interval = parts.get('FREQ'), int(parts.get('INTERVAL', 1))
+    if freq == 'DAILY':
+        record['repeat'] = 'interval' if interval > 1 else 'daily'
+        record['interval'] = interval
+    elif freq == 'WEEKLY' and interval == 1 and parts.get('BYDAY') == 'MO,TU,WE,TH,FR':
+        record['repeat'] = 'weekdays'
+    else:
+        raise ValueError(f"unsupported RRULE {value}")
+    record['count'] = parts.get('COUNT')
+    if 'UNTIL' in parts:
+        record['until'] = datetime.datetime.strptime(parts['UNTIL'][:8], '%Y%m%d').strftime(DATE_FORMAT)
+
+
+def _read_ics(f):
+    event = None
+    for number, line in _unfold(f):
+        name, _, value = line.partition(':')
+        name, _, params = name.partition(';')
+        name = name.upper()
+        if name == 'BEGIN' and value == 'VEVENT':
+            event, start = {}, number
+        elif event is None:
+            continue
+        elif name == 'END' and value == 'VEVENT':
+            try:
+                if 'DTSTART' in event:
+                    event['date'], event['time'] = _ics_start(event.pop('DTSTART'))
+                if 'RRULE' in event:
+                    _ics_rule(event.pop('RRULE'), event)
+            except ValueError as e:
+                event = str(e)
+            yield start, event
+            event = None
+        elif name == 'SUMMARY':
+            event['task'] = _ics_text(value)
+        elif name in ('DTSTART', 'RRULE'):
+            event[name] = value
+        elif name == 'X-VOICECARE-LANGUAGE':
+            event['language'] = value
+        elif name == 'X-VOICECARE-RESIDENT':
+            event['resident'] = _ics_text(value)
+
+
+READERS = {'csv': _read_csv, 'jsonl': _read_jsonl, 'ics': _read_ics}
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_date(value):
+    # Lists repeat the same few dates and times, and strptime is slow
+    return parse_date(value)
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_time(value):
+    for pattern in TIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(value.upper(), pattern).strftime('%H:%M')
+        except ValueError:
+            pass
+    raise ValueError(f"bad time {value!r}")
+
+
+def parse_record(record, residents, profile_id, now):
+    """('reminder', params) or ('rule', params) for ReminderRepository.import_batch; ValueError if unusable.
+
+    residents maps resident ids to profile ids; records without one belong
+    to profile_id. One-off reminders due before the epoch minute now are
+    refused.
+    """
+    if isinstance(record, str):
+        raise ValueError(record)
+    if not isinstance(record, dict):
+        raise ValueError("not a record")
+    fields = {key: str(record.get(key) or '').strip() for key in FIELDS}
+    if not fields['task']:
+        raise ValueError("no task")
+    if fields['resident']:
+        if fields['resident'] not in residents:
+            raise ValueError(f"unknown resident {fields['resident']!r}")
+        profile_id = residents[fields['resident']]
+    date = _parse_date(fields['date'])
+    time_str = _parse_time(fields['time'])
+    language = fields['language'] or 'en'
+
+    if fields['repeat']:
+        rule = RecurrenceRule(date, fields['repeat'], int(fields['interval'] or 1),
+                              int(fields['count']) if fields['count'] else None, fields['until'] or None)
+        return 'rule', (profile_id, fields['task'], time_str, language, rule)
+
+    hours, minutes = time_str.split(':')
+    due = epoch_minute(date) + int(hours) * 60 + int(minutes)
+    if due < now:
+        raise ValueError("already past")
+    return 'reminder', (profile_id, fields['task'], time_str, date.strftime(DATE_FORMAT), language, due)
+
+
+def import_file(repository, profiles, path, fmt=None, profile_id=DEFAULT_PROFILE, window_days=2,
+                chunk_rows=CHUNK_ROWS, on_batch=None):
+    """Stream a file's records into the database; returns an ImportReport.
+
+    Each chunk of chunk_rows records is one writer command (one executemany
+    per table, rules expanded window_days ahead), committed before the next
+    is read, so other changes never queue behind more than one.
+    on_batch(reminders, rule_ids) is called after each commit, e.g. to
+    reload the dispatcher. Records that cannot be used are skipped and
+    reported, not fatal.
+    """
+    start = time.perf_counter()
+    reader = READERS[fmt or format_for(path)]
+    residents = {profile.resident_id: profile.id for profile in profiles.all() if profile.resident_id}
+    now = epoch_minute(datetime.datetime.now())
+    totals = collections.Counter()
+    errors = []
+
+    def collect(future):
+        count, rule_ids = future.result()
+        totals['reminders'] += count
+        totals['rules'] += len(rule_ids)
+        if on_batch:
+            on_batch(count, rule_ids)
+
+    reminders, rules = [], []
+    with open(path, encoding='utf-8', newline='') as f:
+        for number, record in reader(f):
+            try:
+                kind, params = parse_record(record, residents, profile_id, now)
+            except (ValueError, TypeError) as e:
+                totals['skipped'] += 1
+                if len(errors) < MAX_ERRORS:
+                    errors.append(f"line {number}: {e}")
+                continue
+            (reminders if kind == 'reminder' else rules).append(params)
+            if len(reminders) + len(rules) >= chunk_rows:
+                collect(repository.import_batch(reminders, rules, window_days))
+                reminders, rules = [], []
+    if reminders or rules:
+        collect(repository.import_batch(reminders, rules, window_days))
+    return ImportReport(totals['reminders'], totals['rules'], totals['skipped'], errors,
+                        time.perf_counter() - start)
+
+
+# Writing: each writer takes a file and an iterator of (uid, record dict)
+
+def _write_csv(f, records):
+    writer = csv.DictWriter(f, FIELDS)
+    writer.writeheader()
+    for _, record in records:
+        writer.writerow(record)
+
+
+def _write_jsonl(f, records):
+    for _, record in records:
+        f.write(json.dumps({key: value for key, value in record.items() if value is not None},
+                           ensure_ascii=False) + '\n')
+
+
+def _ics_escape(value):
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _fold(line):
+    """Split a content line into 75-octet pieces, never inside a UTF-8 character"""
+    data = line.encode('utf-8')
+    pieces, limit = [], 75
+    while len(data) > limit:
+        cut = limit
+        while data[cut] & 0xC0 == 0x80:
+            cut -= 1
+        pieces.append(data[:cut].decode('utf-8'))
+        data, limit = data[cut:], 74  # continuations start with a space
+    pieces.append(data.decode('utf-8'))
+    return '\r\n '.join(pieces)
+
+
+def _ics_lines(records):
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    yield 'BEGIN:VCALENDAR'
+    yield 'VERSION:2.0'
+    yield 'PRODID:-//VoiceCare//Reminders//EN'
+    for uid, record in records:
+        yield 'BEGIN:VEVENT'
+        yield f"UID:{uid}@voicecare"
+        yield f"DTSTAMP:{stamp}"
+        yield f"DTSTART:{record['date'].replace('-', '')}T{record['time'].replace(':', '')}00"
+        yield f"SUMMARY:{_ics_escape(record['task'])}"
+        if record['repeat']:
+            rrule = _RRULES[record['repeat']].format(interval=record['interval'])
+            if record['count']:
+                rrule += f";COUNT={record['count']}"
+            if record['until']:
+                rrule += f";UNTIL={record['until'].replace('-', '')}"
+            yield f"RRULE:{rrule}"
+        if record['language']:
+            yield f"X-VOICECARE-LANGUAGE:{record['language']}"
+        if record['resident']:
+            yield f"X-VOICECARE-RESIDENT:{_ics_escape(record['resident'])}"
+        yield 'END:VEVENT'
+    yield 'END:VCALENDAR'
+
+
+def _write_ics(f, records):
+    for line in _ics_lines(records):
+        f.write(_fold(line) + '\r\n')
+
+
+WRITERS = {'csv': _write_csv, 'jsonl': _write_jsonl, 'ics': _write_ics}
+
+
+def export_records(conn, profile_id=None):
+    """Yield (uid, record) for active one-off reminders and rules of one profile, or everyone's"""
+    if profile_id is None:
+        queries = ((SQL_EXPORT_REMINDERS, ()), (SQL_EXPORT_RULES, ()))
+    else:
+        queries = ((SQL_EXPORT_PROFILE_REMINDERS, (profile_id,)), (SQL_EXPORT_PROFILE_RULES, (profile_id,)))
+    for sql, params in queries:
+        for uid, *values in conn.execute(sql, params):
+            yield uid, dict(zip(FIELDS, values))
+
+
+def export_file(db, path, fmt=None, profile_id=None):
+    """Write active reminders and rules to a file as they are read; returns how many records"""
+    writer = WRITERS[fmt or format_for(path)]
+    conn = db.connection()
+    count = 0
+
+    def counted(records):
+        nonlocal count
+        for record in records:
+            count += 1
+            yield record
+
+    # One read transaction, so reminders and rules come from the same snapshot
+    conn.execute('BEGIN')
+    try:
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer(f, counted(export_records(conn, profile_id)))
+    finally:
+        conn.rollback()
+    return count
+
+
+def main():
+    from database import Database
+    from profiles import ProfileRegistry
+    from repository import ReminderRepository
+    from schema import migrate
+    from voicecare_settings import load_settings
+    from writer import DatabaseWriter
+
+    parser = argparse.ArgumentParser(description="Import or export VoiceCare reminders")
+    parser.add_argument('action', choices=('import', 'export'))
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=sorted(set(FORMATS.values())))
+    parser.add_argument('--resident', help="resident_id of the profile to import for or export")
+    parser.add_argument('--db', default='voicecare_reminders.db')
+    args = parser.parse_args()
+
+    settings = load_settings()
+    db = Database(args.db, **settings['database'])
+    with db.write_lock:
+        migrate(db.connection())
+    writer = DatabaseWriter(db, **settings['writer'])
+    writer.start()
+    repository = ReminderRepository(db, writer)
+    profiles = ProfileRegistry(db, writer)
+    try:
+        profile_id = None
+        if args.resident:
+            matches = [profile.id for profile in profiles.all() if profile.resident_id == args.resident]
+            if not matches:
+                print(f"No profile with resident id {args.resident}")
+                return 1
+            profile_id = matches[0]
+        if args.action == 'import':
+            report = import_file(repository, profiles, args.path, args.format, profile_id or DEFAULT_PROFILE,
+                                 settings['recurrence']['window_days'], settings['transfer']['chunk_rows'])
+            print(f"Imported {report.reminders} reminders and {report.rules} recurring reminders "
+                  f"in {report.seconds:.1f} s; skipped {report.skipped}")
+            for error in report.errors:
+                print(f"  {error}")
+        else:
+            count = export_file(db, args.path, args.format, profile_id)
+            print(f"Exported {count} reminders to {args.path}")
+        return 0
+    finally:
+        writer.stop()
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,9 @@
-import sqlite3
 import speech_recognition as sr
 import pyttsx3
 import threading
 import datetime
-import re
 import json
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
 import time
 import os
@@ -15,17 +14,38 @@ import pyaudio
 import queue
 import logging
 
+from adherence import AdherenceLog
+from fuzzy_intent import FuzzyIntentMatcher
+from incremental_parser import IncrementalCommandParser
+from journal import ReminderJournal
+from language_packs import LanguagePacks, replace_number_words
+from memory_store import MemoryStore
+from metrics import LatencyRecorder
+from compaction import Compactor, enable_incremental_vacuum
+from database import Database
+from dispatcher import ReminderDispatcher
+from events import REMINDERS_CHANGED, EventBus
+from profiles import DEFAULT_PROFILE, ProfileRegistry
+from recurrence import RecurrenceRule
+from repository import ReminderRepository
+from schema import create_archive, migrate
+from timecodes import epoch_minute, format_time, to_datetime
+from time_parser import to_24_hour
+from transfer import export_file, import_file
+from voicecare_settings import load_settings
+from writer import DatabaseWriter, log_failure
+
 logger = logging.getLogger(__name__)
 
+DB_PATH = 'voicecare_reminders.db'
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
 class VoiceCareAssistant:
     def __init__(self):
         # Initialize components
-        # Get the directory where this script is located
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-
         # Build model paths relative to this file
-        model_en_path = os.path.join(base_dir, "vosk", "vosk-model-small-en-us-0.15")
-        model_hi_path = os.path.join(base_dir, "vosk", "vosk-model-small-hi-0.22")
+        model_en_path = os.path.join(BASE_DIR, "vosk", "vosk-model-small-en-us-0.15")
+        model_hi_path = os.path.join(BASE_DIR, "vosk", "vosk-model-small-hi-0.22")
         
         # Check if models exist before loading
         if os.path.exists(model_en_path):
@@ -45,7 +65,19 @@ class VoiceCareAssistant:
         self.recognizer = sr.Recognizer()
         self.microphone = sr.Microphone()
         self.tts_engine = pyttsx3.init()
-        self.scheduler = BackgroundScheduler()
+        self.setup_speech()
+        
+        # User-tunable settings (voicecare_settings.json)
+        self.settings = load_settings()
+        
+        # Periodic jobs only; reminders are fired by the dispatcher. By default a
+        # job missed during a suspend or clock change (midnight rollover included)
+        # runs once, however late, instead of being skipped or repeated
+        scheduler = self.settings['scheduler']
+        self.scheduler = BackgroundScheduler(
+            executors={'default': ThreadPoolExecutor(scheduler['pool_size'])},
+            job_defaults={'coalesce': scheduler['coalesce'],
+                          'misfire_grace_time': scheduler['misfire_grace_seconds']})
         self.scheduler.start()
         
         # Initialize pygame for sound effects
@@ -56,6 +88,7 @@ class VoiceCareAssistant:
         
         # Database setup
         self.setup_database()
+        self.setup_dispatcher()
         
         # Language patterns
         self.setup_language_patterns()
@@ -68,75 +101,213 @@ class VoiceCareAssistant:
         
         # Load existing reminders
         self.load_existing_reminders()
-    
-    def setup_database(self):
-        """Initialize SQLite database for reminders"""
-        self.conn = sqlite3.connect('voicecare_reminders.db', check_same_thread=False)
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS reminders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                task TEXT NOT NULL,
-                time TEXT NOT NULL,
-                date TEXT NOT NULL,
-                language TEXT DEFAULT 'en',
-                active INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                recurring INTEGER DEFAULT 0,
-                remaining_days INTEGER DEFAULT 0,
-                original_id INTEGER DEFAULT NULL
+        
+        # Announced reminders nobody acknowledged count as missed
+        self.scheduler.add_job(
+            func=self.mark_missed,
+            trigger="interval",
+            minutes=self.settings['adherence']['sweep_minutes'],
+            id="missed_job",
+            replace_existing=True
+        )
+        
+        # Archive old reminders in the background
+        self.scheduler.add_job(
+            func=self.cleanup_old_reminders,
+            trigger="interval",
+            minutes=self.settings['compaction']['interval_minutes'],
+            id="cleanup_job",
+            replace_existing=True
+        )
+        
+        # Write the in-memory database to its file now and then
+        if self.memory_store is not None:
+            self.scheduler.add_job(
+                func=self.persist_database,
+                trigger="interval",
+                minutes=self.settings['memory_store']['persist_minutes'],
+                id="persist_job",
+                replace_existing=True
             )
-        ''')
-        self.conn.commit()
+        
+        # Snapshot the journal once enough has been added to it
+        if self.settings['journal']['enabled']:
+            self.scheduler.add_job(
+                func=self.snapshot_journal,
+                trigger="interval",
+                minutes=self.settings['journal']['check_minutes'],
+                id="journal_job",
+                replace_existing=True
+            )
+        
+        # Start firing reminders as they come due
+        self.dispatcher.start()
+    
+    def setup_database(self, db_path=DB_PATH):
+        """Open the SQLite reminders database and bring its schema up to date"""
+        # Each thread gets its own connection; file databases run in WAL mode.
+        # Archived reminders live in a second file, attached as 'archive'.
+        archive_path = db_path if db_path == ':memory:' else os.path.splitext(db_path)[0] + '_archive.db'
+        # Or (memory_store.enabled) the database lives in memory, and the file is
+        # only written now and then, plus a small redo log per commit
+        memory = self.settings['memory_store']
+        self.memory_store = None
+        if memory['enabled'] and db_path != ':memory:':
+            self.db = Database(':memory:', attach={'archive': archive_path}, **self.settings['database'])
+            self.memory_store = MemoryStore(self.db, db_path, fsync=memory['fsync_redo'],
+                                            redo_limit_kib=memory['redo_limit_kib'])
+            replayed = self.memory_store.open()
+            if replayed:
+                print(f"Recovered {replayed} commits from the redo log")
+        else:
+            self.db = Database(db_path, attach={'archive': archive_path}, **self.settings['database'])
+        # Versioned migrations (schema.py); older files are upgraded in place
+        with self.db.write_lock:
+            migrate(self.conn)
+            create_archive(self.conn)
+            # An older file is converted once, now, rather than by a compaction
+            # run while reminders are firing (in memory there is nothing to give back)
+            if self.settings['database']['auto_vacuum'] == 'incremental' and not self.db.uri:
+                enable_incremental_vacuum(self.conn)
+        # Every later change goes through the writer thread, in group commits
+        self.writer = DatabaseWriter(self.db, redo=self.memory_store, **self.settings['writer'])
+        self.writer.start()
+        # All reminder queries and changes, shared with the window, which
+        # follows changes through the event bus
+        self.events = EventBus()
+        self.repository = ReminderRepository(self.db, self.writer, self.events)
+        # Residents served by this process; voice commands and the window act
+        # for current_profile, the dispatcher announces everyone's reminders
+        self.profiles = ProfileRegistry(self.db, self.writer, self.events)
+        self.current_profile = DEFAULT_PROFILE
+        # What was taken, missed or only announced, for caregiver reports
+        self.adherence = AdherenceLog(self.db)
+        # Old done reminders move to the archive in small background batches
+        compaction = self.settings['compaction']
+        self.compactor = Compactor(self.db, self.repository, retain_days=compaction['retain_days'],
+                                   batch=compaction['batch'], budget_ms=compaction['budget_ms'],
+                                   vacuum_pages=compaction['vacuum_pages'])
+        # Optional history of every reminder change, with snapshots (journal.py)
+        journal = self.settings['journal']
+        self.journal = ReminderJournal(self.db, self.writer, snapshot_every=journal['snapshot_every'],
+                                       keep_snapshots=journal['keep_snapshots'])
+        with self.db.write_lock:
+            self.journal.enable(self.conn, journal['enabled'])
+        # Changes made above (migrations, recovery) are not in the redo log
+        if self.memory_store is not None:
+            self.memory_store.persist(force=True)
+    
+    @property
+    def conn(self):
+        """The calling thread's database connection (queries belong in self.repository)"""
+        return self.db.connection()
+    
+    def setup_dispatcher(self):
+        """Create the next-due reminder dispatcher (started once reminders are loaded)"""
+        dispatcher = self.settings['dispatcher']
+        self.dispatcher = ReminderDispatcher(self.due_reminders, self.dispatch_reminder,
+                                             batch=dispatcher['batch'],
+                                             watch_seconds=dispatcher['watch_seconds'],
+                                             jump_seconds=dispatcher['jump_seconds'],
+                                             misfire_grace_seconds=dispatcher['misfire_grace_seconds'],
+                                             on_jump=self.on_clock_jump,
+                                             workers=dispatcher['workers'],
+                                             fire_group=self.dispatch_reminders,
+                                             group_by=self.group_reminders,
+                                             group_seconds=dispatcher['group_seconds'])
+        # Due time to announcement, per reminder fired
+        self.trigger_latency = LatencyRecorder('reminder announcement delay')
+        self.catch_up_hold = None
+        # Another process (an import, say) may have added reminders
+        self.events.subscribe(REMINDERS_CHANGED, self.on_reminders_changed)
+    
+    def on_reminders_changed(self, days, profiles):
+        """Reload the dispatcher when changes are not known in detail (another process wrote)"""
+        if days is None:
+            self.dispatcher.reload()
+    
+    def due_reminders(self, after, limit):
+        """Next active reminders after the (due, id) key, for the dispatcher"""
+        return [(to_datetime(due), reminder_id, (due, reminder_id))
+                for due, reminder_id in self.repository.due_after(after, limit)]
+    
+    def on_clock_jump(self, before, now, skipped_until):
+        """The clock jumped forward past reminders (suspend, clock change): summarise them
+        instead of firing them all at once (called on the dispatcher thread)"""
+        caught_up = self.catch_up(before, skipped_until)
+        print(f"Clock jumped from {before:%H:%M} to {now:%H:%M}; {len(caught_up)} reminders summarised")
+    
+    def dispatch_reminder(self, reminder_id):
+        """Announce a due reminder unless it was marked done meanwhile"""
+        reminder = self.repository.get(reminder_id)
+        if reminder is None or not reminder.active:
+            return
+        self.trigger_reminder(reminder.task, reminder.language, reminder_id, bool(reminder.recurring),
+                              profile=self.profiles.get(reminder.profile_id), due=reminder.due)
+        if reminder.recurrence_id is not None:
+            # Keep the rule's window rolling, without waiting for the writer
+            self.expand_recurrence(reminder.recurrence_id, wait=False)
+    
+    def announcement_group(self, reminder):
+        """(profile, language) a reminder is announced with; reminders due together that
+        share it are announced in one sentence"""
+        profile = self.profiles.get(reminder.profile_id)
+        return profile, reminder.language or (profile and profile.language) or 'en'
+    
+    def group_reminders(self, reminder_ids):
+        """Split reminders that came due together into one list per resident and language,
+        for the dispatcher: each list is announced by its own pool thread"""
+        groups = {}
+        for reminder_id in reminder_ids:
+            reminder = self.repository.get(reminder_id)
+            if reminder is None or not reminder.active:
+                continue
+            profile, language = self.announcement_group(reminder)
+            groups.setdefault((reminder.profile_id, language), []).append(reminder_id)
+        return list(groups.values())
+    
+    def dispatch_reminders(self, reminder_ids):
+        """Announce reminders that came due together: one announcement per resident and
+        language, each reminder still logged (and acknowledged) on its own"""
+        groups = {}
+        for reminder_id in reminder_ids:
+            # Read again: one may have been marked done while waiting for a pool thread
+            reminder = self.repository.get(reminder_id)
+            if reminder is None or not reminder.active:
+                continue
+            profile, language = self.announcement_group(reminder)
+            groups.setdefault((reminder.profile_id, language), (profile, []))[1].append(reminder)
+        for (profile_id, language), (profile, reminders) in groups.items():
+            if len(reminders) == 1:
+                reminder = reminders[0]
+                self.trigger_reminder(reminder.task, language, reminder.id, bool(reminder.recurring),
+                                      profile=profile, due=reminder.due)
+            else:
+                self.trigger_reminders(reminders, language, profile)
+            for reminder in reminders:
+                if reminder.recurrence_id is not None:
+                    self.expand_recurrence(reminder.recurrence_id, wait=False)
     
     def setup_language_patterns(self):
         """Setup multilingual patterns for intent recognition"""
-        self.patterns = {
-            'en': {
-                'set_reminder': [
-                    r'remind me to (.+) at (\d{1,2}):?(\d{0,2})?\s*(am|pm|a\.m\.|p\.m\.|o\'clock)?(\s+for\s+(\d+)\s+days)?',
-                    r'set reminder for (.+) at (\d{1,2}):?(\d{0,2})?\s*(am|pm|a\.m\.|p\.m\.|o\'clock)?(\s+for\s+(\d+)\s+days)?',
-                    r'remember (.+) at (\d{1,2}):?(\d{0,2})?\s*(am|pm|a\.m\.|p\.m\.|o\'clock)?(\s+for\s+(\d+)\s+days)?'
-                ],
-                'query_schedule': [
-                    r'what do i have today',
-                    r'my reminders',
-                    r'what are my tasks',
-                    r'schedule for today'
-                ],
-                'responses': {
-                    'reminder_set': "Got it. I will remind you at {time} to {task}.",
-                    'reminder_set_recurring': "Got it. I will remind you at {time} to {task} for the next {days} days.",
-                    'no_reminders': "You have no reminders for today.",
-                    'reminders_list': "You have {count} reminders today: {reminders}",
-                    'reminder_triggered': "Reminder: {task}",
-                    'not_understood': "Sorry, I didn't get that. Can you repeat?",
-                    'listening': "Press the blue button and speak your task.",
-                    'ready': "VoiceCare is ready. How can I help you today?"
-                }
-            },
-            'hi': {
-                'set_reminder': [
-                    r'मुझे (.+) की याद दिलाओ (\d{1,2}):?(\d{0,2})\s*(am|pm|सुबह|शाम)?(\s+(\d+)\s+दिन)?',
-                    r'(.+) के लिए रिमाइंडर सेट करो (\d{1,2}):?(\d{0,2})\s*(am|pm|सुबह|शाम)?(\s+(\d+)\s+दिन)?'
-                ],
-                'query_schedule': [
-                    r'आज मेरे रिमाइंडर क्या हैं',
-                    r'मेरी अनुसूची',
-                    r'मेरे कार्य'
-                ],
-                'responses': {
-                    'reminder_set': "ठीक है, {time} बजे आपको {task} याद दिलाऊँगा।",
-                    'reminder_set_recurring': "ठीक है, {time} बजे {task} अगले {days} दिनों तक याद दिलाऊँगा।",
-                    'no_reminders': "आज के लिए कोई रिमाइंडर नहीं हैं।",
-                    'reminders_list': "आज आपके {count} रिमाइंडर हैं: {reminders}",
-                    'reminder_triggered': "रिमाइंडर: {task}",
-                    'not_understood': "माफ़ कीजिए, मैं समझ नहीं पाया। कृपया दोहराएँ।",
-                    'listening': "नीले बटन को दबाएँ और बोलें।",
-                    'ready': "VoiceCare तैयार है। मैं आपकी कैसे मदद कर सकता हूँ?"
-                }
-            }
-        }
+        # Packs live in languages/*.json and are only loaded when a language is first used
+        self.patterns = LanguagePacks(os.path.join(BASE_DIR, 'languages'))
+        
+        # Fuzzy matchers and TTS voices are also resolved on first use per language
+        self.fuzzy_matchers = {}
+        self.tts_voices = {}
+    
+    def get_fuzzy_matcher(self, language):
+        """Return the (cached) fuzzy intent matcher for a language, or None"""
+        settings = self.settings['fuzzy']
+        if not settings['enabled'] or 'fuzzy' not in self.patterns[language]:
+            return None
+        if language not in self.fuzzy_matchers:
+            self.fuzzy_matchers[language] = FuzzyIntentMatcher(
+                self.patterns[language]['fuzzy'],
+                intent_threshold=settings['intent_threshold'],
+                window_slack=settings['window_slack'])
+        return self.fuzzy_matchers[language]
     
     def setup_tts(self):
         """Configure text-to-speech engine"""
@@ -169,16 +340,51 @@ class VoiceCareAssistant:
         except:
             pass  # Ignore sound errors
     
-    def speak(self, text, language='en'):
-        """Convert text to speech"""
-        def tts_thread():
+    def voice_for_language(self, language):
+        """Pick (and cache) the installed TTS voice matching the pack's voice hints"""
+        if language not in self.tts_voices:
+            voice_id = None
+            hints = [h.lower() for h in self.patterns[language].get('tts', {}).get('voice_hints', [])]
             try:
+                for voice in self.tts_engine.getProperty('voices') or []:
+                    names = [voice.id, voice.name or ''] + [str(l) for l in (voice.languages or [])]
+                    if any(hint in name.lower() for hint in hints for name in names):
+                        voice_id = voice.id
+                        break
+            except Exception as e:
+                print(f"Error looking up TTS voice: {e}")
+            self.tts_voices[language] = voice_id
+        return self.tts_voices[language]
+    
+    def setup_speech(self):
+        """Start the one thread that drives the TTS engine.
+
+        pyttsx3 cannot run two runAndWait() loops at once, and each
+        announcement sets its own voice and rate, which must not change
+        halfway through another, so everything spoken is queued for it.
+        """
+        self.speech_queue = queue.Queue()
+        threading.Thread(target=self.speech_loop, name='tts', daemon=True).start()
+    
+    def speak(self, text, language='en', profile=None):
+        """Queue text to be spoken (with a resident's own voice settings, if given); returns at once"""
+        self.speech_queue.put((text, language, profile))
+    
+    def speech_loop(self):
+        """Speak queued text in order, one announcement at a time (the TTS thread)"""
+        while True:
+            text, language, profile = self.speech_queue.get()
+            try:
+                voice_id = (profile and profile.voice) or self.voice_for_language(language)
+                if voice_id:
+                    self.tts_engine.setProperty('voice', voice_id)
+                self.tts_engine.setProperty('rate', (profile and profile.rate)
+                                            or self.patterns[language].get('tts', {}).get('rate', 150))
+                self.tts_engine.setProperty('volume', (profile and profile.volume) or 0.9)
                 self.tts_engine.say(text)
                 self.tts_engine.runAndWait()
             except Exception as e:
                 print(f"TTS Error: {e}")
-        
-        threading.Thread(target=tts_thread, daemon=True).start()
     
     def start_listening(self):
         def listen_thread():
@@ -214,6 +420,12 @@ class VoiceCareAssistant:
             stream = p.open(format=pyaudio.paInt16, channels=1, rate=16000, input=True, frames_per_buffer=8000)
             stream.start_stream()
 
+            # Follow partial hypotheses so we know when a command is complete
+            streaming = self.settings['streaming']
+            parser = IncrementalCommandParser(self, stable_updates=streaming['stable_updates'])
+            self.last_stream_parse = None
+            partials = []
+            
             result_text = ""
             start_time = time.time()
             while True:
@@ -224,16 +436,39 @@ class VoiceCareAssistant:
                     break
                 elif time.time() - start_time > 8:  # 8 seconds timeout
                     break
+                
+                partial = json.loads(rec.PartialResult()).get('partial', '')
+                if partial:
+                    partials.append(partial)
+                    self.last_stream_parse = parser.update(partial)
+                    if self.last_stream_parse.stable and streaming['finish_on_stable']:
+                        # The speaker paused after a complete command; don't wait for the endpoint
+                        result_text = partial
+                        break
                     
             stream.stop_stream()
             stream.close()
             p.terminate()
             
+            if parser.latency.count:
+                print(parser.latency)
+            if streaming['record_sessions'] and partials:
+                self.record_stream_session(streaming['record_sessions'], partials, result_text)
+            
             return result_text
         except Exception as e:
             print(f"Vosk recognition error: {e}")
             return None
     
+    def record_stream_session(self, path, partials, final):
+        """Append one utterance's partial hypotheses to a JSONL file for benchmarks/bench_streaming.py"""
+        try:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'id': datetime.datetime.now().isoformat(timespec='seconds'),
+                                    'partials': partials, 'final': final}, ensure_ascii=False) + '\n')
+        except Exception as e:
+            print(f"Error recording stream session: {e}")
+    
     def listen_with_sr(self):
         """Listen using speech_recognition library"""
         try:
@@ -255,106 +490,118 @@ class VoiceCareAssistant:
     def detect_language(self, text):
         """Detect language of the input text"""
         try:
-            detected = detect(text)
-            if detected in ['hi', 'mr']:  # Hindi or Marathi
-                return 'hi'
-            else:
-                return 'en'
+            # languages/index.json maps langdetect codes to packs
+            return self.patterns.language_for(detect(text))
         except:
             return 'en'  # Default to English
     
-    def words_to_numbers(self, text):
+    def words_to_numbers(self, text, language='en'):
         """Convert word numbers to digits"""
-        word_to_num = {
-            'zero': '0', 'one': '1', 'two': '2', 'three': '3', 'four': '4',
-            'five': '5', 'six': '6', 'seven': '7', 'eight': '8', 'nine': '9',
-            'ten': '10', 'eleven': '11', 'twelve': '12'
-        }
-        for word, num in word_to_num.items():
-            text = re.sub(r'\b' + word + r'\b', num, text)
-        return text
+        return replace_number_words(self.patterns[language], text)
     
     def process_voice_command(self, text):
         """Process the recognized voice command"""
         text = text.lower().strip()
-        text = self.words_to_numbers(text)
         language = self.detect_language(text)
+        text = self.words_to_numbers(text, language)
         print(f"Recognized: {text} (Language: {language})")
         
+        # The strict patterns see what was said. The fuzzy matcher drops filler
+        # words and stutters ("uh", "to to") from its own copy, so it goes first
+        # when there are any; otherwise it is the fallback for imperfect ASR output
+        matcher = self.get_fuzzy_matcher(language)
+        noisy = matcher is not None and matcher.noisy(text)
+        if not noisy and self.match_strict_patterns(text, language):
+            return
+        
+        if matcher:
+            fuzzy = matcher.match(text)
+            if fuzzy:
+                print(f"Fuzzy match: {fuzzy}")
+                if fuzzy.intent == 'query_schedule':
+                    self.handle_query_schedule(language)
+                    return
+                if fuzzy.command and self.match_strict_patterns(fuzzy.command, language):
+                    return
+        
+        if noisy and self.match_strict_patterns(text, language):
+            return
+        
+        # Fallback - not understood
+        response = self.patterns[language]['responses']['not_understood']
+        self.speak(response, language)
+    
+    def parse_reminder_slots(self, match, text, language):
+        """Extract (task, hour, minute, recurring_days) from a matched command"""
+        pack = self.patterns[language]
+        groups = match.groupdict()
+        recurring_days = 0
+        
+        if 'hour' in groups:
+            # Hindi/Marathi patterns name their groups; word order varies
+            task_part = groups['task'].strip()
+            hour = int(groups['hour'])
+            minute = int(groups['minute']) if groups.get('minute') else 0
+            period = pack.get('periods', {}).get(groups.get('period'))
+            
+            # Check for recurring pattern ("10 दिन", "10 दिवस")
+            recurring_match = pack['repeat_pattern'].search(text) if pack.get('repeat_pattern') else None
+            if recurring_match:
+                recurring_days = int(recurring_match.group(1))
+        else:
+            groups = match.groups()
+            task_part = groups[0].strip()
+            hour = int(groups[1])
+            minute = int(groups[2]) if groups[2] else 0
+            period = None
+            
+            # Check for recurring days in English command
+            if len(groups) > 5 and groups[5]:
+                recurring_days = int(groups[5])
+            
+            # Handle AM/PM
+            if len(groups) > 3 and groups[3]:
+                period = pack.get('periods', {}).get(groups[3].lower())
+        
+        # Parsing stays quiet: the streaming parser calls this on every partial hypothesis
+        hour = to_24_hour(hour, period, pack.get('assume_pm_before', 0))
+        
+        return task_part, hour, minute, recurring_days
+    
+    def find_intent(self, text, language):
+        """Return (intent, match) for the first strict pattern that matches, else (None, None)"""
         # Check for reminder setting
         for pattern in self.patterns[language]['set_reminder']:
-            match = re.search(pattern, text, re.IGNORECASE)
+            match = pattern.search(text)
             if match:
-                self.handle_set_reminder(match, text, language)
-                return
+                return 'set_reminder', match
         
         # Check for schedule query
         for pattern in self.patterns[language]['query_schedule']:
-            if re.search(pattern, text, re.IGNORECASE):
-                self.handle_query_schedule(language)
-                return
+            match = pattern.search(text)
+            if match:
+                return 'query_schedule', match
         
-        # Fallback - not understood
-        response = self.patterns[language]['responses']['not_understood']
-        self.speak(response, language)
+        return None, None
+    
+    def match_strict_patterns(self, text, language):
+        """Dispatch text if it matches one of the language's regex patterns"""
+        intent, match = self.find_intent(text, language)
+        if intent == 'set_reminder':
+            self.handle_set_reminder(match, text, language)
+        elif intent == 'query_schedule':
+            self.handle_query_schedule(language)
+        return intent is not None
     
     def handle_set_reminder(self, match, text, language):
         """Handle setting a new reminder"""
         try:
-            recurring_days = 0
-            
-            if language == 'hi':
-                # Different pattern for Hindi
-                if 'बजे' in text:
-                    parts = text.split('बजे')
-                    time_part = parts[0].strip().split()[-1]
-                    
-                    # Check for recurring pattern in the Hindi text
-                    if 'दिन साठी' in text:
-                        recurring_match = re.search(r'(\d+)\s+दिन साठी', text)
-                        if recurring_match:
-                            recurring_days = int(recurring_match.group(1))
-                            print(f"Recurring days detected: {recurring_days}")
-                    
-                    task_part = parts[1].strip() if len(parts) > 1 else parts[0].split(time_part)[0].strip()
-                    if not task_part:
-                        task_part = parts[0].split(time_part)[0].strip()
-                    hour = int(re.findall(r'\d+', time_part)[0])
-                    minute = 0
-                else:
-                    return
-            else:
-                groups = match.groups()
-                task_part = groups[0].strip()
-                hour = int(groups[1])
-                minute = int(groups[2]) if groups[2] else 0
-                
-                # Check for recurring days in English command
-                if len(groups) > 5 and groups[5]:
-                    recurring_days = int(groups[5])
-                    print(f"Recurring days detected: {recurring_days}")
-                
-                # Handle AM/PM
-                if len(groups) > 3 and groups[3]:
-                    am_pm = groups[3].lower()
-                    print(f"AM/PM indicator: {am_pm}")
-                    
-                    # Check for PM (afternoon/evening)
-                    if any(pm_indicator in am_pm for pm_indicator in ['pm', 'p.m.']):
-                        if hour != 12:  # 12 PM is already correct
-                            hour += 12
-                        print(f"PM detected, hour adjusted to: {hour}")
-                    
-                    # Check for AM (morning)
-                    elif any(am_indicator in am_pm for am_indicator in ['am', 'a.m.']):
-                        if hour == 12:  # 12 AM should be 0
-                            hour = 0
-                        print(f"AM detected, hour adjusted to: {hour}")
-                
-                # Default assumption for times without AM/PM: if hour < 7, assume PM
-                elif 1 <= hour <= 6:
-                    print(f"Time {hour}:{minute} has no AM/PM indicator, assuming PM")
-                    hour += 12
+            slots = self.parse_reminder_slots(match, text, language)
+            if slots is None:
+                return
+            task_part, hour, minute, recurring_days = slots
+            if recurring_days:
+                print(f"Recurring days detected: {recurring_days}")
             
             # Create reminder time
             today = datetime.date.today()
@@ -362,8 +609,8 @@ class VoiceCareAssistant:
             reminder_datetime = datetime.datetime.combine(today, reminder_time)
             
             # Print debug info about the time calculation
-            print(f"Setting reminder for: {hour}:{minute} ({reminder_time.strftime('%I:%M %p')})")
-            print(f"Current time: {datetime.datetime.now().strftime('%I:%M %p')}")
+            print(f"Setting reminder for: {hour}:{minute} ({format_time(hour * 60 + minute)})")
+            print(f"Current time: {format_time(epoch_minute(datetime.datetime.now()))}")
             
             # If time has passed today, schedule for tomorrow
             if reminder_datetime <= datetime.datetime.now():
@@ -371,117 +618,123 @@ class VoiceCareAssistant:
                 today = today + datetime.timedelta(days=1)
                 reminder_datetime = datetime.datetime.combine(today, reminder_time)
             
-            # Save to database
-            cursor = self.conn.cursor()
-            
             if recurring_days > 0:
-                # This is a recurring reminder
+                # Stored once as a daily rule; occurrences are expanded lazily
                 print(f"Setting up recurring reminder for {recurring_days} days")
-                original_reminder_id = None
-                
-                # Create reminders for each day
-                for day_offset in range(recurring_days):
-                    reminder_date = today + datetime.timedelta(days=day_offset)
-                    reminder_datetime_for_day = datetime.datetime.combine(reminder_date, reminder_time)
-                    
-                    # Skip if the time has already passed today and it's the first day
-                    if day_offset == 0 and reminder_datetime_for_day <= datetime.datetime.now():
-                        print(f"Skipping first day as time has passed")
-                        continue
-                        
-                    # Insert into database
-                    cursor.execute('''
-                        INSERT INTO reminders (task, time, date, language, recurring, remaining_days, original_id)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        task_part, 
-                        reminder_time.strftime('%H:%M'), 
-                        reminder_date.strftime('%Y-%m-%d'), 
-                        language, 
-                        1, 
-                        recurring_days - day_offset,
-                        original_reminder_id
-                    ))
-                    
-                    reminder_id = cursor.lastrowid
-                    
-                    # Set original_id for the first reminder
-                    if original_reminder_id is None:
-                        original_reminder_id = reminder_id
-                        # Update the first reminder with its own ID as original
-                        cursor.execute('''
-                            UPDATE reminders SET original_id = ? WHERE id = ?
-                        ''', (original_reminder_id, original_reminder_id))
-                    
-                    # Schedule the reminder
-                    self.scheduler.add_job(
-                        func=self.trigger_reminder,
-                        trigger="date",
-                        run_date=reminder_datetime_for_day,
-                        args=[task_part, language, reminder_id, True],
-                        id=f"reminder_{reminder_id}"
-                    )
-                
-                self.conn.commit()
+                rule = RecurrenceRule(today, 'daily', count=recurring_days)
+                self.add_recurrence(task_part, reminder_time.strftime('%H:%M'), language, rule)
                 
                 # Respond to user with recurring reminder message
                 response = self.patterns[language]['responses']['reminder_set_recurring'].format(
-                    time=reminder_time.strftime('%I:%M %p'), task=task_part, days=recurring_days)
+                    time=format_time(hour * 60 + minute), task=task_part, days=recurring_days)
                 
             else:
                 # Regular single reminder
-                cursor.execute('''
-                    INSERT INTO reminders (task, time, date, language)
-                    VALUES (?, ?, ?, ?)
-                ''', (task_part, reminder_time.strftime('%H:%M'), today.strftime('%Y-%m-%d'), language))
-                self.conn.commit()
+                due = epoch_minute(reminder_datetime)
+                reminder_id = self.repository.add(task_part, reminder_time.strftime('%H:%M'), today,
+                                                  language, due, self.current_profile).result()
                 
-                reminder_id = cursor.lastrowid
-                
-                # Schedule the reminder
-                self.scheduler.add_job(
-                    func=self.trigger_reminder,
-                    trigger="date",
-                    run_date=reminder_datetime,
-                    args=[task_part, language, reminder_id, False],
-                    id=f"reminder_{reminder_id}"
-                )
+                # Hand the reminder to the dispatcher
+                self.dispatcher.add(reminder_id, reminder_datetime, (due, reminder_id))
                 
                 # Respond to user with single reminder message
                 response = self.patterns[language]['responses']['reminder_set'].format(
-                    time=reminder_time.strftime('%I:%M %p'), task=task_part)
+                    time=format_time(due), task=task_part)
             
             self.speak(response, language)
             
         except Exception as e:
             print(f"Error setting reminder: {e}")
-            self.speak("Sorry, I couldn't set that reminder. Please try again.", language)
+            self.speak(self.patterns[language]['responses']['reminder_error'], language)
+    
+    def add_recurrence(self, task, time_str, language, rule):
+        """Store a recurrence rule, expand its first window and schedule it; return its id"""
+        recurrence_id = self.repository.add_recurrence(task, time_str, language, rule, self.current_profile).result()
+        self.expand_recurrence(recurrence_id)
+        return recurrence_id
+    
+    def expand_recurrence(self, recurrence_id, today=None, wait=True):
+        """Materialize a rule's occurrences for the rolling window (in the background unless wait)"""
+        window_days = self.settings['recurrence']['window_days']
+        future = self.repository.expand_recurrence(recurrence_id, today, window_days)
+        if wait:
+            if future.result():
+                # The dispatcher picks the new rows up from the database
+                self.dispatcher.reload()
+            return
+        
+        def reload(future):
+            if future.exception() is None and future.result():
+                self.dispatcher.reload()
+        future.add_done_callback(reload)
+        log_failure(future, "extending a recurring reminder")
+    
+    def expand_recurrences(self):
+        """Roll every active rule's window forward (run at startup and at midnight)"""
+        try:
+            # Queue them all so they share group commits, then reload once
+            window_days = self.settings['recurrence']['window_days']
+            futures = [self.repository.expand_recurrence(recurrence_id, None, window_days)
+                       for recurrence_id in self.repository.active_recurrence_ids()]
+            if any([future.result() for future in futures]):
+                self.dispatcher.reload()
+        except Exception as e:
+            print(f"Error expanding recurring reminders: {e}")
+    
+    def import_reminders(self, path, fmt=None):
+        """Bulk-load a CSV, JSON lines or iCalendar file for current_profile
+        (or each record's resident); returns a transfer.ImportReport, or None on failure"""
+        try:
+            report = import_file(self.repository, self.profiles, path, fmt, self.current_profile,
+                                 self.settings['recurrence']['window_days'],
+                                 self.settings['transfer']['chunk_rows'],
+                                 on_batch=lambda reminders, rule_ids: self.dispatcher.reload())
+            print(f"Imported {report.reminders} reminders and {report.rules} recurring reminders "
+                  f"from {path} in {report.seconds:.1f} s; skipped {report.skipped}")
+            for error in report.errors:
+                print(f"  {error}")
+            return report
+        except Exception as e:
+            print(f"Error importing reminders from {path}: {e}")
+            return None
+    
+    def export_reminders(self, path, fmt=None):
+        """Write current_profile's active reminders and rules to a file; returns how many, or None on failure"""
+        try:
+            count = export_file(self.db, path, fmt, self.current_profile)
+            print(f"Exported {count} reminders to {path}")
+            return count
+        except Exception as e:
+            print(f"Error exporting reminders to {path}: {e}")
+            return None
+    
+    def new_day(self):
+        """At midnight: roll recurrences forward, then have today's and tomorrow's agendas ready"""
+        self.expand_recurrences()
+        try:
+            self.repository.rollover(datetime.date.today())
+        except Exception as e:
+            print(f"Error preparing today's agenda: {e}")
     
     def handle_query_schedule(self, language):
         """Handle querying today's schedule"""
         try:
-            today = datetime.date.today().strftime('%Y-%m-%d')
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT task, time, recurring, remaining_days FROM reminders 
-                WHERE date = ? AND active = 1 
-                ORDER BY time
-            ''', (today,))
-            
-            reminders = cursor.fetchall()
+            reminders = self.repository.for_day(datetime.date.today(), self.current_profile)
             
             if not reminders:
                 response = self.patterns[language]['responses']['no_reminders']
                 self.speak(response, language)
             else:
+                responses = self.patterns[language]['responses']
                 reminder_list = []
-                for task, time, is_recurring, remaining_days in reminders:
-                    time_obj = datetime.datetime.strptime(time, '%H:%M').time()
-                    formatted_time = time_obj.strftime('%I:%M %p')
+                for reminder in reminders:
+                    formatted_time = format_time(reminder.due)
                     
-                    reminder_text = f"{task} at {formatted_time}"
-                    if is_recurring and remaining_days > 0:
-                        reminder_text += f" (repeating for {remaining_days} days)"
+                    if reminder.recurring and reminder.remaining_days > 0:
+                        reminder_text = responses['reminder_item_recurring'].format(
+                            task=reminder.task, time=formatted_time, days=reminder.remaining_days)
+                    else:
+                        reminder_text = responses['reminder_item'].format(task=reminder.task, time=formatted_time)
                     
                     reminder_list.append(reminder_text)
                 
@@ -492,48 +745,50 @@ class VoiceCareAssistant:
             
         except Exception as e:
             print(f"Error querying schedule: {e}")
-            self.speak("Sorry, I couldn't get your schedule right now.", language)
+            self.speak(self.patterns[language]['responses']['schedule_error'], language)
     
-    def trigger_reminder(self, task, language='en', reminder_id=None, is_recurring=False):
-        """Trigger a reminder at the scheduled time"""
+    def trigger_reminder(self, task, language='en', reminder_id=None, is_recurring=False, profile=None,
+                         due=None):
+        """Trigger a reminder at the scheduled time (due, an epoch minute, if known)"""
+        language = language or (profile and profile.language) or 'en'
         response = self.patterns[language]['responses']['reminder_triggered'].format(task=task)
-        self.speak(response, language)
+        self.speak(response, language, profile)
+        if due is not None:
+            self.trigger_latency.record((datetime.datetime.now() - to_datetime(due)).total_seconds() * 1000)
         
-        # Update reminder status in database
+        # Log the announcement; the reminder stays on screen until it is
+        # marked done, or counts as missed after adherence.ack_window_minutes
         if reminder_id is not None:
             try:
-                cursor = self.conn.cursor()
-                
-                # For now, just mark the reminder as inactive after it's triggered
-                cursor.execute('UPDATE reminders SET active = 0 WHERE id = ?', (reminder_id,))
-                self.conn.commit()
-                
-
+                log_failure(self.repository.announce(reminder_id), "logging reminder announcement")
                 
             except Exception as e:
                 print(f"Error updating reminder status: {e}")
     
+    def trigger_reminders(self, reminders, language='en', profile=None):
+        """Announce several of a resident's reminders in one sentence ("At 8:00 PM: ... and ...")"""
+        responses = self.patterns[language]['responses']
+        tasks = [reminder.task for reminder in reminders]
+        self.speak(responses['reminders_triggered'].format(
+            time=format_time(min(reminder.due for reminder in reminders)),
+            tasks=responses['list_and'].format(items=", ".join(tasks[:-1]), last=tasks[-1])), language, profile)
+        now = datetime.datetime.now()
+        for reminder in reminders:
+            self.trigger_latency.record((now - to_datetime(reminder.due)).total_seconds() * 1000)
+            log_failure(self.repository.announce(reminder.id), "logging reminder announcement")
+    
     def update_reminders_display(self):
         try:
-            today = datetime.date.today().strftime('%Y-%m-%d')
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT task, time, recurring, remaining_days FROM reminders 
-                WHERE date = ? AND active = 1 
-                ORDER BY time
-            ''', (today,))
-            
-            reminders = cursor.fetchall()
+            reminders = self.repository.for_day(datetime.date.today(), self.current_profile)
             
             # Log reminders to console instead of GUI
             if not reminders:
                 print("No reminders for today.")
             else:
-                for i, (task, time, is_recurring, remaining_days) in enumerate(reminders, 1):
-                    time_obj = datetime.datetime.strptime(time, '%H:%M').time()
-                    formatted_time = time_obj.strftime('%I:%M %p')
-                    recurring_text = " (Repeats for " + str(remaining_days) + " more days)" if is_recurring and remaining_days > 0 else ""
-                    print(f"{i}. {task} at {formatted_time}{recurring_text}")
+                for i, reminder in enumerate(reminders, 1):
+                    formatted_time = format_time(reminder.due)
+                    recurring_text = " (Repeats for " + str(reminder.remaining_days) + " more days)" if reminder.recurring and reminder.remaining_days > 0 else ""
+                    print(f"{i}. {reminder.task} at {formatted_time}{recurring_text}")
         
         except Exception as e:
             print(f"Error updating display: {e}")
@@ -542,15 +797,7 @@ class VoiceCareAssistant:
         """Repeat today's reminders audibly"""
         def repeat_thread():
             try:
-                today = datetime.date.today().strftime('%Y-%m-%d')
-                cursor = self.conn.cursor()
-                cursor.execute('''
-                    SELECT task, time FROM reminders 
-                    WHERE date = ? AND active = 1 
-                    ORDER BY time
-                ''', (today,))
-                
-                reminders = cursor.fetchall()
+                reminders = self.repository.for_day(datetime.date.today(), self.current_profile)
                 
                 if not reminders:
                     self.speak("You have no reminders for today.")
@@ -558,10 +805,9 @@ class VoiceCareAssistant:
                     self.speak(f"You have {len(reminders)} reminders today.")
                     time.sleep(1)  # Brief pause
                     
-                    for i, (task, time_str) in enumerate(reminders, 1):
-                        time_obj = datetime.datetime.strptime(time_str, '%H:%M').time()
-                        formatted_time = time_obj.strftime('%I:%M %p')
-                        self.speak(f"Reminder {i}: {task} at {formatted_time}")
+                    for i, reminder in enumerate(reminders, 1):
+                        formatted_time = format_time(reminder.due)
+                        self.speak(f"Reminder {i}: {reminder.task} at {formatted_time}")
                         time.sleep(0.5)  # Brief pause between reminders
                     
             except Exception as e:
@@ -573,36 +819,14 @@ class VoiceCareAssistant:
     def clear_all_reminders(self):
         """Clear all active reminders for today"""
         try:
-            today = datetime.date.today().strftime('%Y-%m-%d')
-            cursor = self.conn.cursor()
-            
-            # Get reminders to be cleared for feedback
-            cursor.execute('''
-                SELECT COUNT(*) FROM reminders 
-                WHERE date = ? AND active = 1
-            ''', (today,))
-            count = cursor.fetchone()[0]
+            reminder_ids = self.repository.clear_day(datetime.date.today(), self.current_profile).result()
+            count = len(reminder_ids)
             
             if count > 0:
-                # Mark reminders as inactive
-                cursor.execute('''
-                    UPDATE reminders SET active = 0 
-                    WHERE date = ? AND active = 1
-                ''', (today,))
-                self.conn.commit()
-                
-                # Cancel scheduled jobs
-                cursor.execute('''
-                    SELECT id FROM reminders 
-                    WHERE date = ? AND active = 0
-                ''', (today,))
-                reminder_ids = cursor.fetchall()
                 
-                for (reminder_id,) in reminder_ids:
-                    try:
-                        self.scheduler.remove_job(f"reminder_{reminder_id}")
-                    except:
-                        pass  # Job might not exist
+                # Cancel pending announcements
+                for reminder_id in reminder_ids:
+                    self.dispatcher.cancel(reminder_id)
                 
                 self.update_reminders_display()
                 self.status_label.config(text=f"Cleared {count} reminders", fg='#e67e22')
@@ -617,77 +841,156 @@ class VoiceCareAssistant:
             self.speak("Sorry, I couldn't clear your reminders.")
     
     def load_existing_reminders(self):
-        """Load and reschedule existing reminders from database"""
+        """Deal with reminders that came due while the app was closed; the dispatcher loads the rest"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT id, task, time, date, language, recurring, remaining_days FROM reminders 
-                WHERE active = 1
-            ''', )
-            
-            reminders = cursor.fetchall()
-            current_time = datetime.datetime.now()
-            
-            for reminder_id, task, time_str, date_str, language, is_recurring, remaining_days in reminders:
-                try:
-                    # Parse reminder datetime
-                    reminder_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-                    reminder_time = datetime.datetime.strptime(time_str, '%H:%M').time()
-                    reminder_datetime = datetime.datetime.combine(reminder_date, reminder_time)
-                    
-                    # Only reschedule future reminders
-                    if reminder_datetime > current_time:
-                        self.scheduler.add_job(
-                            func=self.trigger_reminder,
-                            trigger="date",
-                            run_date=reminder_datetime,
-                            args=[task, language, reminder_id, is_recurring],
-                            id=f"reminder_{reminder_id}"
-                        )
-                        print(f"Rescheduled reminder {reminder_id}: {task} at {reminder_datetime}")
-                    else:
-                        # Mark past reminders as inactive
-                        cursor.execute('UPDATE reminders SET active = 0 WHERE id = ?', (reminder_id,))
-                        
-                except Exception as e:
-                    print(f"Error rescheduling reminder {reminder_id}: {e}")
-                    continue
+            # One indexed range read collects the reminders to catch up on, and
+            # one statement (queued last) expires everything older; future reminders
+            # are not touched here, the dispatcher reads the next few from the index
+            start = time.perf_counter()
+            now = datetime.datetime.now()
+            since = now - datetime.timedelta(minutes=self.settings['adherence']['catch_up_minutes'])
+            caught_up = self.catch_up(since, now)
+            caught_up_at = time.perf_counter()
             
-            self.conn.commit()
-            print(f"Loaded {len(reminders)} existing reminders")
+            # Recurring rules: fill the window and keep it rolling at midnight
+            self.expand_recurrences()
+            self.scheduler.add_job(
+                func=self.new_day,
+                trigger="cron",
+                hour=0,
+                minute=0,
+                id="recurrence_job",
+                replace_existing=True
+            )
+            expanded_at = time.perf_counter()
+            
+            # Prime the dispatcher with the first range of due reminders
+            next_due = self.dispatcher.next_due()
+            dispatched_at = time.perf_counter()
+            
+            # Logging a long backlog as missed takes a while; nothing waits for it
+            log_failure(self.repository.expire(since), "retiring past reminders")
+            done = time.perf_counter()
+            
+            self.startup_timings = {
+                'catch_up': (caught_up_at - start) * 1000,
+                'recurrences': (expanded_at - caught_up_at) * 1000,
+                'dispatcher': (dispatched_at - expanded_at) * 1000,
+                'expire': (done - dispatched_at) * 1000,
+            }
+            print(f"Caught up on {len(caught_up)} reminders, next due {next_due or 'none'} "
+                  f"(startup recovery {(done - start) * 1000:.1f} ms)")
             
         except Exception as e:
             print(f"Error loading existing reminders: {e}")
     
+    def catch_up(self, since, until):
+        """Announce the reminders due after since and up to until that nobody heard, in one
+        summary per resident, and give them a full acknowledgement window; returns them"""
+        caught_up = self.repository.catch_up(since, until).result()
+        if caught_up:
+            now = datetime.datetime.now()
+            hold = self.catch_up_hold
+            if hold and now < hold[0]:
+                since = min(since, hold[1])
+            self.catch_up_hold = (now + datetime.timedelta(minutes=self.settings['adherence']['ack_window_minutes']),
+                                  since)
+            self.announce_missed(caught_up)
+        return caught_up
+    
+    def announce_missed(self, reminders):
+        """Speak one summary per resident of reminders that came due while the app was off"""
+        by_profile = {}
+        for reminder in reminders:
+            by_profile.setdefault(reminder.profile_id, []).append(reminder)
+        limit = self.settings['adherence']['catch_up_items']
+        for profile_id, missed in by_profile.items():
+            try:
+                profile = self.profiles.get(profile_id)
+                language = (profile and profile.language) or missed[0].language or 'en'
+                responses = self.patterns[language]['responses']
+                items = [responses['reminder_item'].format(task=reminder.task, time=format_time(reminder.due))
+                         for reminder in missed[:limit]]
+                if len(missed) > limit:
+                    items.append(responses['missed_more'].format(count=len(missed) - limit))
+                self.speak(responses['missed_summary'].format(count=len(missed), reminders=", ".join(items)),
+                           language, profile)
+            except Exception as e:
+                print(f"Error announcing missed reminders: {e}")
+    
+    def mark_missed(self):
+        """Retire reminders not acknowledged within the window after their time (run periodically)"""
+        try:
+            now = datetime.datetime.now()
+            cutoff = now - datetime.timedelta(minutes=self.settings['adherence']['ack_window_minutes'])
+            # Reminders caught up at startup were only just announced
+            if self.catch_up_hold and now < self.catch_up_hold[0]:
+                cutoff = min(cutoff, self.catch_up_hold[1])
+            missed = self.repository.expire(cutoff).result()
+            if missed:
+                print(f"{missed} reminders were not acknowledged in time and count as missed")
+                
+        except Exception as e:
+            print(f"Error marking missed reminders: {e}")
+    
     def cleanup_old_reminders(self):
-        """Clean up old inactive reminders (run periodically)"""
+        """Archive old inactive reminders and compact the file (run periodically)"""
         try:
-            # Remove reminders older than 7 days
-            cutoff_date = (datetime.date.today() - datetime.timedelta(days=7)).strftime('%Y-%m-%d')
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                DELETE FROM reminders 
-                WHERE date < ? AND active = 0
-            ''', (cutoff_date,))
-            self.conn.commit()
-            
-            deleted_count = cursor.rowcount
-            if deleted_count > 0:
-                print(f"Cleaned up {deleted_count} old reminders")
+            report = self.compactor.run()
+            
+            if report['moved'] or report['pages_reclaimed']:
+                print(f"Archived {report['moved']} old reminders, reclaimed {report['pages_reclaimed']} pages "
+                      f"in {report['ms']:.0f} ms" + ("" if report['finished'] else " (more next run)"))
                 
         except Exception as e:
             print(f"Error cleaning up old reminders: {e}")
     
+    def persist_database(self):
+        """Write the in-memory database to its file if it changed (run periodically)"""
+        try:
+            self.memory_store.persist()
+        except Exception as e:
+            print(f"Error writing the database file: {e}")
+    
+    def snapshot_journal(self):
+        """Snapshot the reminder journal if it has grown enough since the last one (run periodically)"""
+        try:
+            snapshot = self.journal.maybe_snapshot()
+            if snapshot:
+                print(f"Journal snapshot at entry {snapshot[0]}: {snapshot[1]} active reminders")
+        except Exception as e:
+            print(f"Error taking a journal snapshot: {e}")
+    
     def on_closing(self):
         """Handle application shutdown"""
         try:
-            # Stop the scheduler
+            # Stop the scheduler and dispatcher
             if hasattr(self, 'scheduler') and self.scheduler.running:
                 self.scheduler.shutdown()
+            if hasattr(self, 'dispatcher'):
+                self.dispatcher.stop()
             
-            # Close database connection
-            if hasattr(self, 'conn'):
-                self.conn.close()
+            # Apply queued changes, then close every thread's database connection
+            if hasattr(self, 'writer'):
+                self.writer.stop()
+                print(f"Database writer: {self.writer.stats()['batches']} commits, "
+                      f"{self.writer.commit_latency}")
+            if getattr(self, 'memory_store', None) is not None:
+                self.memory_store.close()
+                stats = self.memory_store.stats()
+                print(f"In-memory database: {stats['frames']} redo log frames, {stats['persists']} writes "
+                      f"to the file, {stats['fsyncs']} fsyncs; {self.memory_store.persist_latency}")
+            if hasattr(self, 'trigger_latency'):
+                print(self.trigger_latency)
+            if hasattr(self, 'repository'):
+                stats = self.repository.stats()
+                print(f"Reminder queries: {stats['cache_hits']} cache hits, {stats['cache_misses']} misses; "
+                      f"agenda {stats['agenda']['hits']} hits, {stats['agenda']['misses']} misses "
+                      f"over {stats['agenda']['profiles']} profiles")
+                for recorder in self.repository.timings.values():
+                    print(f"  {recorder}")
+            if hasattr(self, 'db'):
+                self.db.close()
             
             # Clean up pygame
             try:
@@ -703,15 +1006,6 @@ class VoiceCareAssistant:
     def run(self):
         """Start the application"""
         try:
-            # Schedule periodic cleanup (daily at midnight)
-            self.scheduler.add_job(
-                func=self.cleanup_old_reminders,
-                trigger="cron",
-                hour=0,
-                minute=0,
-                id="cleanup_job"
-            )
-            
             # Backend is ready
             print("VoiceCare Assistant backend initialized successfully")
             
@@ -0,0 +1,136 @@
+import copy
+import json
+import os
+
+# Optional JSON file (in the working directory) overriding any of the defaults below
+SETTINGS_FILE = 'voicecare_settings.json'
+
+DEFAULTS = {
+    'fuzzy': {
+        'enabled': True,
+        # Minimum trigram similarity for an intent anchor to count as heard
+        'intent_threshold': 0.7,
+        # Anchors may be matched against windows up to this many words longer or shorter
+        'window_slack': 1,
+    },
+    'streaming': {
+        # Identical partial hypotheses needed before a complete command counts as stable
+        'stable_updates': 3,
+        # Stop listening as soon as the command is stable instead of waiting for Vosk's endpoint
+        'finish_on_stable': False,
+        # JSONL file to append each utterance's partial hypotheses to (None = off)
+        'record_sessions': None,
+    },
+    'recurrence': {
+        # Days of occurrences (from today) kept as reminder rows; 2 fills the Today and Tomorrow tabs
+        'window_days': 2,
+    },
+    'database': {
+        # WAL lets the UI read while a reminder is being written
+        'journal_mode': 'wal',
+        # 'normal' is safe with WAL: a power cut can lose the last commit, never corrupt
+        'synchronous': 'normal',
+        'cache_size_kib': 8192,
+        # How long a write waits for another process holding the database
+        'busy_timeout_ms': 5000,
+        # Free pages are handed back to the file system a few at a time by compaction
+        'auto_vacuum': 'incremental',
+    },
+    'memory_store': {
+        # Keep the database in memory (for SD cards): each commit only appends to a small
+        # redo log, and the whole database is written to its file every persist_minutes,
+        # when the redo log passes redo_limit_kib, and at shutdown
+        'enabled': False,
+        'persist_minutes': 10,
+        'redo_limit_kib': 1024,
+        # fsync the redo log on every commit; without it a crash loses nothing, a power cut
+        # can lose the last few commits (as with synchronous 'normal')
+        'fsync_redo': False,
+    },
+    'adherence': {
+        # An announced reminder not marked done within this many minutes counts as missed
+        'ack_window_minutes': 60,
+        # How often to look for such reminders
+        'sweep_minutes': 5,
+        # At startup, reminders that came due this recently while the app was off are
+        # announced together in one summary per resident; older ones count as missed
+        'catch_up_minutes': 120,
+        # Tasks named in that summary before "and N more"
+        'catch_up_items': 5,
+    },
+    'compaction': {
+        # Done reminders older than this move to the reminders_archive table
+        'retain_days': 7,
+        'interval_minutes': 60,
+        # Rows moved per transaction, and time one run may take before leaving the rest
+        'batch': 200,
+        'budget_ms': 200,
+        # Free pages released per incremental_vacuum step
+        'vacuum_pages': 256,
+    },
+    'journal': {
+        # Append every reminder change to reminder_journal (history, audit, sync); off by default
+        'enabled': False,
+        # Snapshot the active reminders once this many changes were journalled since the last one
+        'snapshot_every': 50000,
+        'check_minutes': 10,
+        'keep_snapshots': 2,
+    },
+    'writer': {
+        # Extra wait for more changes to share a commit; with 0, changes queued
+        # while the previous commit was syncing still go out together
+        'window_ms': 0,
+        'max_batch': 256,
+        # How often an idle writer checks whether another process changed the database (0 = never)
+        'poll_external_ms': 2000,
+    },
+    'transfer': {
+        # Records inserted per writer command by a bulk import
+        'chunk_rows': 5000,
+    },
+    'dispatcher': {
+        # Reminders read from the database per refill of the next-due heap
+        'batch': 64,
+        # Wake at least this often to compare the wall clock with the monotonic one
+        'watch_seconds': 5,
+        # A difference this large is a clock jump (suspend, NTP step, clock changed)
+        'jump_seconds': 2,
+        # After a jump forward, reminders this late still fire; older ones are summarised
+        'misfire_grace_seconds': 300,
+        # Threads announcing due reminders; the dispatcher thread only hands them over (0 = announce on it)
+        'workers': 4,
+        # A resident's reminders due within this many seconds of each other are announced
+        # together, in one sentence (the later ones early); the same minute always is
+        'group_seconds': 60,
+    },
+    'scheduler': {
+        # Thread pool running the periodic jobs (missed sweep, cleanup, midnight rollover)
+        'pool_size': 4,
+        # Run a job that missed several times (suspend) once, not once per missed time
+        'coalesce': True,
+        # A job this many seconds late is skipped (None = run it however late)
+        'misfire_grace_seconds': None,
+    },
+}
+
+
+def merge(base, overrides):
+    """Recursively apply overrides onto a copy of base"""
+    result = copy.deepcopy(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = merge(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+def load_settings(path=SETTINGS_FILE):
+    """Return DEFAULTS merged with the settings file, if there is one"""
+    if path and os.path.exists(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return merge(DEFAULTS, json.load(f))
+        except Exception as e:
+            print(f"Error reading {path}, using default settings: {e}")
+    return copy.deepcopy(DEFAULTS)
@@ -0,0 +1,218 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import LatencyRecorder
+
+_STOP = object()
+
+
+class DatabaseWriter:
+    """One thread that applies every reminder mutation, in group commits.
+
+    submit(func, *args) queues func(conn, *args) and returns a Future for
+    its result. The writer thread takes whatever is queued -- everything
+    that arrived during the previous commit, plus whatever arrives within
+    window_ms, at most max_batch -- runs each command in its own savepoint
+    and commits them all together, so a burst of changes costs one fsync
+    instead of one each. A command that raises is rolled back on its own
+    and its Future gets the exception. Futures are resolved only once the
+    batch is committed.
+
+    Each batch starts with BEGIN IMMEDIATE. Commands read before they write,
+    and in WAL mode a deferred transaction whose snapshot another process
+    has since committed past cannot upgrade to a write (SQLITE_BUSY_SNAPSHOT,
+    which the busy timeout does not retry); taking the write lock first
+    means the busy timeout covers that wait instead.
+
+    Callers that need the outcome (a new row id) wait on the Future; the
+    rest (marking a reminder done from the UI) carry on at once.
+
+    While idle, and before each batch, the writer compares PRAGMA
+    data_version with its last reading (every poll_external_ms); it only
+    changes when another connection -- another process -- has committed.
+
+    With a redo log (memory_store.MemoryStore), commands run on a connection
+    that records their writes, and each batch's statements are appended to
+    the log after the commit, still under the write lock and before any
+    Future resolves. If neither the log nor the file can be written, the
+    batch's Futures get that error.
+    """
+
+    def __init__(self, db, window_ms=0, max_batch=256, poll_external_ms=2000, redo=None):
+        self.db = db
+        self.redo = redo
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.poll = poll_external_ms / 1000 if poll_external_ms else None
+        self.data_version = None
+        self.queue = queue.Queue()
+        self.thread = None
+        self.commit_latency = LatencyRecorder('commit')
+        self.wait_latency = LatencyRecorder('submit to commit')
+        self.max_queue_depth = 0
+        self.batches = 0
+        self.commands = 0
+        self.listeners = []
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='database-writer', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Apply everything already queued, then end the writer thread"""
+        if self.thread is not None:
+            self.queue.put(_STOP)
+            self.thread.join()
+            self.thread = None
+
+    def add_listener(self, callback):
+        """Call callback(external) on the writer thread after each commit, before its Futures
+        resolve, with external=False; and with external=True when another process has written"""
+        self.listeners.append(callback)
+
+    def submit(self, func, *args):
+        """Queue func(conn, *args) for the next group commit; return its Future"""
+        future = Future()
+        self.queue.put((func, args, future, time.perf_counter()))
+        depth = self.queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        return future
+
+    def execute(self, sql, params=()):
+        """Queue one statement; the Future's result is (lastrowid, rowcount)"""
+        return self.submit(_execute, sql, params)
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def stats(self):
+        """Queue depth and commit metrics, for logging and benchmarks"""
+        return {
+            'queue_depth': self.queue.qsize(),
+            'max_queue_depth': self.max_queue_depth,
+            'batches': self.batches,
+            'commands': self.commands,
+            'commit_ms': self.commit_latency.stats(),
+            'wait_ms': self.wait_latency.stats(),
+        }
+
+    def _collect(self):
+        """Block for the first command, then gather more for up to the window"""
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.poll)]
+                break
+            except queue.Empty:
+                self._check_external()
+        deadline = time.perf_counter() + self.window
+        while batch[-1] is not _STOP and len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self.queue.get(timeout=remaining))
+                else:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _check_external(self):
+        try:
+            version = self.db.connection().execute('PRAGMA data_version').fetchone()[0]
+        except Exception as e:
+            print(f"Error checking for database changes: {e}")
+            return
+        changed = self.data_version is not None and version != self.data_version
+        self.data_version = version
+        if changed:
+            self._notify(True)
+
+    def _notify(self, external):
+        for callback in self.listeners:
+            try:
+                callback(external)
+            except Exception as e:
+                print(f"Error in database commit listener: {e}")
+
+    def _run(self):
+        self._check_external()
+        while True:
+            batch = self._collect()
+            stopping = batch[-1] is _STOP
+            if stopping:
+                batch.pop()
+            if batch:
+                self._apply(batch)
+            if stopping:
+                return
+
+    def _apply(self, batch):
+        if self.poll is not None:
+            self._check_external()
+        start = time.perf_counter()
+        conn = self.db.connection()
+        results = []
+        statements = []
+        with self.db.write_lock:
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                for func, args, future, queued in batch:
+                    conn.execute('SAVEPOINT command')
+                    target = conn if self.redo is None else self.redo.recorder(conn)
+                    try:
+                        results.append((future, func(target, *args), None))
+                        conn.execute('RELEASE command')
+                        if self.redo is not None:
+                            statements.extend(target.statements)
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO command')
+                        conn.execute('RELEASE command')
+                        results.append((future, None, e))
+                conn.commit()
+            except Exception as e:
+                # The commit itself failed: nothing in the batch was applied
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                print(f"Error committing {len(batch)} database changes: {e}")
+                results = [(future, None, e) for _, _, future, _ in batch]
+                statements = []
+            if statements:
+                try:
+                    self.redo.append(statements)
+                except Exception as e:
+                    # Committed in memory but not durable: callers must not take it as saved
+                    print(f"Error writing the redo log: {e}")
+                    results = [(future, None, error or e) for future, _, error in results]
+        done = time.perf_counter()
+        self.commit_latency.record((done - start) * 1000)
+        self.batches += 1
+        self.commands += len(batch)
+        for _, _, _, queued in batch:
+            self.wait_latency.record((done - queued) * 1000)
+        if any(error is None for _, _, error in results):
+            self._notify(False)
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+def _execute(conn, sql, params):
+    cursor = conn.execute(sql, params)
+    return cursor.lastrowid, cursor.rowcount
+
+
+def log_failure(future, action):
+    """Print an error if a command nobody waits for fails"""
+    def check(future):
+        error = future.exception()
+        if error is not None:
+            print(f"Error {action}: {error}")
+    future.add_done_callback(check)
+    return future
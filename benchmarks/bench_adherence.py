@@ -0,0 +1,148 @@
+"""Adherence log benchmark.
+
+Logs a synthetic year of medication reminders (each dose scheduled,
+announced, then acknowledged -- sometimes late or after a snooze -- or
+missed, or now and then cleared before it came due) through
+adherence.record(), and compares the write cost with
+appending the events alone. Then answers caregiver reports (per-task
+totals for the last week, month, quarter and year) from the daily/weekly
+rollups and by aggregating the raw events, checks that both agree, and
+prints the timings.
+
+Usage:
+    python benchmarks/bench_adherence.py [--tasks 12] [--doses 3] [--days 365]
+"""
+import argparse
+import datetime
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from harness import quiet
+
+import adherence
+from adherence import AdherenceLog
+from database import Database
+from schema import migrate
+from timecodes import MINUTES_PER_DAY, day_number, epoch_minute, to_datetime
+
+# The same report computed from the events, as it would be without rollups
+RAW_TOTALS = '''
+    SELECT task,
+           SUM(kind = 'scheduled'), SUM(kind = 'announced'), SUM(kind = 'acknowledged'),
+           SUM(kind = 'missed'), SUM(kind = 'snoozed'), SUM(kind = 'cancelled'),
+           SUM(CASE WHEN kind = 'acknowledged' AND at > due THEN at - due ELSE 0 END)
+    FROM reminder_events
+    WHERE profile_id = 1 AND due >= ? AND due < ?
+    GROUP BY task ORDER BY task
+'''
+
+
+def simulate(args):
+    """One day's events at a time: [(kind, at, [(reminder_id, profile_id, task, due)])]"""
+    rng = random.Random(args.tasks * args.days)
+    today = datetime.date.today()
+    reminder_id = 0
+    for offset in range(args.days, 0, -1):
+        day = day_number(today - datetime.timedelta(days=offset))
+        events = []
+        for task in range(args.tasks):
+            for dose in range(args.doses):
+                reminder_id += 1
+                due = day * MINUTES_PER_DAY + 8 * 60 + dose * (12 * 60 // args.doses) + task
+                reminder = [(reminder_id, 1, f"medicine {task}", due)]
+                events.append((adherence.SCHEDULED, due - MINUTES_PER_DAY, reminder))
+                if rng.random() < 0.02:
+                    # Cleared from the day before it came due
+                    events.append((adherence.CANCELLED, due - 60, reminder))
+                    continue
+                events.append((adherence.ANNOUNCED, due, reminder))
+                outcome = rng.random()
+                if outcome < 0.05:
+                    events.append((adherence.SNOOZED, due + 1, reminder))
+                    events.append((adherence.ACKNOWLEDGED, due + 10, reminder))
+                elif outcome < 0.85:
+                    events.append((adherence.ACKNOWLEDGED, due + int(rng.expovariate(1 / 8)), reminder))
+                else:
+                    events.append((adherence.MISSED, due + 60, reminder))
+        yield events
+
+
+def fill(db, args, rollups):
+    conn = db.connection()
+    count = 0
+    start = time.perf_counter()
+    for events in simulate(args):
+        with db.write():
+            for kind, at, reminders in events:
+                if rollups:
+                    adherence.record(conn, kind, reminders, to_datetime(at))
+                else:
+                    conn.executemany(adherence.SQL_INSERT_EVENT, [(reminder_id, profile_id, task, kind, due, at)
+                                                                  for reminder_id, profile_id, task, due in reminders])
+        count += len(events)
+    return count, (time.perf_counter() - start) * 1000
+
+
+def timed(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=12)
+    parser.add_argument('--doses', type=int, default=3)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        databases = {}
+        for label, rollups in (('events only', False), ('with rollups', True)):
+            db = Database(os.path.join(workdir, f"{label.split()[0]}.db"))
+            with quiet():
+                migrate(db.connection())
+            events, elapsed = fill(db, args, rollups)
+            databases[label] = db
+            print(f"  {label:<13} {events} events in {elapsed:.0f} ms ({elapsed * 1000 / events:.1f} us per event)")
+
+        db = databases['with rollups']
+        conn = db.connection()
+        log = AdherenceLog(db)
+        rollup_rows = sum(conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                          for table in ('adherence_daily', 'adherence_weekly'))
+        print(f"  {rollup_rows} rollup rows\n")
+
+        today = datetime.date.today()
+        mismatches = 0
+        print(f"  {'report':<10} {'raw events':>12} {'rollups':>10} {'speedup':>9}")
+        for label, days in (('week', 7), ('month', 30), ('quarter', 91), ('year', 365)):
+            first = today - datetime.timedelta(days=days)
+            last = today - datetime.timedelta(days=1)
+            raw, raw_ms = timed(lambda: conn.execute(
+                RAW_TOTALS, (epoch_minute(first), epoch_minute(today))).fetchall(), args.repeat)
+            rolled, rolled_ms = timed(lambda: log.totals(first, last), args.repeat)
+            if [tuple(row) for row in rolled] != raw:
+                mismatches += 1
+                print(f"  {label}: rollups disagree with the raw events")
+            print(f"  {label:<10} {raw_ms:>9.2f} ms {rolled_ms:>7.2f} ms {raw_ms / rolled_ms:>8.1f}x")
+
+        for db in databases.values():
+            db.close()
+        return 1 if mismatches else 0
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Coalesced announcement benchmark.
+
+An evening round: R residents (default 50) each have K medicines (default
+3) due at the same minute, plus one due a minute later. The real dispatcher
+fires them, once announcing every reminder separately and once grouping
+each resident's reminders due within dispatcher.group_seconds into one
+sentence. Reports, for each,
+
+  - TTS calls and the speaking time they add up to on one engine, at
+    --call-ms per call (engine start, voice switch, runAndWait) plus
+    --word-ms per word,
+  - that every reminder was still logged as announced on its own, and that
+    acknowledging one of a group leaves the others open,
+  - that a reload right after the round (an import, another process's
+    write) does not queue the reminders that fired early a second time.
+
+Usage:
+    python benchmarks/bench_announce.py [--residents 50] [--medicines 3]
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from harness import make_assistant, quiet
+
+from dispatcher import LAST_ID, ReminderDispatcher
+from timecodes import epoch_minute
+
+MEDICINES = ('metformin', 'aspirin', 'atorvastatin', 'vitamin D', 'amlodipine', 'lisinopril')
+
+
+def setup(workdir, name, residents, medicines):
+    """Each resident's medicines due this minute and one more next minute"""
+    assistant = make_assistant(os.path.join(workdir, f"{name}.db"))
+    profile_ids = [1] + [assistant.profiles.add(f"Resident {n}").result() for n in range(residents - 1)]
+    now = datetime.datetime.now()
+    due = epoch_minute(now)
+    futures = []
+    for profile_id in profile_ids:
+        for n in range(medicines):
+            futures.append(assistant.repository.add(f"take {MEDICINES[n % len(MEDICINES)]}", now.strftime('%H:%M'),
+                                                    now.date(), 'en', due, profile_id))
+        futures.append(assistant.repository.add("drink water", now.strftime('%H:%M'), now.date(), 'en', due + 1,
+                                                profile_id))
+    for future in futures:
+        future.result()
+    return assistant, due, len(futures)
+
+
+def run(workdir, name, args, group):
+    assistant, due, count = setup(workdir, name, args.residents, args.medicines)
+    spoken = []
+    lock = threading.Lock()
+
+    def speak(text, language='en', profile=None):
+        with lock:
+            spoken.append(text)
+
+    assistant.speak = speak
+    settings = assistant.settings['dispatcher']
+    assistant.dispatcher = ReminderDispatcher(
+        assistant.due_reminders, assistant.dispatch_reminder, batch=settings['batch'], workers=settings['workers'],
+        fire_group=assistant.dispatch_reminders if group else None, group_by=assistant.group_reminders if group else None,
+        group_seconds=settings['group_seconds'])
+    # Read from the start of the minute they are due in, not from now
+    assistant.dispatcher.horizon = (due - 1, LAST_ID)
+    assistant.dispatcher.start()
+
+    # Without grouping the last reminders come due a minute later; stop waiting once they are all announced
+    deadline = time.time() + 65
+    while assistant.trigger_latency.stats()['count'] < count and time.time() < deadline:
+        time.sleep(0.05)
+    # Everything has fired; the reminders fired early must not be loaded again
+    assistant.dispatcher.reload()
+    reloaded = assistant.dispatcher.next_due()
+    assistant.dispatcher.stop()
+    assistant.writer.submit(lambda conn: None).result()
+
+    announced = assistant.conn.execute(
+        "SELECT COUNT(DISTINCT reminder_id) FROM reminder_events WHERE kind = 'announced'").fetchone()[0]
+    # Acknowledge the first resident's first reminder only
+    first = assistant.conn.execute('SELECT MIN(id) FROM reminders').fetchone()[0]
+    assistant.repository.mark_done(first).result()
+    still_open = assistant.conn.execute(
+        'SELECT COUNT(*) FROM reminders WHERE active = 1 AND profile_id = 1').fetchone()[0]
+    assistant.writer.stop()
+    assistant.db.close()
+
+    words = sum(len(text.split()) for text in spoken)
+    speaking = (len(spoken) * args.call_ms + words * args.word_ms) / 1000
+    return spoken, speaking, announced == count, still_open == args.medicines, reloaded is None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--residents', type=int, default=50)
+    parser.add_argument('--medicines', type=int, default=3)
+    parser.add_argument('--call-ms', type=float, default=400.0)
+    parser.add_argument('--word-ms', type=float, default=350.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    ok = True
+    try:
+        print(f"{args.residents} residents x {args.medicines} medicines due at once, and one more a minute later\n")
+        for name, group in (('one announcement per reminder', False), ('grouped per resident', True)):
+            with quiet():
+                spoken, speaking, logged, acknowledged, not_requeued = run(workdir, name, args, group)
+            print(f"  {name}:")
+            print(f"    {len(spoken)} TTS calls, {speaking / 60:.1f} min of speech on one engine")
+            print(f"    e.g. {spoken[0]!r}")
+            print(f"    every reminder logged as announced: {logged}; "
+                  f"acknowledging one leaves the rest open: {acknowledged}")
+            print(f"    nothing queued again by a reload: {not_requeued}")
+            ok = ok and logged and acknowledged and not_requeued and (not group or len(spoken) == args.residents)
+        return 0 if ok else 1
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
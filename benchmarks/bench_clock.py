@@ -0,0 +1,148 @@
+"""Clock jump benchmark.
+
+Schedules N reminders (default 2000, for 10 residents) over the next four
+hours, starts the dispatcher on a wall clock that can be moved, and then
+
+  - jumps it forward two hours, as a suspended laptop waking up does:
+    reports how soon the jump is noticed, how long re-planning takes, how
+    many reminders fire at once (only those within the misfire grace
+    period) and how many are summarised instead, one summary per resident;
+    the same jump with the watchdog disabled fires every skipped reminder
+    in one burst, for comparison;
+  - jumps it back an hour, as a clock correction does: nothing that
+    already fired may fire again.
+
+Usage:
+    python benchmarks/bench_clock.py [--reminders 2000] [--watch 1.0]
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from harness import make_assistant, quiet
+
+from dispatcher import ReminderDispatcher
+from timecodes import epoch_minute, to_datetime
+
+RESIDENTS = 10
+
+
+class MovableClock:
+    """datetime.now() plus an offset that a test can change"""
+
+    def __init__(self):
+        self.offset = datetime.timedelta()
+
+    def __call__(self):
+        return datetime.datetime.now() + self.offset
+
+
+def setup(workdir, name, reminders, watch, jump_seconds):
+    assistant = make_assistant(os.path.join(workdir, f"{name}.db"))
+    profile_ids = [1] + [assistant.profiles.add(f"Resident {n}").result() for n in range(RESIDENTS - 1)]
+    start = epoch_minute(datetime.datetime.now()) + 1
+    rows = []
+    for n in range(reminders):
+        due = start + n * 240 // reminders
+        moment = to_datetime(due)
+        rows.append((profile_ids[n % RESIDENTS], f"dose {n}", moment.strftime('%H:%M'),
+                     moment.strftime('%Y-%m-%d'), 'en', due))
+    assistant.repository.import_batch(rows, [], 1).result()
+
+    clock = MovableClock()
+    spoken = []
+    assistant.speak = lambda text, language='en', profile=None: spoken.append((time.perf_counter(), text))
+    assistant.dispatcher = ReminderDispatcher(
+        assistant.due_reminders, assistant.dispatch_reminder, batch=assistant.settings['dispatcher']['batch'],
+        watch_seconds=watch, jump_seconds=jump_seconds,
+        misfire_grace_seconds=assistant.settings['dispatcher']['misfire_grace_seconds'],
+        on_jump=assistant.on_clock_jump, clock=clock)
+    assistant.dispatcher.start()
+    time.sleep(0.1)
+    return assistant, clock, spoken
+
+
+def jump(assistant, clock, spoken, delta, settle):
+    """Move the clock; return (ms until the re-plan or NaN, reminders fired, summaries spoken)"""
+    jumps = len(assistant.dispatcher.jumps)
+    before = len(spoken)
+    start = time.perf_counter()
+    clock.offset += delta
+    noticed = float('nan')
+    while time.perf_counter() - start < settle:
+        if noticed != noticed and len(assistant.dispatcher.jumps) > jumps:
+            noticed = (time.perf_counter() - start) * 1000
+        time.sleep(0.002)
+    assistant.writer.submit(lambda conn: None).result()
+    new = [text for _, text in spoken[before:]]
+    fired = sum(text.startswith('Reminder:') for text in new)
+    summaries = [text for text in new if not text.startswith('Reminder:')]
+    return noticed, fired, summaries
+
+
+def close(assistant):
+    assistant.dispatcher.stop()
+    assistant.writer.stop()
+    assistant.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reminders', type=int, default=2000)
+    parser.add_argument('--watch', type=float, default=1.0, help="dispatcher wake interval, seconds")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    ok = True
+    try:
+        print(f"{args.reminders} reminders over 4 hours for {RESIDENTS} residents, "
+              f"clock checked every {args.watch} s\n")
+        with quiet():
+            assistant, clock, spoken = setup(workdir, 'watchdog', args.reminders, args.watch, 2)
+        grace = assistant.settings['dispatcher']['misfire_grace_seconds']
+        expected_fire = sum(1 for n in range(args.reminders)
+                            if 120 - grace / 60 < n * 240 // args.reminders + 1 <= 120)
+
+        with quiet():
+            noticed, fired, summaries = jump(assistant, clock, spoken, datetime.timedelta(hours=2),
+                                             args.watch + 1.5)
+        caught_up = assistant.conn.execute(
+            "SELECT COUNT(*) FROM reminder_events WHERE kind = 'announced'").fetchone()[0] - fired
+        jump_stats = assistant.dispatcher.stats()['jumps'][-1]
+        print("  forward 2 h (suspend and resume):")
+        print(f"    noticed after {noticed:.0f} ms, re-planned in {jump_stats['replan_ms']:.2f} ms")
+        print(f"    {fired} fired (due within the last {grace} s), {caught_up} summarised "
+              f"in {len(summaries)} announcements")
+        if summaries:
+            print(f"    e.g. {summaries[0][:100]!r}...")
+        ok = ok and len(summaries) == RESIDENTS and abs(fired - expected_fire) <= RESIDENTS
+
+        with quiet():
+            noticed, fired, summaries = jump(assistant, clock, spoken, -datetime.timedelta(hours=1),
+                                             args.watch + 1.5)
+        jump_stats = assistant.dispatcher.stats()['jumps'][-1]
+        print("  back 1 h (clock corrected):")
+        print(f"    noticed after {noticed:.0f} ms, re-planned in {jump_stats['replan_ms']:.2f} ms, "
+              f"{fired} fired again")
+        ok = ok and fired == 0 and not summaries
+        close(assistant)
+
+        with quiet():
+            assistant, clock, spoken = setup(workdir, 'no_watchdog', args.reminders, args.watch, float('inf'))
+            _, fired, summaries = jump(assistant, clock, spoken, datetime.timedelta(hours=2), args.watch + 1.5)
+        times = [at for at, text in spoken if text.startswith('Reminder:')]
+        print("  forward 2 h without the watchdog:")
+        print(f"    {fired} fired in one burst over {(times[-1] - times[0]) * 1000 if times else 0:.0f} ms "
+              f"(each one a spoken announcement, queued back to back)")
+        close(assistant)
+        return 0 if ok else 1
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Compaction benchmark.
+
+Builds an on-disk database (in the old layout, without auto_vacuum, which
+startup converts) holding a long history of done reminders, then cleans it
+up twice from a copy:
+once with the old single DELETE of everything older than a week, once with
+Compactor runs (bounded batches moved to the archive file, incremental
+vacuum). Meanwhile another thread keeps marking reminders done and waiting
+for the commit, as a firing reminder does; its waits show how long cleanup
+blocks a trigger. Reports those waits, rows moved, pages reclaimed and the
+file size.
+
+Usage:
+    python benchmarks/bench_compaction.py [--rows 200000] [--budget-ms 200]
+"""
+import argparse
+import datetime
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from harness import make_assistant, quiet
+
+from compaction import Compactor
+from metrics import LatencyRecorder
+from schema import create_reminders
+from timecodes import epoch_minute
+
+
+def build(path, rows, upcoming):
+    """Old-layout file: a year of done reminders plus some upcoming ones"""
+    conn = sqlite3.connect(path)
+    create_reminders(conn)
+    rng = random.Random(rows)
+    today = datetime.date.today()
+    data = []
+    for i in range(rows):
+        day = today - datetime.timedelta(days=rng.randint(1, 365))
+        data.append((f"task {i} " + "x" * rng.randint(10, 60), f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+                     day.strftime('%Y-%m-%d'), 0))
+    for i in range(upcoming):
+        day = today + datetime.timedelta(days=rng.randint(1, 30))
+        data.append((f"upcoming {i}", '09:00', day.strftime('%Y-%m-%d'), 1))
+    conn.executemany('INSERT INTO reminders (task, time, date, active) VALUES (?, ?, ?, ?)', data)
+    conn.commit()
+    conn.close()
+
+
+def legacy_cleanup(assistant):
+    """cleanup_old_reminders before archiving: one DELETE, through the writer"""
+    cutoff = epoch_minute(datetime.date.today() - datetime.timedelta(days=7))
+    moved = assistant.writer.submit(
+        lambda conn: conn.execute('DELETE FROM reminders WHERE active = 0 AND due < ?', (cutoff,)).rowcount).result()
+    return {'moved': moved, 'pages_reclaimed': 0, 'runs': 1}
+
+
+def compactor_cleanup(assistant, args):
+    compactor = Compactor(assistant.db, assistant.repository, batch=args.batch, budget_ms=args.budget_ms)
+    total = {'moved': 0, 'pages_reclaimed': 0, 'runs': 0}
+    with quiet():
+        while True:
+            report = compactor.run()
+            total['runs'] += 1
+            total['moved'] += report['moved']
+            total['pages_reclaimed'] += report['pages_reclaimed']
+            if report['finished'] and report['free_pages'] == 0:
+                return total
+
+
+def measure(template, workdir, cleanup):
+    path = os.path.join(workdir, 'reminders.db')
+    shutil.copy(template, path)
+    assistant = make_assistant(path)
+    ids = [row[0] for row in assistant.conn.execute('SELECT id FROM reminders WHERE active = 1')]
+    size_before = os.path.getsize(path)
+
+    waits = LatencyRecorder('trigger commit wait', size=100000)
+    stop = threading.Event()
+
+    def triggers():
+        while not stop.is_set() and ids:
+            start = time.perf_counter()
+            assistant.repository.mark_done(ids.pop()).result()
+            waits.record((time.perf_counter() - start) * 1000)
+            time.sleep(0.005)
+
+    thread = threading.Thread(target=triggers)
+    thread.start()
+    start = time.perf_counter()
+    report = cleanup(assistant)
+    elapsed = (time.perf_counter() - start) * 1000
+    stop.set()
+    thread.join()
+    assistant.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    size_after = os.path.getsize(path)
+    archived = assistant.conn.execute('SELECT COUNT(*) FROM archive.reminders_archive').fetchone()[0]
+    archive_size = os.path.getsize(os.path.join(workdir, 'reminders_archive.db'))
+    assistant.writer.stop()
+    assistant.db.close()
+    os.remove(os.path.join(workdir, 'reminders_archive.db'))
+    return report, elapsed, waits, size_before, size_after, archived, archive_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--upcoming', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=200)
+    parser.add_argument('--budget-ms', type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        template = os.path.join(workdir, 'template.db')
+        build(template, args.rows, args.upcoming)
+        # Migrate once so both runs start from the same file
+        assistant = make_assistant(template)
+        assistant.writer.stop()
+        assistant.db.close()
+        print(f"{args.rows} done reminders over the past year, {args.upcoming} upcoming")
+        for label, cleanup in (('single DELETE', legacy_cleanup),
+                               ('compactor', lambda a: compactor_cleanup(a, args))):
+            report, elapsed, waits, before, after, archived, archive_size = measure(template, workdir, cleanup)
+            stats = waits.stats()
+            print(f"\n{label}:")
+            print(f"  {report['moved']} rows removed ({archived} kept in archive) in {report['runs']} run(s), "
+                  f"{elapsed:.0f} ms")
+            print(f"  file {before / 1024 / 1024:.1f} MiB -> {after / 1024 / 1024:.1f} MiB "
+                  f"({report['pages_reclaimed']} pages reclaimed), archive {archive_size / 1024 / 1024:.1f} MiB")
+            print(f"  trigger commit wait: p50 {stats['p50']:.2f} ms  p95 {stats['p95']:.2f} ms  "
+                  f"max {stats['max']:.2f} ms")
+        return 0
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""Database contention benchmark.
+
+Runs reminder triggers (UPDATE ... active = 0), UI refreshes (the Today and
+Tomorrow tab queries) and new-reminder inserts simultaneously from several
+threads against an on-disk database, first through one connection shared by
+every thread (the old setup: default rollback journal, no locking) and then
+through database.Database (a connection per thread, WAL, one writer at a
+time). Reports throughput, latency percentiles and errors per operation.
+
+Then a second process keeps importing reminders in chunks, as transfer.py
+does, while the app adds reminders and acknowledges them through its
+writer; neither may see an error.
+
+Usage:
+    python benchmarks/bench_contention.py [--seconds 3] [--threads 2]
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from harness import make_assistant, quiet
+
+from database import Database
+from metrics import LatencyRecorder
+from profiles import DEFAULT_PROFILE
+from schema import migrate
+from timecodes import day_range, epoch_minute
+
+
+class SharedConnection:
+    """The old setup: one connection used by every thread"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+
+    def connection(self):
+        return self.conn
+
+    @contextlib.contextmanager
+    def write(self):
+        yield self.conn
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def build(path, rows):
+    conn = sqlite3.connect(path)
+    with quiet():
+        migrate(conn)
+    rng = random.Random(rows)
+    today = datetime.date.today()
+    data = []
+    for i in range(rows):
+        day = today + datetime.timedelta(days=rng.randint(0, 30))
+        minute = rng.randint(0, 1439)
+        data.append((f"task {i}", f"{minute // 60:02d}:{minute % 60:02d}", day.strftime('%Y-%m-%d'),
+                     epoch_minute(day) + minute))
+    conn.executemany('INSERT INTO reminders (task, time, date, due) VALUES (?, ?, ?, ?)', data)
+    conn.commit()
+    conn.close()
+
+
+def trigger(db, rng, rows):
+    with db.write() as conn:
+        conn.execute('UPDATE reminders SET active = 0 WHERE id = ?', (rng.randint(1, rows),))
+
+
+def refresh(db, rng, rows):
+    today = datetime.date.today()
+    conn = db.connection()
+    for date in (today, today + datetime.timedelta(days=1)):
+        conn.execute('''
+            SELECT id, task, due, recurring, remaining_days FROM reminders
+            WHERE active = 1 AND due >= ? AND due < ? ORDER BY due
+        ''', day_range(date)).fetchall()
+
+
+def insert(db, rng, rows):
+    day = datetime.date.today() + datetime.timedelta(days=rng.randint(0, 30))
+    minute = rng.randint(0, 1439)
+    with db.write() as conn:
+        conn.execute('INSERT INTO reminders (task, time, date, language, due) VALUES (?, ?, ?, ?, ?)',
+                     ('new task', f"{minute // 60:02d}:{minute % 60:02d}", day.strftime('%Y-%m-%d'), 'en',
+                      epoch_minute(day) + minute))
+
+
+OPERATIONS = [('trigger', trigger), ('refresh', refresh), ('insert', insert)]
+
+
+def run(db, rows, threads, seconds):
+    recorders = {name: LatencyRecorder(name, size=100000) for name, _ in OPERATIONS}
+    errors = {name: 0 for name, _ in OPERATIONS}
+    first_error = {}
+    stop = time.perf_counter() + seconds
+
+    def worker(name, operation, seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                operation(db, rng, rows)
+            except Exception as e:
+                errors[name] += 1
+                first_error.setdefault(name, repr(e))
+                continue
+            recorders[name].record((time.perf_counter() - start) * 1000)
+
+    workers = [threading.Thread(target=worker, args=(name, operation, i * 10 + n))
+               for n, (name, operation) in enumerate(OPERATIONS) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return recorders, errors, first_error
+
+
+def app_changes(assistant, seconds):
+    """The app: add a reminder and acknowledge it, each waiting for its commit"""
+    wait = LatencyRecorder('app change wait', size=100000)
+    errors = []
+    due = datetime.datetime.now() + datetime.timedelta(hours=1)
+    stop = time.perf_counter() + seconds
+    while time.perf_counter() < stop:
+        try:
+            with wait.time():
+                reminder_id = assistant.repository.add("water", due.strftime('%H:%M'), due.date(), 'en',
+                                                       epoch_minute(due)).result()
+            with wait.time():
+                assistant.repository.mark_done(reminder_id).result()
+        except Exception as e:
+            errors.append(repr(e))
+    return wait, errors
+
+
+def importer(args):
+    """The other process: import chunks of reminders until the time is up"""
+    assistant = make_assistant(args.child_db)
+    due = datetime.datetime.now() + datetime.timedelta(days=1)
+    chunk = [(DEFAULT_PROFILE, f"imported {n}", due.strftime('%H:%M'), due.strftime('%Y-%m-%d'), 'en',
+              epoch_minute(due)) for n in range(args.chunk)]
+    chunks, errors = 0, []
+    stop = time.perf_counter() + args.seconds
+    while time.perf_counter() < stop:
+        try:
+            assistant.repository.import_batch(chunk, [], 2).result()
+            chunks += 1
+        except Exception as e:
+            errors.append(repr(e))
+    assistant.writer.stop()
+    assistant.db.close()
+    print(json.dumps({'chunks': chunks, 'errors': errors}))
+
+
+def two_processes(path, args):
+    with quiet():
+        assistant = make_assistant(path)
+    child = subprocess.Popen([sys.executable, __file__, '--child-db', path, '--seconds', str(args.seconds),
+                              '--chunk', str(args.chunk)], stdout=subprocess.PIPE, text=True)
+    wait, errors = app_changes(assistant, args.seconds)
+    output = child.communicate()[0]
+    assistant.writer.stop()
+    assistant.db.close()
+    other = json.loads(output.strip().splitlines()[-1])
+    return wait, errors, other
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=2, help='threads per operation')
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--chunk', type=int, default=500, help='reminders per import chunk')
+    parser.add_argument('--child-db')
+    args = parser.parse_args()
+    if args.child_db:
+        return importer(args)
+
+    workdir = tempfile.mkdtemp()
+    try:
+        template = os.path.join(workdir, 'template.db')
+        build(template, args.rows)
+        print(f"{args.rows} reminders, {args.threads} threads per operation, {args.seconds:.0f}s per setup")
+        for label, factory in (('shared connection', SharedConnection),
+                               ('per-thread + WAL', Database)):
+            path = os.path.join(workdir, f"{label.split()[0]}.db")
+            shutil.copy(template, path)
+            db = factory(path)
+            recorders, errors, first_error = run(db, args.rows, args.threads, args.seconds)
+            db.close()
+            print(f"\n{label}:")
+            for name, _ in OPERATIONS:
+                stats = recorders[name].stats()
+                print(f"  {name:<8} {stats['count'] / args.seconds:>8.0f} ops/s   p50 {stats['p50']:>6.2f} ms   "
+                      f"p95 {stats['p95']:>7.2f} ms   p99 {stats['p99']:>7.2f} ms   errors {errors[name]}")
+                if name in first_error:
+                    print(f"           first error: {first_error[name]}")
+
+        path = os.path.join(workdir, 'processes.db')
+        shutil.copy(template, path)
+        wait, errors, other = two_processes(path, args)
+        print(f"\napp and an importing process (chunks of {args.chunk}):")
+        print(f"  app      {wait}   errors {len(errors)}")
+        print(f"  importer {other['chunks']} chunks   errors {len(other['errors'])}")
+        for error in (errors + other['errors'])[:1]:
+            print(f"           first error: {error}")
+        return 1 if errors or other['errors'] else 0
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
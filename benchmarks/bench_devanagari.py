@@ -0,0 +1,100 @@
+"""Devanagari normalizer accuracy and speed benchmark.
+
+Checks the Hindi/Marathi normalizer (digits, NFC/NFD variants, number words,
+"साढ़े सात"-style fractions) against labelled cases, checks the time the
+assistant's parser (find_intent and parse_reminder_slots) reads from the
+normalized text, and compares its speed
+with a naive one-regex-per-word baseline.
+
+Usage:
+    python benchmarks/bench_devanagari.py [--cases benchmarks/nlu_corpus/devanagari_v1.jsonl]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import unicodedata
+
+from harness import make_assistant, rate
+
+DEFAULT_CASES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nlu_corpus", "devanagari_v1.jsonl")
+
+
+def naive_normalizer(pack):
+    """Baseline: one re.sub per digit and per number word, as a first attempt would do it"""
+    substitutions = [(re.compile(chr(0x0966 + d)), str(d)) for d in range(10)]
+    for word, value in pack['number_words'].items():
+        substitutions.append((re.compile(r'(?<!\S)' + re.escape(word) + r'(?!\S)'), str(value)))
+
+    def normalize(text):
+        text = unicodedata.normalize('NFC', text)
+        for pattern, value in substitutions:
+            text = pattern.sub(value, text)
+        return ' '.join(text.split())
+
+    return normalize
+
+
+def parsed_time(assistant, language, normalized):
+    """HH:MM the assistant's own pattern match and slot parser read, or None"""
+    intent, match = assistant.find_intent(normalized, language)
+    if intent != 'set_reminder':
+        return None
+    slots = assistant.parse_reminder_slots(match, normalized, language)
+    if slots is None:
+        return None
+    _, hour, minute, _ = slots
+    return f"{hour:02d}:{minute:02d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', default=DEFAULT_CASES)
+    parser.add_argument('--seconds', type=float, default=1.0)
+    args = parser.parse_args()
+
+    with open(args.cases, encoding='utf-8') as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+
+    assistant = make_assistant()
+    packs = assistant.patterns
+
+    normalized_ok = time_ok = timed = 0
+    failures = []
+    for case in cases:
+        pack = packs[case['lang']]
+        normalized = pack['normalizer'].normalize(case['text'])
+        if normalized == case['normalized']:
+            normalized_ok += 1
+        else:
+            failures.append((case['id'], 'normalized', normalized, case['normalized']))
+        if 'time' in case:
+            timed += 1
+            got = parsed_time(assistant, case['lang'], normalized)
+            if got == case['time']:
+                time_ok += 1
+            else:
+                failures.append((case['id'], 'time', got, case['time']))
+
+    print(f"Cases: {os.path.basename(args.cases)} ({len(cases)})")
+    print(f"  normalization accuracy  {normalized_ok / len(cases):.1%}")
+    if timed:
+        print(f"  time accuracy           {time_ok / timed:.1%}")
+
+    print("\nThroughput (texts/sec):")
+    for lang in sorted({case['lang'] for case in cases}):
+        pack = packs[lang]
+        texts = [case['text'] for case in cases if case['lang'] == lang]
+        fast = rate(pack['normalizer'].normalize, texts, args.seconds)
+        slow = rate(naive_normalizer(pack), texts, args.seconds)
+        print(f"  [{lang}] one-pass {fast:>10,.0f}   naive re.sub {slow:>10,.0f}   ({fast / slow:.1f}x)")
+
+    for case_id, field, got, expected in failures:
+        print(f"  FAIL {case_id} {field}: got {got!r}, expected {expected!r}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
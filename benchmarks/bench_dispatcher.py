@@ -0,0 +1,117 @@
+"""Reminder dispatcher startup and timing benchmark.
+
+Startup: fills a database with N future reminders and compares the old
+startup (one APScheduler date job re-added per reminder) with the next-due
+dispatcher, which only reads one batch from the (active, date, time) index.
+
+Timing: runs a started dispatcher over reminders due within the next couple
+of seconds and reports how late they fire.
+
+Usage:
+    python benchmarks/bench_dispatcher.py [--reminders 1000 10000 100000]
+"""
+import argparse
+import datetime
+import random
+import sys
+import time
+import tracemalloc
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from harness import make_assistant, quiet
+
+from dispatcher import ReminderDispatcher
+from metrics import LatencyRecorder
+
+
+def fill(assistant, count):
+    """Insert count active reminders spread over the next year"""
+    rng = random.Random(count)
+    today = datetime.date.today()
+    rows = []
+    for i in range(count):
+        day = today + datetime.timedelta(days=rng.randint(1, 365))
+        rows.append((f"task {i}", f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}", day.strftime('%Y-%m-%d')))
+    assistant.conn.executemany('INSERT INTO reminders (task, time, date) VALUES (?, ?, ?)', rows)
+    assistant.conn.commit()
+
+
+def legacy_startup(assistant):
+    """The pre-dispatcher load_existing_reminders: every active reminder becomes a job"""
+    cursor = assistant.conn.cursor()
+    cursor.execute('SELECT id, task, time, date, language, recurring FROM reminders WHERE active = 1')
+    now = datetime.datetime.now()
+    for reminder_id, task, time_str, date_str, language, is_recurring in cursor.fetchall():
+        due = datetime.datetime.strptime(f"{date_str} {time_str}", '%Y-%m-%d %H:%M')
+        if due > now:
+            assistant.scheduler.add_job(func=assistant.trigger_reminder, trigger="date", run_date=due,
+                                        args=[task, language, reminder_id, is_recurring],
+                                        id=f"reminder_{reminder_id}")
+
+
+def dispatcher_startup(assistant):
+    assistant.load_existing_reminders()
+    assistant.dispatcher.next_due()
+
+
+def startup(count, load):
+    assistant = make_assistant()
+    assistant.scheduler = BackgroundScheduler()
+    fill(assistant, count)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    with quiet():
+        load(assistant)
+    elapsed = time.perf_counter() - start
+    retained = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(before, 'filename'))
+    tracemalloc.stop()
+    timers = len(assistant.scheduler.get_jobs()) + len(assistant.dispatcher.pending)
+    return elapsed, timers, retained
+
+
+def lateness(count, spread):
+    """Fire count reminders due within spread seconds; return the lateness recorder"""
+    recorder = LatencyRecorder('fire lateness', size=count)
+    now = datetime.datetime.now()
+    due = {i: now + datetime.timedelta(seconds=0.2 + random.random() * spread) for i in range(count)}
+    done = []
+
+    def fire(reminder_id):
+        recorder.record((datetime.datetime.now() - due[reminder_id]).total_seconds() * 1000)
+        done.append(reminder_id)
+
+    dispatcher = ReminderDispatcher(lambda after, limit: [], fire)
+    dispatcher.horizon = None  # everything is added explicitly
+    for reminder_id, when in due.items():
+        dispatcher.add(reminder_id, when, None)
+    dispatcher.start()
+    deadline = time.time() + spread + 5
+    while len(done) < count and time.time() < deadline:
+        time.sleep(0.05)
+    dispatcher.stop()
+    return recorder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reminders', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--fire', type=int, default=200)
+    parser.add_argument('--spread', type=float, default=2.0)
+    args = parser.parse_args()
+
+    print("Startup with N future reminders:")
+    print(f"{'N':>8} {'startup':<11} {'ms':>9} {'timers':>7} {'retained KiB':>13}")
+    for count in args.reminders:
+        for name, load in (('job each', legacy_startup), ('dispatcher', dispatcher_startup)):
+            elapsed, timers, retained = startup(count, load)
+            print(f"{count:>8} {name:<11} {elapsed * 1000:>9.1f} {timers:>7} {retained / 1024:>13.1f}")
+
+    print(f"\nFiring {args.fire} reminders due within {args.spread:.0f}s:")
+    print(f"  {lateness(args.fire, args.spread)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Change notification benchmark.
+
+Measures how soon the window hears about a change: the time from marking
+a reminder done to the REMINDERS_CHANGED event (which replaces the window's
+30 second refresh timer, so a fired reminder could stay on screen for up to
+30 s), and the time until a write by another process is noticed through
+PRAGMA data_version. Also counts the events published while idle, which
+should be none.
+
+Usage:
+    python benchmarks/bench_events.py [--changes 200] [--external 5] [--poll-ms 200]
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from harness import make_assistant
+
+from events import REMINDERS_CHANGED
+from metrics import LatencyRecorder
+from timecodes import epoch_minute
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--changes', type=int, default=200)
+    parser.add_argument('--external', type=int, default=5)
+    parser.add_argument('--poll-ms', type=int, default=200)
+    parser.add_argument('--idle', type=float, default=2.0, help='seconds to watch while idle')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(workdir, 'reminders.db')
+        assistant = make_assistant(path)
+        assistant.writer.stop()
+        assistant.writer.poll = args.poll_ms / 1000
+        assistant.writer.start()
+        repository = assistant.repository
+        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+        due = epoch_minute(tomorrow) + 600
+
+        received = threading.Event()
+        events = []
+
+        def on_change(days, profiles):
+            events.append(days)
+            received.set()
+
+        assistant.events.subscribe(REMINDERS_CHANGED, on_change)
+
+        ids = [repository.add(f"task {i}", '10:00', tomorrow, 'en', due).result() for i in range(args.changes)]
+        internal = LatencyRecorder('mark done -> event')
+        for reminder_id in ids:
+            received.clear()
+            start = time.perf_counter()
+            repository.mark_done(reminder_id)
+            received.wait(5)
+            internal.record((time.perf_counter() - start) * 1000)
+
+        external = LatencyRecorder('other process -> event')
+        other = sqlite3.connect(path)
+        for i in range(args.external):
+            received.clear()
+            start = time.perf_counter()
+            other.execute('INSERT INTO reminders (task, time, date, due) VALUES (?, ?, ?, ?)',
+                          (f"external {i}", '10:00', tomorrow.strftime('%Y-%m-%d'), due))
+            other.commit()
+            received.wait(5)
+            external.record((time.perf_counter() - start) * 1000)
+        other.close()
+
+        before = len(events)
+        time.sleep(args.idle)
+        idle_events = len(events) - before
+
+        print(f"  {internal}")
+        print(f"  {external}  (poll every {args.poll_ms} ms)")
+        print(f"  events while idle for {args.idle:g} s: {idle_events}")
+        print("  (the old refresh timer rebuilt all three tabs every 30 s and was up to 30000 ms late)")
+        assistant.writer.stop()
+        assistant.db.close()
+        return 0 if idle_events == 0 else 1
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""Bulk import/export benchmark.
+
+Writes a prescription list of N records (default 100k; one-off reminders
+over the next 30 days plus a few daily rules, spread over 50 residents) as
+CSV, JSON lines and iCalendar, then for each format
+
+  - imports it through transfer.import_file into a fresh database,
+    reporting records/s, while another thread keeps adding and acknowledging
+    reminders as the app would and records how long those waited,
+  - exports everything back in the same format and checks the export
+    imports again to the same number of records.
+
+Then the CSV is imported by the command line tool (python transfer.py
+import), in its own process, into the database of a running app that keeps
+adding and acknowledging reminders; neither process may see an error.
+
+Peak Python memory (tracemalloc) is compared for a tenth of the rows and all
+of them: streaming keeps it flat. One-at-a-time inserts, as the Add
+Reminder dialog does them, are timed on a sample for comparison.
+
+Usage:
+    python benchmarks/bench_import.py [--rows 100000]
+"""
+import argparse
+import csv
+import datetime
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from harness import VARIANT_DIR, make_assistant
+
+import transfer
+from metrics import LatencyRecorder
+from timecodes import epoch_minute
+
+RESIDENTS = 50
+
+
+def records(rows):
+    """Synthetic prescriptions: every 20th record is a 30-day daily rule"""
+    tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+    for n in range(rows):
+        record = {
+            'task': f"medicine {n % 40}, {n % 3 + 1} tablet(s)",
+            'date': (tomorrow + datetime.timedelta(days=n % 30)).strftime('%Y-%m-%d'),
+            'time': f"{6 + n % 16:02d}:{n % 4 * 15:02d}",
+            'language': ('en', 'hi')[n % 2],
+            'resident': f"R{n % RESIDENTS:04d}",
+            'repeat': '', 'interval': '', 'count': '', 'until': '',
+        }
+        if n % 20 == 0:
+            record.update(repeat='daily', interval=1, count=30)
+        yield f"gen-{n}", record
+
+
+def write_inputs(workdir, rows):
+    paths = {}
+    for fmt in ('csv', 'jsonl', 'ics'):
+        path = paths[fmt] = os.path.join(workdir, f"prescriptions_{rows}.{fmt}")
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            transfer.WRITERS[fmt](f, records(rows))
+    return paths
+
+
+def fresh_assistant(workdir, name):
+    assistant = make_assistant(os.path.join(workdir, f"{name}.db"))
+    futures = [assistant.profiles.add(f"Resident {n}", resident_id=f"R{n:04d}") for n in range(RESIDENTS)]
+    for future in futures:
+        future.result()
+    return assistant
+
+
+def live_traffic(assistant, stop, wait, errors=None):
+    """What the running app does meanwhile: add a reminder, acknowledge it, every 10 ms"""
+    now = datetime.datetime.now() + datetime.timedelta(hours=1)
+    while not stop.is_set():
+        try:
+            with wait.time():
+                reminder_id = assistant.repository.add("water", now.strftime('%H:%M'), now.date(), 'en',
+                                                       epoch_minute(now)).result()
+            with wait.time():
+                assistant.repository.mark_done(reminder_id).result()
+        except Exception as e:
+            if errors is None:
+                raise
+            errors.append(repr(e))
+        time.sleep(0.01)
+
+
+def import_with_traffic(assistant, path):
+    wait = LatencyRecorder('live change wait during import')
+    stop = threading.Event()
+    thread = threading.Thread(target=live_traffic, args=(assistant, stop, wait))
+    thread.start()
+    report = transfer.import_file(assistant.repository, assistant.profiles, path,
+                                  on_batch=lambda count, rule_ids: assistant.dispatcher.reload())
+    stop.set()
+    thread.join()
+    return report, wait
+
+
+def import_from_other_process(workdir, path):
+    """transfer.py's own command line import, next to a running app; returns
+    (records imported, the tool's errors, the app's errors, the app's waits)"""
+    assistant = fresh_assistant(workdir, 'cli')
+    wait = LatencyRecorder('live change wait during CLI import')
+    errors = []
+    stop = threading.Event()
+    thread = threading.Thread(target=live_traffic, args=(assistant, stop, wait, errors))
+    thread.start()
+    tool = subprocess.run([sys.executable, os.path.join(VARIANT_DIR, 'transfer.py'), 'import', path,
+                           '--db', os.path.join(workdir, 'cli.db')],
+                          cwd=workdir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    stop.set()
+    thread.join()
+    assistant.writer.stop()
+    assistant.db.close()
+    counts = re.search(r'Imported (\d+) reminders and (\d+) recurring', tool.stdout)
+    imported = int(counts.group(1)) + int(counts.group(2)) if counts else 0
+    tool_errors = [] if tool.returncode == 0 else [tool.stdout.strip().splitlines()[-1]]
+    return imported, tool_errors, errors, wait
+
+
+def peak_memory(workdir, path, name):
+    assistant = fresh_assistant(workdir, name)
+    tracemalloc.start()
+    transfer.import_file(assistant.repository, assistant.profiles, path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assistant.writer.stop()
+    assistant.db.close()
+    return peak
+
+
+def one_at_a_time(assistant, path, sample):
+    """Reminders added singly, each waiting for its commit"""
+    residents = {profile.resident_id: profile.id for profile in assistant.profiles.all()}
+    now = epoch_minute(datetime.datetime.now())
+    start = time.perf_counter()
+    with open(path, encoding='utf-8', newline='') as f:
+        for n, record in enumerate(csv.DictReader(f)):
+            if n == sample:
+                break
+            kind, params = transfer.parse_record(record, residents, 1, now)
+            if kind == 'reminder':
+                profile_id, task, time_str, date, language, due = params
+                assistant.repository.add(task, time_str, datetime.date.fromisoformat(date), language, due,
+                                         profile_id).result()
+    return sample / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--sample', type=int, default=2000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    ok = True
+    try:
+        paths = write_inputs(workdir, args.rows)
+        print(f"{args.rows} records, {RESIDENTS} residents, chunks of {transfer.CHUNK_ROWS}\n")
+        for fmt, path in paths.items():
+            assistant = fresh_assistant(workdir, fmt)
+            report, wait = import_with_traffic(assistant, path)
+            records_in = report.reminders + report.rules
+            print(f"  import {fmt:<6} {os.path.getsize(path) / 2 ** 20:6.1f} MiB  {report.seconds:6.2f} s  "
+                  f"{records_in / report.seconds:>8.0f} records/s  skipped {report.skipped}")
+            print(f"    {wait}")
+            ok = ok and records_in == args.rows and not report.skipped
+
+            out = os.path.join(workdir, f"export.{fmt}")
+            start = time.perf_counter()
+            count = transfer.export_file(assistant.db, out)
+            elapsed = time.perf_counter() - start
+            print(f"  export {fmt:<6} {count} records in {elapsed:.2f} s ({count / elapsed:.0f} records/s)")
+            assistant.writer.stop()
+            assistant.db.close()
+
+            check = fresh_assistant(workdir, f"check_{fmt}")
+            again = transfer.import_file(check.repository, check.profiles, out)
+            check.writer.stop()
+            check.db.close()
+            if again.reminders + again.rules != count or again.skipped:
+                ok = False
+                print(f"  FAIL re-importing the export gave {again}")
+
+        imported, tool_errors, app_errors, wait = import_from_other_process(workdir, paths['csv'])
+        print(f"\n  CSV imported by transfer.py in another process: {imported} records, "
+              f"tool errors {len(tool_errors)}, app errors {len(app_errors)}")
+        print(f"    {wait}")
+        for error in (tool_errors + app_errors)[:1]:
+            print(f"    first error: {error}")
+        ok = ok and imported == args.rows and not tool_errors and not app_errors
+
+        small = write_inputs(workdir, args.rows // 10)['csv']
+        peaks = [(rows, peak_memory(workdir, path, f"memory_{rows}"))
+                 for rows, path in ((args.rows // 10, small), (args.rows, paths['csv']))]
+        print("\n  peak Python memory while importing CSV: " +
+              ", ".join(f"{rows} records {peak / 2 ** 20:.1f} MiB" for rows, peak in peaks))
+
+        assistant = fresh_assistant(workdir, 'single')
+        rate = one_at_a_time(assistant, paths['csv'], args.sample)
+        assistant.writer.stop()
+        assistant.db.close()
+        print(f"  one reminder at a time (Add Reminder dialog): {rate:.0f} records/s")
+        return 0 if ok else 1
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Reminder journal benchmark.
+
+Runs the same workload twice, once with the reminders table alone and once
+with the journal (journal.py) turned on: rounds of importing a batch of
+reminders and acknowledging most of them one by one, as the writer
+thread commits them, until the journal holds N entries (default 1M). A
+snapshot is taken whenever journal.snapshot_every entries have been added,
+as the periodic job does. Reports
+
+  - workload time and bytes written (write() calls on the database, WAL
+    and checkpoints, from /proc/self/io) per change, and the file size:
+    the journal's write amplification,
+  - rebuilding the active reminders: from the reminders table through the
+    (active, due) index, by replaying the whole journal, and from the
+    latest snapshot plus the journal after it, all three checked equal.
+
+Usage:
+    python benchmarks/bench_journal.py [--events 1000000] [--batch 2000]
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from harness import make_assistant, quiet
+
+from journal import COLUMNS, SQL_ACTIVE_STATE
+from timecodes import epoch_minute
+
+
+def written_bytes():
+    """Bytes this process has passed to write() so far (Linux), or None"""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+def workload(assistant, events, batch, journal):
+    """Import batch reminders, acknowledge three quarters of them singly, repeat; return changes made"""
+    tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+    done = batch * 3 // 4
+    changes = next_id = 0
+    while changes < events:
+        rows = []
+        for n in range(batch):
+            day = tomorrow + datetime.timedelta(days=n % 30)
+            minute = 6 * 60 + n % (16 * 60)
+            rows.append((1, f"medicine {n % 40}", f"{minute // 60:02d}:{minute % 60:02d}", day.strftime('%Y-%m-%d'),
+                         'en', epoch_minute(day) + minute))
+        assistant.repository.import_batch(rows, [], 1).result()
+        futures = [assistant.repository.mark_done(reminder_id) for reminder_id in range(next_id + 1, next_id + done + 1)]
+        futures[-1].result()
+        next_id += batch
+        changes += batch + done
+        if journal:
+            assistant.journal.maybe_snapshot()
+    return changes
+
+
+def run(workdir, name, events, batch, journal):
+    path = os.path.join(workdir, f"{name}.db")
+    assistant = make_assistant(path)
+    with assistant.db.write_lock:
+        assistant.journal.enable(assistant.conn, journal)
+    written = written_bytes()
+    start = time.perf_counter()
+    changes = workload(assistant, events, batch, journal)
+    assistant.writer.submit(lambda conn: None).result()
+    elapsed = time.perf_counter() - start
+    assistant.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    written = written_bytes() - written if written is not None else None
+    size = sum(os.path.getsize(p) for p in (path, path + '-wal') if os.path.exists(p))
+    return assistant, changes, elapsed, written, size
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--batch', type=int, default=2000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    ok = True
+    try:
+        print(f"Import {args.batch} reminders, acknowledge {args.batch * 3 // 4} of them, "
+              f"until {args.events} changes\n")
+        print(f"  {'':<22} {'seconds':>8} {'bytes written/change':>21} {'file MiB':>9}")
+        results = {}
+        for name, journal in (('reminders table', False), ('table + journal', True)):
+            with quiet():
+                assistant, changes, elapsed, written, size = run(workdir, name.replace(' ', '_'), args.events,
+                                                                 args.batch, journal)
+            results[name] = (assistant, written)
+            per_change = f"{written / changes:.0f}" if written is not None else 'n/a'
+            print(f"  {name:<22} {elapsed:>8.1f} {per_change:>21} {size / 2 ** 20:>9.1f}")
+        base, journalled = results['reminders table'][1], results['table + journal'][1]
+        if base and journalled:
+            print(f"  the journal writes {journalled / base:.2f}x as many bytes")
+
+        assistant = results['table + journal'][0]
+        journal = assistant.journal
+        entries = journal.last_seq()
+        snapshot_seq = assistant.conn.execute('SELECT MAX(seq) FROM reminder_snapshots').fetchone()[0] or 0
+        print(f"\n  {entries} journal entries, latest snapshot at {snapshot_seq} "
+              f"(every {journal.snapshot_every}); rebuilding the active reminders:")
+        table, table_ms = timed(lambda: {row[0]: tuple(row) for row in assistant.conn.execute(SQL_ACTIVE_STATE)})
+        replayed, replay_ms = timed(lambda: journal.state(from_snapshot=False))
+        restored, restore_ms = timed(journal.state)
+        for label, ms in (('from the reminders table', table_ms), ('replaying the whole journal', replay_ms),
+                          ('snapshot + tail', restore_ms)):
+            print(f"    {label:<30} {ms:>9.1f} ms")
+        print(f"    {len(table)} active reminders ({len(COLUMNS)} columns each)")
+        if not table == replayed == restored:
+            ok = False
+            print("  FAIL the journal and the table disagree")
+
+        for assistant, _ in results.values():
+            assistant.writer.stop()
+            assistant.db.close()
+        return 0 if ok else 1
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""In-memory database benchmark.
+
+Makes N reminder changes (default 2000) the way voice commands and the
+window do, one at a time, each waiting for its commit: add a reminder,
+and mark every other one done. This runs against the database file, with
+synchronous 'normal' (the default) and 'full', and in memory
+(memory_store.enabled), with and without fsync on the redo log. It reports
+commit latency percentiles, fsync/fdatasync calls (counted by a small
+LD_PRELOAD library built with the C compiler, when there is one) and the
+bytes written. Shutdown is included, which for the in-memory mode writes
+the file.
+
+Then it kills a process running in memory mode partway through (SIGKILL,
+so nothing is persisted) and checks that every change it had been told
+was committed comes back from the file plus the redo log.
+
+Usage:
+    python benchmarks/bench_memory.py [--changes 2000]
+"""
+import argparse
+import ctypes
+import datetime
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from harness import StubScheduler, quiet
+
+from timecodes import epoch_minute
+
+FSYNC_COUNTER = r'''
+#define _GNU_SOURCE
+#include <dlfcn.h>
+
+static long fsyncs;
+
+long voicecare_fsyncs(void) { return fsyncs; }
+
+int fsync(int fd) {
+    static int (*real)(int);
+    if (!real) real = dlsym(RTLD_NEXT, "fsync");
+    fsyncs++;
+    return real(fd);
+}
+
+int fdatasync(int fd) {
+    static int (*real)(int);
+    if (!real) real = dlsym(RTLD_NEXT, "fdatasync");
+    fsyncs++;
+    return real(fd);
+}
+'''
+
+MODES = {
+    'file, synchronous normal': {'database': {'synchronous': 'normal'}},
+    'file, synchronous full': {'database': {'synchronous': 'full'}},
+    'memory, redo log': {'memory_store': {'enabled': True}},
+    'memory, redo log fsynced': {'memory_store': {'enabled': True, 'fsync_redo': True}},
+}
+
+
+def build_counter(workdir):
+    """Compile the fsync counting library; returns its path or None"""
+    source = os.path.join(workdir, 'fsync_counter.c')
+    library = os.path.join(workdir, 'fsync_counter.so')
+    with open(source, 'w') as f:
+        f.write(FSYNC_COUNTER)
+    try:
+        subprocess.run(['cc', '-shared', '-fPIC', '-o', library, source, '-ldl'], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return library
+
+
+def fsync_calls():
+    try:
+        return ctypes.CDLL(None).voicecare_fsyncs()
+    except (AttributeError, OSError):
+        return None
+
+
+def written_bytes():
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+def open_assistant(path, overrides):
+    from voicecare_final import VoiceCareAssistant
+    from voicecare_settings import load_settings, merge
+
+    assistant = VoiceCareAssistant.__new__(VoiceCareAssistant)
+    assistant.settings = merge(load_settings(path=None), overrides)
+    assistant.scheduler = StubScheduler()
+    assistant.speak = lambda text, language='en', profile=None: None
+    with quiet():
+        assistant.setup_database(path)
+    return assistant
+
+
+def changes(assistant, count, progress=None):
+    """One change at a time, each waiting for its commit, as the UI makes them"""
+    due = datetime.datetime.now() + datetime.timedelta(days=1)
+    for n in range(count):
+        reminder_id = assistant.repository.add(f"medicine {n}", due.strftime('%H:%M'), due.date(), 'en',
+                                               epoch_minute(due)).result()
+        if n % 2:
+            assistant.repository.mark_done(reminder_id).result()
+        if progress:
+            progress(reminder_id, n % 2 == 1)
+
+
+def child(args):
+    """Run one mode (in its own process, so the fsync count is its own)"""
+    overrides = MODES[args.child]
+    path = os.path.join(args.workdir, 'reminders.db')
+    fsyncs, written = fsync_calls(), written_bytes()
+    start = time.perf_counter()
+    assistant = open_assistant(path, overrides)
+    with quiet():
+        # Start from an existing file, as on a kiosk that has run before
+        assistant.writer.submit(lambda conn: None).result()
+    setup = (fsync_calls(), written_bytes())
+    changes(assistant, args.changes)
+    assistant.writer.stop()
+    if assistant.memory_store is not None:
+        assistant.memory_store.close()
+    elapsed = time.perf_counter() - start
+    result = {
+        'commits': assistant.writer.stats()['batches'],
+        'commit_ms': assistant.writer.commit_latency.stats(),
+        'wait_ms': assistant.writer.wait_latency.stats(),
+        'seconds': elapsed,
+        'fsyncs': None if fsyncs is None else fsync_calls() - setup[0],
+        'written': None if written is None else written_bytes() - setup[1],
+    }
+    assistant.db.close()
+    print(json.dumps(result))
+
+
+def crash_child(args):
+    """Memory mode, printing each acknowledged change until killed"""
+    assistant = open_assistant(os.path.join(args.workdir, 'crash.db'), MODES['memory, redo log'])
+
+    def progress(reminder_id, done):
+        print(f"ack {reminder_id} {int(done)}", flush=True)
+    changes(assistant, 10 ** 9, progress)
+
+
+def crash_test(workdir, seconds):
+    """Kill a memory-mode process; check every acknowledged change survives"""
+    process = subprocess.Popen([sys.executable, __file__, '--child', 'crash', '--workdir', workdir],
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    time.sleep(seconds)
+    os.kill(process.pid, signal.SIGKILL)
+    output = process.communicate()[0]
+    acknowledged = {}
+    # Only whole lines: the process may have been killed halfway through printing one
+    for line in output.split('\n')[:-1]:
+        fields = line.split()
+        if len(fields) == 3 and fields[0] == 'ack':
+            acknowledged[int(fields[1])] = fields[2] == '1'
+    start = time.perf_counter()
+    assistant = open_assistant(os.path.join(workdir, 'crash.db'), MODES['memory, redo log'])
+    recovery_ms = (time.perf_counter() - start) * 1000
+    rows = dict(assistant.conn.execute('SELECT id, active FROM reminders'))
+    lost = [reminder_id for reminder_id, done in acknowledged.items()
+            if reminder_id not in rows or rows[reminder_id] == int(done)]
+    assistant.writer.stop()
+    assistant.db.close()
+    return len(acknowledged), lost, recovery_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--changes', type=int, default=2000)
+    parser.add_argument('--child')
+    parser.add_argument('--workdir')
+    args = parser.parse_args()
+    if args.child == 'crash':
+        return crash_child(args)
+    if args.child:
+        return child(args)
+
+    workdir = tempfile.mkdtemp()
+    try:
+        library = build_counter(workdir)
+        env = dict(os.environ)
+        if library:
+            env['LD_PRELOAD'] = ' '.join(filter(None, (env.get('LD_PRELOAD'), library)))
+        print(f"{args.changes} changes, one at a time (adds, every other one marked done)\n")
+        print(f"  {'':<26} {'commits':>7} {'commit p50':>10} {'p95':>7} {'p99':>7} "
+              f"{'fsyncs':>7} {'KiB written':>11}")
+        for mode in MODES:
+            modedir = os.path.join(workdir, mode.replace(' ', '_').replace(',', ''))
+            os.mkdir(modedir)
+            output = subprocess.run([sys.executable, __file__, '--child', mode, '--workdir', modedir,
+                                     '--changes', str(args.changes)], env=env, check=True,
+                                    stdout=subprocess.PIPE, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            commit = result['commit_ms']
+            fsyncs = 'n/a' if result['fsyncs'] is None else result['fsyncs']
+            written = 'n/a' if result['written'] is None else f"{result['written'] / 1024:.0f}"
+            print(f"  {mode:<26} {result['commits']:>7} {commit['p50']:>8.2f}ms {commit['p95']:>5.2f}ms "
+                  f"{commit['p99']:>5.2f}ms {fsyncs:>7} {written:>11}")
+
+        acknowledged, lost, recovery_ms = crash_test(workdir, 1.0)
+        print(f"\n  killed a memory-mode process after {acknowledged} acknowledged changes: "
+              f"{len(lost)} lost, recovered in {recovery_ms:.0f} ms")
+        return 1 if lost or not acknowledged else 0
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""NLU regression and throughput benchmark.
+
+Replays a labelled corpus of utterances through process_voice_command with
+stubbed TTS, scheduler and an in-memory database, then reports intent
+accuracy, slot accuracy and parses per second. Then it replays
+nlu_corpus/regressions.jsonl, utterances that were once parsed wrong, and
+exits with status 1 if any of them is parsed wrong again.
+
+Usage:
+    python benchmarks/bench_nlu.py [--corpus benchmarks/nlu_corpus/v1.jsonl] [--json out.json]
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+
+from harness import make_assistant, quiet, rate
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nlu_corpus", "v1.jsonl")
+REGRESSIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nlu_corpus", "regressions.jsonl")
+
+
+def load_corpus(path):
+    """Read one labelled utterance per line"""
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def normalize_task(task):
+    return " ".join(task.lower().split()) if task else task
+
+
+class Probe:
+    """Record which handler a command reached and the slots it extracted"""
+
+    def __init__(self, assistant):
+        self.assistant = assistant
+        self.reset()
+
+        parse_slots = assistant.parse_reminder_slots
+        handle_query = assistant.handle_query_schedule
+        detect_language = assistant.detect_language
+
+        def spy_slots(match, text, language):
+            self.intent = 'set_reminder'
+            self.slots = parse_slots(match, text, language)
+            return self.slots
+
+        def spy_query(language):
+            self.intent = 'query_schedule'
+            return handle_query(language)
+
+        def spy_language(text):
+            self.language = detect_language(text)
+            return self.language
+
+        assistant.parse_reminder_slots = spy_slots
+        assistant.handle_query_schedule = spy_query
+        assistant.detect_language = spy_language
+
+    def reset(self):
+        self.intent = 'none'
+        self.slots = None
+        self.language = None
+
+    def run(self, text):
+        self.reset()
+        self.assistant.process_voice_command(text)
+        return self.intent, self.slots, self.language
+
+
+def score(corpus, probe):
+    """Return per-utterance results for the corpus"""
+    results = []
+    with quiet():
+        for item in corpus:
+            try:
+                intent, slots, language = probe.run(item['text'])
+                error = None
+            except Exception as e:
+                intent, slots, language, error = 'error', None, None, str(e)
+
+            expected = item.get('slots')
+            slot_ok = None
+            if item['intent'] == 'set_reminder':
+                slot_ok = False
+                if intent == 'set_reminder' and slots:
+                    task, hour, minute, days = slots
+                    slot_ok = (normalize_task(task) == normalize_task(expected['task'])
+                               and f"{hour:02d}:{minute:02d}" == expected['time']
+                               and days == expected['days'])
+            results.append({
+                'id': item['id'],
+                'text': item['text'],
+                'tags': item.get('tags', []) + [item['lang']],
+                'intent_ok': intent == item['intent'],
+                'slot_ok': slot_ok,
+                'language_ok': language == item['lang'],
+                'got': {'intent': intent, 'slots': slots, 'language': language, 'error': error},
+            })
+    return results
+
+
+def summarize(results):
+    """Aggregate accuracies overall and per tag"""
+    groups = collections.defaultdict(list)
+    for r in results:
+        groups['all'].append(r)
+        for tag in r['tags']:
+            groups[tag].append(r)
+
+    summary = {}
+    for name, rows in groups.items():
+        slotted = [r for r in rows if r['slot_ok'] is not None]
+        summary[name] = {
+            'count': len(rows),
+            'intent_accuracy': sum(r['intent_ok'] for r in rows) / len(rows),
+            'slot_accuracy': (sum(r['slot_ok'] for r in slotted) / len(slotted)) if slotted else None,
+            'language_accuracy': sum(r['language_ok'] for r in rows) / len(rows),
+        }
+    return summary
+
+
+def throughput(corpus, assistant, min_seconds):
+    """Calls per second for the full pipeline and its main stages"""
+    texts = [item['text'] for item in corpus]
+    lowered = [t.lower().strip() for t in texts]
+    return {
+        'process_voice_command': rate(assistant.process_voice_command, texts, min_seconds),
+        'words_to_numbers': rate(assistant.words_to_numbers, lowered, min_seconds),
+        'detect_language': rate(assistant.detect_language, lowered, min_seconds),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--seconds', type=float, default=1.0, help="minimum timing window per stage")
+    parser.add_argument('--json', help="write the full report to this file")
+    parser.add_argument('--failures', action='store_true', help="list every failing utterance")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    assistant = make_assistant()
+    probe = Probe(assistant)
+
+    results = score(corpus, probe)
+    summary = summarize(results)
+    speed = throughput(corpus, assistant, args.seconds)
+
+    print(f"Corpus: {os.path.basename(args.corpus)} ({len(corpus)} utterances)")
+    print(f"{'group':<10}{'n':>5}{'intent':>9}{'slots':>9}{'lang':>9}")
+    for name in sorted(summary, key=lambda n: (n != 'all', n)):
+        s = summary[name]
+        slot = f"{s['slot_accuracy']:.1%}" if s['slot_accuracy'] is not None else "-"
+        print(f"{name:<10}{s['count']:>5}{s['intent_accuracy']:>9.1%}{slot:>9}{s['language_accuracy']:>9.1%}")
+
+    print("\nThroughput (calls/sec):")
+    for stage, value in speed.items():
+        print(f"  {stage:<24}{value:>12,.0f}")
+
+    for language, matcher in sorted(assistant.fuzzy_matchers.items()):
+        print(f"  [{language}] {matcher.latency}")
+
+    if args.failures:
+        print("\nFailures:")
+        for r in results:
+            if not r['intent_ok'] or r['slot_ok'] is False:
+                print(f"  {r['id']}: {r['text']!r} -> {r['got']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'corpus': os.path.basename(args.corpus), 'summary': summary,
+                       'throughput': speed, 'results': results}, f, ensure_ascii=False, indent=2)
+
+    regressions = score(load_corpus(REGRESSIONS), probe)
+    failed = [r for r in regressions if not r['intent_ok'] or r['slot_ok'] is False]
+    print(f"\nRegressions: {len(regressions) - len(failed)}/{len(regressions)} pass")
+    for r in failed:
+        print(f"  FAIL {r['id']}: {r['text']!r} -> {r['got']}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
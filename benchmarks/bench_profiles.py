@@ -0,0 +1,148 @@
+"""Multi-resident load test.
+
+One database and one process for a whole facility: creates R resident
+profiles with D daily medication rules each (default 500 x 20), expands
+them as the midnight job does, then measures
+
+  - setup and expansion time,
+  - each resident's Today view (cold and cached) through the per-profile
+    index,
+  - a morning round: one reminder per resident all due at the same moment,
+    announced by the single dispatcher in the resident's own voice
+    settings, and how late the last one is,
+  - a caregiver's adherence report per resident.
+
+Usage:
+    python benchmarks/bench_profiles.py [--residents 500] [--daily 20]
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from harness import make_assistant
+
+from metrics import LatencyRecorder
+from recurrence import RecurrenceRule
+from timecodes import epoch_minute
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"  {label:<44} {(time.perf_counter() - start) * 1000:>9.1f} ms")
+    return result
+
+
+def create(assistant, residents, daily):
+    """Profiles, then daily rules spread from 06:00 to 21:45, all queued before waiting"""
+    futures = [assistant.profiles.add(f"Resident {n:03d}", ('en', 'hi')[n % 2], resident_id=f"R{n:04d}",
+                                      rate=120 + n % 40)
+               for n in range(residents)]
+    profile_ids = [future.result() for future in futures]
+    tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+    futures = []
+    for profile_id in profile_ids:
+        for n in range(daily):
+            minute = 6 * 60 + n * (16 * 60 // daily)
+            futures.append(assistant.repository.add_recurrence(
+                f"medicine {n}", f"{minute // 60:02d}:{minute % 60:02d}", 'en',
+                RecurrenceRule(tomorrow, 'daily', count=30), profile_id))
+    for future in futures:
+        future.result()
+    return profile_ids
+
+
+def read_views(assistant, profile_ids):
+    tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+    cold = LatencyRecorder('Tomorrow view, cold', size=len(profile_ids))
+    warm = LatencyRecorder('Tomorrow view, cached', size=len(profile_ids))
+    counts = set()
+    for recorder in (cold, warm):
+        for profile_id in profile_ids:
+            with recorder.time():
+                counts.add(len(assistant.repository.for_day(tomorrow, profile_id)))
+    return cold, warm, counts
+
+
+def morning_round(assistant, profile_ids):
+    """One reminder per resident, all due at once, fired by the shared dispatcher"""
+    now = datetime.datetime.now()
+    due_at = now + datetime.timedelta(seconds=0.5)
+    futures = [assistant.repository.add("morning round", now.strftime('%H:%M'), now.date(), None,
+                                        epoch_minute(now), profile_id)
+               for profile_id in profile_ids]
+    reminder_ids = [future.result() for future in futures]
+
+    lateness = LatencyRecorder('announcement lateness', size=len(reminder_ids))
+    spoken = []
+    done = threading.Event()
+
+    def speak(text, language='en', profile=None):
+        lateness.record((datetime.datetime.now() - due_at).total_seconds() * 1000)
+        spoken.append(profile.id if profile else None)
+        if len(spoken) == len(reminder_ids):
+            done.set()
+
+    assistant.speak = speak
+    assistant.dispatcher.next_due()  # apply the reload requested by the expansion
+    assistant.dispatcher.horizon = None  # and read nothing more; the round is added explicitly
+    for reminder_id in reminder_ids:
+        assistant.dispatcher.add(reminder_id, due_at, None)
+    assistant.dispatcher.start()
+    done.wait(30)
+    assistant.dispatcher.stop()
+    assistant.writer.submit(lambda conn: None).result()  # announcements logged
+    return lateness, spoken
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--residents', type=int, default=500)
+    parser.add_argument('--daily', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        assistant = make_assistant(os.path.join(workdir, 'facility.db'))
+        print(f"{args.residents} residents x {args.daily} daily reminders, one database, one dispatcher\n")
+        profile_ids = timed(f"create profiles and {args.residents * args.daily} rules",
+                            lambda: create(assistant, args.residents, args.daily))
+        timed("expand every rule (midnight job)", assistant.expand_recurrences)
+        rows = assistant.conn.execute('SELECT COUNT(*) FROM reminders WHERE active = 1').fetchone()[0]
+        print(f"  {rows} reminder rows; the dispatcher holds at most {assistant.dispatcher.batch} at a time")
+
+        cold, warm, counts = read_views(assistant, profile_ids)
+        print(f"\n  {cold}\n  {warm}")
+        ok = counts == {args.daily}
+        if not ok:
+            print(f"  FAIL residents see {sorted(counts)} reminders, expected {args.daily}")
+
+        lateness, spoken = morning_round(assistant, profile_ids)
+        announced = assistant.conn.execute(
+            "SELECT COUNT(DISTINCT profile_id) FROM reminder_events WHERE kind = 'announced'").fetchone()[0]
+        print(f"\n  morning round: {len(spoken)} announcements for {len(set(spoken))} residents, "
+              f"{announced} logged")
+        print(f"  {lateness}")
+        ok = ok and len(spoken) == len(set(spoken)) == announced == args.residents
+
+        today = datetime.date.today()
+        report = LatencyRecorder('adherence report per resident', size=len(profile_ids))
+        for profile_id in profile_ids:
+            with report.time():
+                assistant.adherence.totals(today - datetime.timedelta(days=30), today, profile_id)
+        print(f"  {report}")
+
+        assistant.writer.stop()
+        assistant.db.close()
+        return 0 if ok else 1
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Recurring reminder storage benchmark.
+
+Sets up long medication schedules ("for N days") the old way -- one reminder
+row, one UPDATE and one APScheduler job per day -- and as recurrence rules
+expanded over a rolling window, then compares insert time, rows written,
+pending timers (scheduler jobs, or next-due heap entries for rules) and the
+memory they keep alive.
+
+A real (never started) APScheduler BackgroundScheduler is used so job memory
+is representative.
+
+Usage:
+    python benchmarks/bench_recurrence.py [--medicines 10] [--days 30 365]
+"""
+import argparse
+import datetime
+import sys
+import time
+import tracemalloc
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from harness import make_assistant, quiet
+
+from recurrence import RecurrenceRule
+
+
+def legacy_insert(assistant, task, time_str, days):
+    """The pre-rule handle_set_reminder: a row, an UPDATE and a job for every day"""
+    cursor = assistant.conn.cursor()
+    start = datetime.date.today() + datetime.timedelta(days=1)
+    reminder_time = datetime.datetime.strptime(time_str, '%H:%M').time()
+    original_id = None
+    for offset in range(days):
+        day = start + datetime.timedelta(days=offset)
+        cursor.execute('''
+            INSERT INTO reminders (task, time, date, language, recurring, remaining_days, original_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (task, time_str, day.strftime('%Y-%m-%d'), 'en', 1, days - offset, original_id))
+        reminder_id = cursor.lastrowid
+        if original_id is None:
+            original_id = reminder_id
+            cursor.execute('UPDATE reminders SET original_id = ? WHERE id = ?', (original_id, original_id))
+        assistant.scheduler.add_job(
+            func=assistant.trigger_reminder,
+            trigger="date",
+            run_date=datetime.datetime.combine(day, reminder_time),
+            args=[task, 'en', reminder_id, True],
+            id=f"reminder_{reminder_id}"
+        )
+    assistant.conn.commit()
+
+
+def rule_insert(assistant, task, time_str, days):
+    start = datetime.date.today() + datetime.timedelta(days=1)
+    assistant.add_recurrence(task, time_str, 'en', RecurrenceRule(start, 'daily', count=days))
+
+
+def measure(insert, medicines, days):
+    assistant = make_assistant()
+    assistant.scheduler = BackgroundScheduler()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    with quiet():
+        for m in range(medicines):
+            insert(assistant, f"medicine {m}", f"{8 + m % 12:02d}:00", days)
+    elapsed = time.perf_counter() - start
+    retained = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(before, 'filename'))
+    tracemalloc.stop()
+    rows = assistant.conn.execute('SELECT COUNT(*) FROM reminders').fetchone()[0]
+    timers = len(assistant.scheduler.get_jobs())
+    if insert is rule_insert:
+        # Rule occurrences are fired by the dispatcher, which loads the next ones lazily
+        assistant.dispatcher.next_due()
+        timers += len(assistant.dispatcher.pending)
+    return elapsed, rows, timers, retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--medicines', type=int, default=10)
+    parser.add_argument('--days', type=int, nargs='+', default=[30, 365])
+    args = parser.parse_args()
+
+    print(f"{args.medicines} medicines per schedule")
+    print(f"{'days':>5} {'storage':<8} {'insert ms':>10} {'rows':>7} {'timers':>6} {'retained KiB':>13}")
+    for days in args.days:
+        for name, insert in (('per-day', legacy_insert), ('rules', rule_insert)):
+            elapsed, rows, timers, retained = measure(insert, args.medicines, days)
+            print(f"{days:>5} {name:<8} {elapsed * 1000:>10.1f} {rows:>7} {timers:>6} {retained / 1024:>13.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Reminder repository benchmark.
+
+Replays a session of window refreshes (Today, Tomorrow and All tabs) and
+spoken "what's my schedule" queries, with a reminder marked done every few
+refreshes, over an on-disk database. Compares running each caller's own SQL
+every time (as before) with going through ReminderRepository, whose day
+agendas are only reloaded when a change touches that day, and prints the
+repository's per-query counts and timings and the cost of a cached agenda
+read.
+
+Usage:
+    python benchmarks/bench_repository.py [--rows 5000] [--refreshes 500] [--write-every 10]
+"""
+import argparse
+import datetime
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from harness import make_assistant
+
+from timecodes import day_range, epoch_minute
+
+DAY_SQL = '''
+    SELECT id, task, due, recurring, remaining_days FROM reminders
+    WHERE active = 1 AND due >= ? AND due < ? ORDER BY due
+'''
+ALL_SQL = 'SELECT id, task, due, recurring, remaining_days FROM reminders WHERE active = 1 ORDER BY due'
+
+
+def fill(assistant, rows):
+    rng = random.Random(rows)
+    today = datetime.date.today()
+    data = []
+    for i in range(rows):
+        day = today + datetime.timedelta(days=rng.randint(0, 30))
+        minute = rng.randint(0, 1439)
+        data.append((f"task {i}", f"{minute // 60:02d}:{minute % 60:02d}", day.strftime('%Y-%m-%d'),
+                     epoch_minute(day) + minute))
+    assistant.conn.executemany('INSERT INTO reminders (task, time, date, due) VALUES (?, ?, ?, ?)', data)
+    assistant.conn.commit()
+
+
+def direct_session(assistant, refreshes, write_every, ids):
+    """Each caller runs its own queries, as the window and backend did"""
+    conn = assistant.conn
+    today = datetime.date.today()
+    tomorrow = today + datetime.timedelta(days=1)
+    queries = 0
+    for n in range(refreshes):
+        if n % write_every == 0:
+            assistant.writer.execute('UPDATE reminders SET active = 0 WHERE id = ?', (ids.pop(),)).result()
+        conn.execute(DAY_SQL, day_range(today)).fetchall()
+        conn.execute(DAY_SQL, day_range(tomorrow)).fetchall()
+        conn.execute(ALL_SQL).fetchall()
+        conn.execute(DAY_SQL, day_range(today)).fetchall()
+        queries += 4
+    return queries
+
+
+def repository_session(assistant, refreshes, write_every, ids):
+    repository = assistant.repository
+    today = datetime.date.today()
+    tomorrow = today + datetime.timedelta(days=1)
+    for n in range(refreshes):
+        if n % write_every == 0:
+            repository.mark_done(ids.pop()).result()
+        repository.for_day(today)
+        repository.for_day(tomorrow)
+        repository.all_active()
+        repository.for_day(today)
+    stats = repository.stats()
+    return stats['cache_misses'] + stats['agenda']['misses']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--refreshes', type=int, default=500)
+    parser.add_argument('--write-every', type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        print(f"{args.refreshes} refreshes over {args.rows} reminders, a change every {args.write_every}")
+        results = {}
+        for label, session in (('direct SQL', direct_session), ('repository', repository_session)):
+            assistant = make_assistant(os.path.join(workdir, f"{label.split()[0]}.db"))
+            fill(assistant, args.rows)
+            ids = list(range(1, args.rows + 1))
+            random.Random(0).shuffle(ids)
+            start = time.perf_counter()
+            queries = session(assistant, args.refreshes, args.write_every, ids)
+            elapsed = (time.perf_counter() - start) * 1000
+            results[label] = elapsed
+            print(f"  {label:<12} {elapsed:>8.1f} ms   {elapsed / args.refreshes:.2f} ms per refresh   "
+                  f"{queries} queries run")
+            if session is repository_session:
+                stats = assistant.repository.stats()
+                print(f"    cache hits {stats['cache_hits']}, misses {stats['cache_misses']}; "
+                      f"agenda hits {stats['agenda']['hits']}, misses {stats['agenda']['misses']}")
+                for recorder in assistant.repository.timings.values():
+                    print(f"    {recorder}")
+                today = datetime.date.today()
+                start = time.perf_counter()
+                for _ in range(10000):
+                    assistant.repository.for_day(today)
+                print(f"    cached agenda read {(time.perf_counter() - start) * 100:.2f} us")
+            assistant.writer.stop()
+            assistant.db.close()
+        print(f"  speedup      {results['direct SQL'] / results['repository']:>8.1f}x")
+        return 0
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""Schema migration and query plan benchmark.
+
+Builds a reminders database in the original, unversioned layout (text date
+and time, no indexes, user_version 0) with N rows, upgrades it in place with
+the migrations in schema.py (reporting each migration's time), and times the
+hot queries. Every hot query's EXPLAIN QUERY PLAN must search the
+(active, due) index, or the (profile_id, active, due) index for a
+resident's views, without a full scan or temporary sort; the script exits
+non-zero if one does not.
+
+Usage:
+    python benchmarks/bench_schema.py [--rows 100000]
+"""
+import argparse
+import datetime
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from harness import quiet
+
+import repository
+from schema import SCHEMA_VERSION, create_reminders, migrate, schema_version
+from timecodes import day_range, epoch_minute
+
+TODAY = day_range(datetime.date.today())
+NOW = epoch_minute(datetime.datetime.now())
+WEEK_AGO = epoch_minute(datetime.date.today() - datetime.timedelta(days=7))
+
+GLOBAL = 'idx_reminders_active_due'
+PER_PROFILE = 'idx_reminders_profile_due'
+
+# (repository query, SQL, parameters, index it must use)
+HOT_QUERIES = [
+    ('for_day', repository.SQL_FOR_DAY, (1, *TODAY), PER_PROFILE),
+    ('all_active', repository.SQL_ALL_ACTIVE, (1,), PER_PROFILE),
+    ('clear_day', repository.SQL_ACTIVE_FOR_DAY, (1, *TODAY), PER_PROFILE),
+    ('clear_day', repository.SQL_CLEAR_DAY, (1, *TODAY), PER_PROFILE),
+    ('archive_inactive_before', repository.SQL_ARCHIVE_IDS, (WEEK_AGO, 500), GLOBAL),
+    ('expired ids', repository.SQL_EXPIRED, (NOW,), GLOBAL),
+    ('catch_up', repository.SQL_OVERDUE, (NOW - 120, NOW), GLOBAL),
+    ('expire', repository.SQL_EXPIRE, (NOW,), GLOBAL),
+    ('due_after', repository.SQL_DUE_AFTER, (NOW, 0, 64), GLOBAL),
+]
+
+
+def build_legacy(path, rows):
+    """Unversioned database as shipped before migrations: reminders table only"""
+    conn = sqlite3.connect(path)
+    create_reminders(conn)
+    rng = random.Random(rows)
+    today = datetime.date.today()
+    data = []
+    for i in range(rows):
+        day = today + datetime.timedelta(days=rng.randint(-700, 30))
+        active = 1 if day >= today else int(rng.random() < 0.05)
+        data.append((f"task {i}", f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}", day.strftime('%Y-%m-%d'), active))
+    conn.executemany('INSERT INTO reminders (task, time, date, active) VALUES (?, ?, ?, ?)', data)
+    conn.commit()
+    conn.close()
+
+
+def time_queries(conn, repeat=20):
+    """Mean ms per hot read query (writes are only planned, not run)"""
+    results = {}
+    for name, sql, params, index in HOT_QUERIES:
+        if not sql.lstrip().startswith('SELECT'):
+            continue
+        start = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(sql, params).fetchall()
+        results[name] = (time.perf_counter() - start) * 1000 / repeat
+    return results
+
+
+def plan_problems(conn):
+    """Hot queries whose plan scans the table or sorts in a temp b-tree"""
+    problems = []
+    for name, sql, params, index in HOT_QUERIES:
+        details = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+        uses_index = any(index in d for d in details)
+        bad = [d for d in details if d.startswith('SCAN') or 'TEMP B-TREE' in d]
+        if not uses_index or bad:
+            problems.append((name, details))
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(workdir, 'voicecare_reminders.db')
+        build_legacy(path, args.rows)
+        conn = sqlite3.connect(path)
+        print(f"Legacy database: {args.rows} reminders, user_version {schema_version(conn)}")
+
+        start = time.perf_counter()
+        with quiet():
+            applied = migrate(conn)
+        total = (time.perf_counter() - start) * 1000
+        print(f"Migrated to version {schema_version(conn)} in {total:.1f} ms:")
+        for version, description, ms in applied:
+            print(f"  {version}. {description:<32} {ms:>8.1f} ms")
+        if schema_version(conn) != SCHEMA_VERSION or migrate(conn):
+            print("FAIL migrations did not settle at the latest version")
+            return 1
+
+        print("\nHot queries (ms):")
+        for name, ms in time_queries(conn).items():
+            print(f"  {name:<26} {ms:>8.2f}")
+
+        # Plans are checked on both the migrated file and a brand new database
+        fresh = sqlite3.connect(':memory:')
+        with quiet():
+            migrate(fresh)
+        problems = plan_problems(conn) + plan_problems(fresh)
+        for name, details in problems:
+            print(f"  FAIL {name}: {' / '.join(details)}")
+        if not problems:
+            print(f"\nAll {len(HOT_QUERIES)} hot queries use {GLOBAL} or {PER_PROFILE} without scans or temp sorts")
+        conn.close()
+        return 1 if problems else 0
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""Startup recovery benchmark.
+
+Builds an on-disk database with a long history of reminders -- some already
+retired, some still active although their time has passed (the app was not
+running), some due within the last two hours for several residents, and a
+few in the future -- then times startup recovery: the old per-row
+load_existing_reminders (select every active row, strptime each, one UPDATE
+per expired row, one job per future row) against the set-based one (one
+indexed range read for the reminders to catch up on, announced in one
+summary per resident, one indexed range read by the dispatcher, and a
+single UPDATE left to the writer thread).
+
+Usage:
+    python benchmarks/bench_startup.py [--rows 100000] [--stale 0.5] [--future 1000] [--recent 300]
+"""
+import argparse
+import datetime
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from harness import make_assistant, quiet
+
+
+def build(path, rows, stale, future, recent, residents):
+    """Write the history database to path"""
+    assistant = make_assistant(path)
+    profile_ids = [assistant.profiles.add(f"Resident {n}").result() for n in range(residents - 1)] + [1]
+    rng = random.Random(rows)
+    today = datetime.date.today()
+    data = []
+    for i in range(rows):
+        day = today - datetime.timedelta(days=rng.randint(2, 730))
+        active = 1 if rng.random() < stale else 0
+        data.append((f"task {i}", f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}", day.strftime('%Y-%m-%d'), active))
+    for i in range(future):
+        day = today + datetime.timedelta(days=rng.randint(1, 60))
+        data.append((f"upcoming {i}", f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}", day.strftime('%Y-%m-%d'), 1))
+    assistant.conn.executemany('INSERT INTO reminders (task, time, date, active) VALUES (?, ?, ?, ?)', data)
+    # Came due while the app was off, within the catch-up window
+    now = datetime.datetime.now()
+    data = []
+    for i in range(recent):
+        due = now - datetime.timedelta(minutes=1 + i * 118 // recent)
+        data.append((profile_ids[i % residents], f"missed {i}", due.strftime('%H:%M'), due.strftime('%Y-%m-%d')))
+    assistant.conn.executemany('INSERT INTO reminders (profile_id, task, time, date) VALUES (?, ?, ?, ?)', data)
+    assistant.conn.commit()
+    assistant.writer.stop()
+    assistant.db.close()
+
+
+def legacy_recovery(assistant):
+    """load_existing_reminders as it was before the dispatcher and set-based recovery"""
+    cursor = assistant.conn.cursor()
+    cursor.execute('''
+        SELECT id, task, time, date, language, recurring, remaining_days FROM reminders
+        WHERE active = 1
+    ''')
+    current_time = datetime.datetime.now()
+    for reminder_id, task, time_str, date_str, language, is_recurring, remaining_days in cursor.fetchall():
+        reminder_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
+        reminder_time = datetime.datetime.strptime(time_str, '%H:%M').time()
+        reminder_datetime = datetime.datetime.combine(reminder_date, reminder_time)
+        if reminder_datetime > current_time:
+            assistant.scheduler.add_job(func=assistant.trigger_reminder, trigger="date",
+                                        run_date=reminder_datetime,
+                                        args=[task, language, reminder_id, is_recurring],
+                                        id=f"reminder_{reminder_id}")
+        else:
+            cursor.execute('UPDATE reminders SET active = 0 WHERE id = ?', (reminder_id,))
+    assistant.conn.commit()
+
+
+def timed(template, recover):
+    """Run recover on a fresh copy of the template database; return (ms, assistant)"""
+    workdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(workdir, 'reminders.db')
+        shutil.copy(template, path)
+        assistant = make_assistant(path)
+        assistant.scheduler = BackgroundScheduler()
+        start = time.perf_counter()
+        with quiet():
+            recover(assistant)
+        elapsed = (time.perf_counter() - start) * 1000
+        # Let changes still queued (past reminders logged as missed) finish first
+        assistant.writer.stop()
+        active = assistant.conn.execute('SELECT COUNT(*) FROM reminders WHERE active = 1').fetchone()[0]
+        assistant.db.close()
+        return elapsed, active, assistant
+    finally:
+        shutil.rmtree(workdir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--stale', type=float, default=0.5, help='fraction of history still marked active')
+    parser.add_argument('--future', type=int, default=1000)
+    parser.add_argument('--recent', type=int, default=300, help='reminders due in the last two hours')
+    parser.add_argument('--residents', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        template = os.path.join(workdir, 'template.db')
+        build(template, args.rows, args.stale, args.future, args.recent, args.residents)
+        print(f"History: {args.rows} past reminders ({args.stale:.0%} still active), {args.recent} due in the "
+              f"last two hours for {args.residents} residents, {args.future} upcoming")
+
+        legacy_ms, legacy_active, _ = timed(template, legacy_recovery)
+        new_ms, new_active, assistant = timed(template, lambda a: a.load_existing_reminders())
+        print(f"  per-row recovery    {legacy_ms:>9.1f} ms   active after: {legacy_active}")
+        print(f"  set-based recovery  {new_ms:>9.1f} ms   active after: {new_active}")
+        print("    " + ", ".join(f"{name} {ms:.1f} ms" for name, ms in assistant.startup_timings.items()))
+        print(f"  speedup             {legacy_ms / new_ms:>9.1f}x")
+        print(f"  catch-up: {len(assistant.spoken)} summaries, e.g. {assistant.spoken[0][0][:90]!r}..."
+              if assistant.spoken else "  catch-up: nothing announced")
+        # The per-row recovery silently retired the recent ones too
+        return 0 if new_active == legacy_active + args.recent and len(assistant.spoken) == args.residents else 1
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
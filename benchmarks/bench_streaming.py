@@ -0,0 +1,105 @@
+"""Streaming (partial hypothesis) parsing benchmark.
+
+Replays sessions of partial ASR hypotheses and compares the CPU cost per
+partial update of the IncrementalCommandParser with re-parsing every partial
+from scratch (what calling process_voice_command on each one would cost).
+It also checks that both reach the same final parse, and reports how many
+partials in the command became complete and stable.
+
+Sessions are JSON lines: {"id", "partials": [...], "final"}. Kiosks can record
+real ones by setting streaming.record_sessions in voicecare_settings.json.
+
+Usage:
+    python benchmarks/bench_streaming.py [--sessions benchmarks/asr_sessions/v1.jsonl]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from harness import make_assistant, quiet
+
+from incremental_parser import IncrementalCommandParser
+
+DEFAULT_SESSIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "asr_sessions", "v1.jsonl")
+
+
+def full_parse(assistant, text):
+    """Parse one hypothesis from scratch, including language detection"""
+    return IncrementalCommandParser(assistant, min_detect_words=1).update(text)
+
+
+def replay(sessions, step, rounds):
+    """Total CPU seconds and partial count for feeding every session to step()"""
+    cpu = 0.0
+    partials = 0
+    with quiet():
+        for _ in range(rounds):
+            for session in sessions:
+                feed = step()
+                start = time.process_time()
+                for partial in session['partials']:
+                    feed(partial)
+                cpu += time.process_time() - start
+                partials += len(session['partials'])
+    return cpu, partials
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', default=DEFAULT_SESSIONS)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--stable-updates', type=int, default=3)
+    args = parser.parse_args()
+
+    with open(args.sessions, encoding='utf-8') as f:
+        sessions = [json.loads(line) for line in f if line.strip()]
+    assistant = make_assistant()
+
+    def incremental():
+        return IncrementalCommandParser(assistant, stable_updates=args.stable_updates).update
+
+    def from_scratch():
+        return lambda partial: full_parse(assistant, partial)
+
+    inc_cpu, count = replay(sessions, incremental, args.rounds)
+    full_cpu, _ = replay(sessions, from_scratch, args.rounds)
+
+    agree = 0
+    complete_at = []
+    stable_at = []
+    with quiet():
+        for session in sessions:
+            stream = IncrementalCommandParser(assistant, stable_updates=args.stable_updates)
+            first_complete = first_stable = None
+            for i, partial in enumerate(session['partials'], 1):
+                state = stream.update(partial)
+                if state.complete and first_complete is None:
+                    first_complete = i
+                if state.stable and first_stable is None:
+                    first_stable = i
+            reference = full_parse(assistant, session['final'])
+            if (state.intent, state.slots) == (reference.intent, reference.slots):
+                agree += 1
+            if first_complete:
+                complete_at.append(first_complete / len(session['partials']))
+            if first_stable:
+                stable_at.append(first_stable / len(session['partials']))
+
+    print(f"Sessions: {os.path.basename(args.sessions)} ({len(sessions)}, {count // args.rounds} partials)")
+    print(f"  incremental   {inc_cpu / count * 1e6:>9.1f} us CPU per partial")
+    print(f"  from scratch  {full_cpu / count * 1e6:>9.1f} us CPU per partial")
+    print(f"  speedup       {full_cpu / inc_cpu:>9.1f}x")
+    print(f"  final parse agrees with full parse: {agree}/{len(sessions)}")
+    if complete_at:
+        print(f"  complete after {sum(complete_at) / len(complete_at):.0%} of partials on average "
+              f"({len(complete_at)} sessions)")
+    if stable_at:
+        print(f"  stable after   {sum(stable_at) / len(stable_at):.0%} of partials on average "
+              f"({len(stable_at)} sessions)")
+    return 0 if agree == len(sessions) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Integer time representation benchmark.
+
+Lists every active reminder the way the "All Reminders" tab does -- grouped
+by day, each time formatted as "07:30 PM" -- over a large table, once from
+the text date/time columns (strptime per row, strftime per row, as before)
+and once from the integer due minute with the cached formatters.
+
+Usage:
+    python benchmarks/bench_timecodes.py [--rows 100000]
+"""
+import argparse
+import datetime
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from harness import quiet
+
+from schema import create_reminders, migrate
+from timecodes import MINUTES_PER_DAY, format_date, format_time
+
+
+def build(path, rows):
+    conn = sqlite3.connect(path)
+    create_reminders(conn)
+    rng = random.Random(rows)
+    today = datetime.date.today()
+    data = []
+    for i in range(rows):
+        day = today + datetime.timedelta(days=rng.randint(0, 365))
+        data.append((f"task {i}", f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}", day.strftime('%Y-%m-%d')))
+    conn.executemany('INSERT INTO reminders (task, time, date) VALUES (?, ?, ?)', data)
+    conn.commit()
+    with quiet():
+        migrate(conn)
+    # The text-ordered listing gets its own index so only the row handling differs
+    conn.execute('CREATE INDEX idx_bench_text ON reminders (active, date, time)')
+    conn.commit()
+    return conn
+
+
+def text_listing(conn):
+    rows = conn.execute('''
+        SELECT id, task, time, date, recurring, remaining_days FROM reminders
+        WHERE active = 1 ORDER BY date, time
+    ''').fetchall()
+    out = []
+    current_date = None
+    for reminder_id, task, time_str, date_str, is_recurring, days_left in rows:
+        if date_str != current_date:
+            current_date = date_str
+            date_obj = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
+            out.append(date_obj.strftime('%B %d, %Y'))
+        time_obj = datetime.datetime.strptime(time_str, '%H:%M').time()
+        out.append((task, time_obj.strftime('%I:%M %p')))
+    return out
+
+
+def integer_listing(conn):
+    rows = conn.execute('''
+        SELECT id, task, due, recurring, remaining_days FROM reminders
+        WHERE active = 1 ORDER BY due
+    ''').fetchall()
+    out = []
+    current_day = None
+    for reminder_id, task, due, is_recurring, days_left in rows:
+        day = due // MINUTES_PER_DAY
+        if day != current_day:
+            current_day = day
+            out.append(format_date(day, '%B %d, %Y'))
+        out.append((task, format_time(due)))
+    return out
+
+
+def best_of(func, conn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(conn)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        conn = build(os.path.join(workdir, 'reminders.db'), args.rows)
+        text_ms, text_out = best_of(text_listing, conn, args.repeat)
+        int_ms, int_out = best_of(integer_listing, conn, args.repeat)
+        # Same minute ordering except for ties, so compare as multisets
+        same = sorted(map(str, text_out)) == sorted(map(str, int_out))
+        print(f"Listing {args.rows} reminders (best of {args.repeat}):")
+        print(f"  {'text date/time + strptime':<30} {text_ms:>8.1f} ms")
+        print(f"  {'integer due + cached format':<30} {int_ms:>8.1f} ms")
+        print(f"  {'speedup':<30} {text_ms / int_ms:>8.1f}x   output identical: {same}")
+        conn.close()
+        return 0 if same else 1
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""Trigger path benchmark.
+
+N reminders (default 100, for 10 residents; every other one an occurrence
+of a daily rule) all come due at once while the database writer is busy
+with a bulk import (another thread keeps it committing chunks that take
+--chunk-ms each). Announcements go through the app's own speech queue to
+one TTS thread, on an engine whose runAndWait takes --speak-ms. Reports
+each announcement's delay after the batch came due (until it has been
+spoken), as percentiles, for
+
+  - the previous trigger path: fired one by one on the dispatcher thread,
+    each recurring reminder waiting for the writer to extend its rule,
+  - the same thread, with the rule extended in the background,
+  - a pool of dispatcher.workers threads announcing, the dispatcher thread
+    only handing reminders over,
+  - the app's path: each resident's reminders announced together
+    (fire_group), as one pool task per resident, and for comparison the
+    whole round handed to the pool as a single task.
+
+Fails if two announcements ever run on the engine at once.
+
+Usage:
+    python benchmarks/bench_trigger.py [--reminders 100] [--speak-ms 10] [--chunk-ms 50]
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from harness import FakeTTSEngine, make_assistant, quiet
+
+from dispatcher import LAST_ID, ReminderDispatcher
+from metrics import LatencyRecorder
+from recurrence import RecurrenceRule
+from timecodes import epoch_minute
+from voicecare_settings import load_settings
+
+RESIDENTS = 10
+
+
+def setup(workdir, name, reminders):
+    """Reminders due this minute, half of them occurrences of a daily rule"""
+    assistant = make_assistant(os.path.join(workdir, f"{name}.db"))
+    profile_ids = [1] + [assistant.profiles.add(f"Resident {n}").result() for n in range(RESIDENTS - 1)]
+    now = datetime.datetime.now()
+    due = epoch_minute(now)
+    tomorrow = now.date() + datetime.timedelta(days=1)
+    for n in range(reminders):
+        profile_id = profile_ids[n % RESIDENTS]
+        if n % 2:
+            assistant.repository.add_recurrence(f"medicine {n}", '08:00', 'en',
+                                                RecurrenceRule(tomorrow, 'daily', count=30), profile_id).result()
+        else:
+            assistant.repository.add(f"water {n}", now.strftime('%H:%M'), now.date(), 'en', due, profile_id).result()
+    assistant.expand_recurrences()
+    # Bring the rules' first occurrences forward to now (their window is already extended)
+    assistant.writer.submit(lambda conn: conn.execute('UPDATE reminders SET due = ? WHERE recurrence_id IS NOT NULL',
+                                                      (due,))).result()
+    return assistant, due
+
+
+def busy_writer(assistant, stop, chunk_ms):
+    """A bulk import meanwhile: one slow writer command after another"""
+    while not stop.is_set():
+        assistant.writer.submit(lambda conn: time.sleep(chunk_ms / 1000)).result()
+
+
+def run(workdir, name, args, workers, wait_for_rules, grouped=False, per_resident=False):
+    assistant, due = setup(workdir, name, args.reminders)
+    delay = LatencyRecorder(name, size=args.reminders)
+    done = threading.Event()
+    spoken = []
+
+    def spoken_now(text):
+        delay.record((time.perf_counter() - start) * 1000)
+        spoken.append(text)
+        if len(spoken) == (RESIDENTS if grouped else args.reminders):
+            done.set()
+
+    # The app's own speak(), queued for its TTS thread
+    del assistant.speak
+    assistant.tts_engine = engine = FakeTTSEngine(args.speak_ms, spoken_now)
+    assistant.setup_speech()
+    if wait_for_rules:
+        expand = assistant.expand_recurrence
+        assistant.expand_recurrence = lambda recurrence_id, today=None, wait=True: expand(recurrence_id, today)
+    settings = assistant.settings['dispatcher']
+    assistant.dispatcher = ReminderDispatcher(
+        assistant.due_reminders, assistant.dispatch_reminder, batch=settings['batch'], workers=workers,
+        fire_group=assistant.dispatch_reminders if grouped else None,
+        group_by=assistant.group_reminders if per_resident else None, group_seconds=settings['group_seconds'])
+    # Read from the start of the minute they are due in, not from now
+    assistant.dispatcher.horizon = (due - 1, LAST_ID)
+    stop = threading.Event()
+    writer_thread = threading.Thread(target=busy_writer, args=(assistant, stop, args.chunk_ms))
+    writer_thread.start()
+    time.sleep(0.1)
+
+    start = time.perf_counter()
+    assistant.dispatcher.start()
+    done.wait(120)
+    # Grouped, the reminders are logged after their resident's announcement
+    deadline = time.time() + 10
+    while assistant.trigger_latency.stats()['count'] < args.reminders and time.time() < deadline:
+        time.sleep(0.01)
+    assistant.dispatcher.stop()
+    stop.set()
+    writer_thread.join()
+    assistant.writer.submit(lambda conn: None).result()
+    announced = assistant.trigger_latency.stats()['count']
+    assistant.writer.stop()
+    assistant.db.close()
+    return delay, len(spoken), announced, engine.overlaps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reminders', type=int, default=100)
+    parser.add_argument('--speak-ms', type=float, default=10.0)
+    parser.add_argument('--chunk-ms', type=float, default=50.0)
+    parser.add_argument('--workers', type=int, default=None, help="default: dispatcher.workers")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    ok = True
+    try:
+        workers = args.workers or load_settings(path=None)['dispatcher']['workers']
+        print(f"{args.reminders} reminders due at once for {RESIDENTS} residents, announcements taking "
+              f"{args.speak_ms:.0f} ms, writer busy with {args.chunk_ms:.0f} ms import chunks\n")
+        for name, pool, wait_for_rules, grouped, per_resident in (
+                ('dispatcher thread, waiting for the writer', 0, True, False, False),
+                ('dispatcher thread', 0, False, False, False),
+                (f"{workers} announcing threads", workers, False, False, False),
+                (f"{workers} threads, whole round grouped as one task", workers, False, True, False),
+                (f"{workers} threads, one task per resident", workers, False, True, True)):
+            with quiet():
+                delay, spoken, announced, overlaps = run(workdir, name, args, pool, wait_for_rules, grouped,
+                                                         per_resident)
+            print(f"  {delay}   overlapping TTS calls {overlaps}")
+            ok = (ok and spoken == (RESIDENTS if grouped else args.reminders) and announced == args.reminders
+                  and not overlaps)
+        return 0 if ok else 1
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Group commit benchmark.
+
+Several threads (standing in for the UI, the dispatcher and the listener)
+mark reminders done on an on-disk database, first committing each change
+themselves through Database.write() and then handing them to the
+DatabaseWriter thread -- once waiting for each change's commit, once not
+waiting at all (as the UI does). Reports how long callers were blocked per
+change, total throughput, the number of commits and the writer's commit
+latency and queue depth. synchronous=full makes every commit an fsync, as
+on an SD card without WAL's relaxed syncing.
+
+Usage:
+    python benchmarks/bench_writer.py [--changes 500] [--threads 4] [--synchronous full]
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from harness import quiet
+
+from database import Database
+from metrics import LatencyRecorder
+from schema import migrate
+from timecodes import epoch_minute
+from writer import DatabaseWriter
+
+MARK_DONE = 'UPDATE reminders SET active = 0 WHERE id = ?'
+
+
+def build(path, rows):
+    db = Database(path)
+    with quiet():
+        migrate(db.connection())
+    today = datetime.date.today()
+    due = epoch_minute(today)
+    db.connection().executemany('INSERT INTO reminders (task, time, date, due) VALUES (?, ?, ?, ?)',
+                                [(f"task {i}", '09:00', today.strftime('%Y-%m-%d'), due + 540)
+                                 for i in range(rows)])
+    db.connection().commit()
+    db.close()
+
+
+def direct(db, writer, reminder_id):
+    with db.write() as conn:
+        conn.execute(MARK_DONE, (reminder_id,))
+
+
+def queued_wait(db, writer, reminder_id):
+    writer.execute(MARK_DONE, (reminder_id,)).result()
+
+
+def queued(db, writer, reminder_id):
+    writer.execute(MARK_DONE, (reminder_id,))
+
+
+MODES = [('commit per change', direct), ('writer, wait for commit', queued_wait),
+         ('writer, fire and forget', queued)]
+
+
+def run(path, mode, changes, threads, args):
+    db = Database(path, synchronous=args.synchronous)
+    writer = DatabaseWriter(db, window_ms=args.window_ms, max_batch=args.max_batch)
+    writer.start()
+    blocked = LatencyRecorder('blocked', size=changes * threads)
+
+    def worker(offset):
+        for i in range(changes):
+            start = time.perf_counter()
+            mode(db, writer, offset * changes + i + 1)
+            blocked.record((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    writer.stop()
+    elapsed = time.perf_counter() - start
+    remaining = db.connection().execute('SELECT COUNT(*) FROM reminders WHERE active = 1').fetchone()[0]
+    db.close()
+    return elapsed, blocked.stats(), writer.stats(), remaining
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--changes', type=int, default=500, help='changes per thread')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--synchronous', default='full')
+    parser.add_argument('--window-ms', type=float, default=0)
+    parser.add_argument('--max-batch', type=int, default=256)
+    args = parser.parse_args()
+
+    total = args.changes * args.threads
+    workdir = tempfile.mkdtemp()
+    try:
+        template = os.path.join(workdir, 'template.db')
+        build(template, total)
+        print(f"{total} changes from {args.threads} threads, synchronous={args.synchronous}, "
+              f"window {args.window_ms:g} ms")
+        failed = False
+        for label, mode in MODES:
+            path = os.path.join(workdir, 'reminders.db')
+            shutil.copy(template, path)
+            elapsed, blocked, stats, remaining = run(path, mode, args.changes, args.threads, args)
+            commits = total if mode is direct else stats['batches']
+            print(f"\n{label}:")
+            print(f"  {total / elapsed:>8.0f} changes/s   {commits} commits   "
+                  f"caller blocked p50 {blocked['p50']:.3f} ms  p95 {blocked['p95']:.3f} ms")
+            if mode is not direct:
+                commit = stats['commit_ms']
+                print(f"  commit p50 {commit['p50']:.2f} ms  p95 {commit['p95']:.2f} ms   "
+                      f"max queue depth {stats['max_queue_depth']}")
+            if remaining:
+                print(f"  {remaining} changes were not applied")
+                failed = True
+            os.remove(path)
+        return 1 if failed else 0
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Shared helpers for the VoiceCare benchmarks.
+
+Builds a VoiceCareAssistant without touching microphones, speakers or the
+on-disk database: TTS, the scheduler and SQLite are replaced by in-memory
+stand-ins so the benchmarks only measure the code paths we care about.
+"""
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VARIANT_DIR = os.path.join(ROOT, "Small Model")
+
+if VARIANT_DIR not in sys.path:
+    sys.path.insert(0, VARIANT_DIR)
+
+from langdetect import DetectorFactory
+
+# langdetect is random unless seeded; benchmarks must be repeatable
+DetectorFactory.seed = 0
+
+
+class StubScheduler:
+    """In-memory stand-in for APScheduler's BackgroundScheduler"""
+
+    def __init__(self):
+        self.jobs = {}
+        self.running = True
+
+    def add_job(self, func=None, trigger=None, id=None, **kwargs):
+        job_id = id or f"job_{len(self.jobs)}"
+        self.jobs[job_id] = (func, trigger, kwargs)
+        return job_id
+
+    def remove_job(self, job_id):
+        del self.jobs[job_id]
+
+    def get_jobs(self):
+        return list(self.jobs)
+
+    def shutdown(self, wait=True):
+        self.running = False
+
+
+class FakeTTSEngine:
+    """pyttsx3 stand-in whose runAndWait takes call_ms and, like pyttsx3,
+    fails if another thread is already inside it"""
+
+    def __init__(self, call_ms, on_spoken=None):
+        self.call_ms = call_ms
+        self.on_spoken = on_spoken
+        self.queued = []
+        self.lock = threading.Lock()
+        self.overlaps = 0
+
+    def getProperty(self, name):
+        return [] if name == 'voices' else None
+
+    def setProperty(self, name, value):
+        pass
+
+    def say(self, text):
+        self.queued.append(text)
+
+    def runAndWait(self):
+        if not self.lock.acquire(blocking=False):
+            self.overlaps += 1
+            raise RuntimeError('run loop already started')
+        try:
+            time.sleep(self.call_ms / 1000)
+            texts, self.queued = self.queued, []
+        finally:
+            self.lock.release()
+        for text in texts:
+            if self.on_spoken:
+                self.on_spoken(text)
+
+
+def make_assistant(db_path=':memory:'):
+    """Create an assistant wired to stub TTS, scheduler and database (dispatcher not started)"""
+    from voicecare_final import VoiceCareAssistant
+    from voicecare_settings import load_settings
+
+    assistant = VoiceCareAssistant.__new__(VoiceCareAssistant)
+    assistant.settings = load_settings(path=None)
+    assistant.scheduler = StubScheduler()
+    assistant.spoken = []
+    assistant.speak = lambda text, language='en', profile=None: assistant.spoken.append((text, language))
+    with quiet():
+        assistant.setup_database(db_path)
+    assistant.setup_dispatcher()
+    assistant.setup_language_patterns()
+    return assistant
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the backend's diagnostic prints while timing"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def rate(func, items, min_seconds=0.5):
+    """Call func over items repeatedly for at least min_seconds; return calls/sec"""
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    with quiet():
+        while elapsed < min_seconds:
+            for item in items:
+                func(item)
+            calls += len(items)
+            elapsed = time.perf_counter() - start
+    return calls / elapsed if elapsed else 0.0
@@ -24,6 +24,8 @@ a = Analysis(
     datas=[
         # Include Vosk model data
         ('vosk\\vosk-model-small-en-us-0.15', 'vosk/vosk-model-small-en-us-0.15'),
+        # Language packs (patterns and responses), loaded on first use
+        ('Small Model\\languages', 'languages'),
     ],
     hiddenimports=[
         'vosk',